@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -19,6 +20,21 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_ROOT = BASE_DIR / "media"
 MEDIA_URL = "/media/"
 
+STORAGES = {
+    # record images are stored once per content; see records/storage.py
+    "default": {"BACKEND": "records.storage.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+# who sends media files (see records/media.py): "" for Django itself,
+# "x-accel-redirect" (nginx) or "x-sendfile" (Apache, lighttpd)
+MEDIA_SENDFILE = os.environ.get("MEDIA_SENDFILE", "")
+# nginx `internal` location aliased to MEDIA_ROOT, for X-Accel-Redirect
+MEDIA_ACCEL_PREFIX = os.environ.get("MEDIA_ACCEL_PREFIX", "/protected-media/")
+# dotted path of a (request, name) -> bool check run before any media file
+# is sent; empty lets everyone read them (see records.media.authorize)
+MEDIA_PERMISSION = os.environ.get("MEDIA_PERMISSION", "")
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -140,3 +156,55 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Search result counts
+# An exact COUNT(*) is only run when the planner expects at most
+# SEARCH_EXACT_COUNT_LIMIT rows, and is given up on for the planner's
+# estimate after SEARCH_COUNT_TIMEOUT_MS milliseconds.
+
+SEARCH_EXACT_COUNT_LIMIT = int(os.environ.get("SEARCH_EXACT_COUNT_LIMIT", "10000"))
+SEARCH_COUNT_TIMEOUT_MS = int(os.environ.get("SEARCH_COUNT_TIMEOUT_MS", "200"))
+
+# Caches
+# "search" holds ordered result ids per normalized search (see
+# records/search/result_cache.py). Local memory evicts least recently used
+# entries past MAX_ENTRIES; with several worker processes, point it at a
+# FileBasedCache directory so invalidation reaches every worker.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "search": {
+        "BACKEND": os.environ.get(
+            "SEARCH_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("SEARCH_CACHE_LOCATION", "search-results"),
+        "TIMEOUT": int(os.environ.get("SEARCH_CACHE_TIMEOUT", "300")),
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
+    # rendered per-person CSV/PDF exports, keyed by Person.record_version
+    "exports": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get(
+            "EXPORT_CACHE_LOCATION",
+            os.path.join(tempfile.gettempdir(), "vital-records-exports"),
+        ),
+        "TIMEOUT": int(os.environ.get("EXPORT_CACHE_TIMEOUT", str(7 * 24 * 3600))),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+# searches matching more rows than this are paged by keyset, not cached
+SEARCH_CACHE_MAX_IDS = 5000
+
+# seconds an in-memory relationship graph (records.kinship) is used before
+# it is rebuilt, even if no write to Person/Marriage was seen in-process
+KINSHIP_SNAPSHOT_TTL = int(os.environ.get("KINSHIP_SNAPSHOT_TTL", "300"))
+
+# certificate images rendered on demand (records.certificate_cache), kept
+# under MEDIA_ROOT and trimmed least recently used first past this size
+CERTIFICATE_CACHE_DIR = "certificate_cache"
+CERTIFICATE_CACHE_MAX_BYTES = int(
+    os.environ.get("CERTIFICATE_CACHE_MAX_BYTES", str(2 * 1024**3))
+)
@@ -16,7 +16,6 @@ Including another URLconf
 """
 
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path
 
@@ -31,12 +30,78 @@ urlpatterns = [
     path("death_results/", views.search_death_records, name="death_results"),
     path("marriage_results/", views.search_marriage_records, name="marriage_results"),
     path("person/<str:person_id>/", views.record_details, name="record_details"),
+    path(
+        "person/<str:person_id>/ancestors/",
+        views.person_ancestors,
+        name="person_ancestors",
+    ),
+    path(
+        "person/<str:person_id>/descendants/",
+        views.person_descendants,
+        name="person_descendants",
+    ),
+    path(
+        "person/<str:person_id>/relationship/",
+        views.person_relationship,
+        name="person_relationship",
+    ),
     path(
         "submit_comment/<str:person_id>/", views.submit_comment, name="submit_comment"
     ),
     path("person/<str:person_id>/export/csv/", views.export_csv, name="export_csv"),
     path("person/<str:person_id>/export/pdf/", views.export_pdf, name="export_pdf"),
+    path(
+        "person/<str:person_id>/certificate/birth/",
+        views.certificate,
+        {"kind": "birth"},
+        name="birth_certificate",
+    ),
+    path(
+        "person/<str:person_id>/certificate/death/",
+        views.certificate,
+        {"kind": "death"},
+        name="death_certificate",
+    ),
+    path(
+        "person/<str:person_id>/certificate/birth/<str:suffix>/",
+        views.certificate,
+        {"kind": "birth"},
+        name="birth_certificate_size",
+    ),
+    path(
+        "person/<str:person_id>/certificate/death/<str:suffix>/",
+        views.certificate,
+        {"kind": "death"},
+        name="death_certificate_size",
+    ),
+    path(
+        "person/<str:person_id>/export/gedcom/",
+        views.export_gedcom,
+        name="export_gedcom",
+    ),
+    path(
+        "<str:kind>_results/export/gedcom/",
+        views.export_search_gedcom,
+        name="export_search_gedcom",
+    ),
+    path(
+        "<str:kind>_results/export/csv/",
+        views.export_search,
+        {"fmt": "csv"},
+        name="export_search_csv",
+    ),
+    path(
+        "<str:kind>_results/export/ndjson/",
+        views.export_search,
+        {"fmt": "ndjson"},
+        name="export_search_ndjson",
+    ),
     path("", views.home, name="home"),
     path("our-mission/", views.our_mission, name="our_mission"),
     path("glossary/", views.glossary, name="glossary"),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # record images, sent by the front-end server when one is configured
+    # (MEDIA_SENDFILE)
+    path(
+        f"{settings.MEDIA_URL.lstrip('/')}<path:name>", views.media_file, name="media"
+    ),
+]
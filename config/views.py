@@ -1,38 +1,76 @@
 import csv
 import io
 
-from django.core.paginator import Paginator
-from django.http import HttpResponse
+from django.core.cache import caches
+from django.db.models import Q
+from django.http import (
+    Http404,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, render
-
+from django.urls import reverse
+from django.views.decorators.http import condition
+
+from records import (
+    certificate_cache,
+    derivatives,
+    gedcom,
+    kinship,
+    media,
+    versions,
+)
 from records.comment_utils import add_comment
-from records.models import Birth, County, Death, Person
-from records.search.record_search import birth_search, death_search, marriage_search
+from records.family import MAX_GENERATIONS, FamilyNeighborhood, ancestors, descendants
+from records.models import County, Person
+from records.search import export as search_export
+from records.search.record_search import (
+    birth_row_search,
+    death_row_search,
+    marriage_search,
+)
+from records.search.result_cache import search_paginator
 
+# search kind -> function building its results from the parsed filters
+SEARCHES = {
+    "birth": birth_row_search,
+    "death": death_row_search,
+    "marriage": marriage_search,
+}
 
-def search_birth_records(request):
-    if request.htmx:
-        filters = {}
 
-        for key, val in request.GET.items():
-            if val.strip():
-                filters[key] = val.strip()
+def _search_filters(request, event):
+    """(filters, fuzzy, phonetic) from a search form's query string."""
+    filters = {}
+
+    for key, val in request.GET.items():
+        if key != "cursor" and val.strip():
+            filters[key] = val.strip()
 
-        if "birth_year" in filters:
-            filters["birth_date"] = filters.pop("birth_year")
+    if f"{event}_year" in filters:
+        filters[f"{event}_date"] = filters.pop(f"{event}_year")
 
-        if filters.get("variance") == "exact":
-            filters["variance"] = 0
+    if filters.get("variance") == "exact":
+        filters["variance"] = 0
 
-        is_fuzzy = bool(filters.pop("fuzzy_search", False))
-        res = birth_search(filters, fuzzy=is_fuzzy)
-        paginator = Paginator(res, 25)
-        page_num = request.GET.get("page", 1)
-        page_obj = paginator.get_page(page_num)
+    is_fuzzy = bool(filters.pop("fuzzy_search", False))
+    is_phonetic = bool(filters.pop("phonetic_search", False))
+    return filters, is_fuzzy, is_phonetic
+
+
+def search_birth_records(request):
+    if request.htmx:
+        filters, is_fuzzy, is_phonetic = _search_filters(request, "birth")
+        res = birth_row_search(filters, fuzzy=is_fuzzy, phonetic=is_phonetic)
+        paginator = search_paginator(
+            "birth", filters, res, 25, fuzzy=is_fuzzy, phonetic=is_phonetic
+        )
+        page_obj = paginator.get_page(request.GET.get("cursor"))
         query_dict = request.GET.copy()
 
-        if "page" in query_dict:
-            del query_dict["page"]
+        if "cursor" in query_dict:
+            del query_dict["cursor"]
 
         curr_query_str = query_dict.urlencode()
 
@@ -48,27 +86,16 @@ def search_birth_records(request):
 
 def search_death_records(request):
     if request.htmx:
-        filters = {}
-
-        for key, val in request.GET.items():
-            if val.strip():
-                filters[key] = val.strip()
-
-        if "death_year" in filters:
-            filters["death_date"] = filters.pop("death_year")
-
-        if filters.get("variance") == "exact":
-            filters["variance"] = 0
-
-        is_fuzzy = bool(filters.pop("fuzzy_search", False))
-        res = death_search(filters, fuzzy=is_fuzzy)
-        paginator = Paginator(res, 25)
-        page_num = request.GET.get("page", 1)
-        page_obj = paginator.get_page(page_num)
+        filters, is_fuzzy, is_phonetic = _search_filters(request, "death")
+        res = death_row_search(filters, fuzzy=is_fuzzy, phonetic=is_phonetic)
+        paginator = search_paginator(
+            "death", filters, res, 25, fuzzy=is_fuzzy, phonetic=is_phonetic
+        )
+        page_obj = paginator.get_page(request.GET.get("cursor"))
         query_dict = request.GET.copy()
 
-        if "page" in query_dict:
-            del query_dict["page"]
+        if "cursor" in query_dict:
+            del query_dict["cursor"]
 
         curr_query_str = query_dict.urlencode()
 
@@ -84,27 +111,16 @@ def search_death_records(request):
 
 def search_marriage_records(request):
     if request.htmx:
-        filters = {}
-
-        for key, val in request.GET.items():
-            if val.strip():
-                filters[key] = val.strip()
-
-        if "marriage_year" in filters:
-            filters["marriage_date"] = filters.pop("marriage_year")
-
-        if filters.get("variance") == "exact":
-            filters["variance"] = 0
-
-        is_fuzzy = bool(filters.pop("fuzzy_search", False))
-        res = marriage_search(filters, fuzzy=is_fuzzy)
-        paginator = Paginator(res, 25)
-        page_num = request.GET.get("page", 1)
-        page_obj = paginator.get_page(page_num)
+        filters, is_fuzzy, is_phonetic = _search_filters(request, "marriage")
+        res = marriage_search(filters, fuzzy=is_fuzzy, phonetic=is_phonetic)
+        paginator = search_paginator(
+            "marriage", filters, res, 25, fuzzy=is_fuzzy, phonetic=is_phonetic
+        )
+        page_obj = paginator.get_page(request.GET.get("cursor"))
         query_dict = request.GET.copy()
 
-        if "page" in query_dict:
-            del query_dict["page"]
+        if "cursor" in query_dict:
+            del query_dict["cursor"]
 
         curr_query_str = query_dict.urlencode()
 
@@ -118,16 +134,112 @@ def search_marriage_records(request):
         return render(request, "search_marriage.html", {"counties": counties})
 
 
-def record_details(request, person_id):
-    person = get_object_or_404(Person, id=person_id)
-    birth = Birth.objects.filter(person=person).first()
-    death = Death.objects.filter(person=person).first()
+def _family_or_404(person_id):
+    try:
+        return FamilyNeighborhood.load(person_id)
+    except Person.DoesNotExist:
+        raise Http404("No Person matches the given query.")
+
+
+def _certificate_picture(kind, person_id, record):
+    """
+    The full size URL of a record's certificate and, when there are
+    derivatives to offer, the srcsets to show it with (see derivatives).
+    """
+    if record is None:
+        return None
+
+    file = getattr(record, derivatives.IMAGE_FIELDS[kind])
+    if file:
+        return {"full": file.url, **(derivatives.stored_srcsets(file) or {})}
+
+    # rendered on demand, derivatives included (see certificate_cache)
+    urls = {
+        suffix: reverse(f"{kind}_certificate_size", args=[person_id, suffix])
+        for suffix in derivatives.WIDTHS
+    }
+    return {
+        "full": reverse(f"{kind}_certificate", args=[person_id]),
+        **derivatives.srcsets(urls),
+    }
+
 
-    context = {"person": person, "birth": birth, "death": death}
+def record_details(request, person_id):
+    family = _family_or_404(person_id)
+
+    context = {
+        "person": family.person,
+        "birth": family.birth,
+        "death": family.death,
+        "birth_certificate": _certificate_picture(
+            "birth", family.person.pk, family.birth
+        ),
+        "death_certificate": _certificate_picture(
+            "death", family.person.pk, family.death
+        ),
+        "family": family,
+    }
 
     return render(request, "record_details.html", context)
 
 
+def _family_tree(request, person_id, walk):
+    try:
+        root = int(person_id)
+    except ValueError:
+        raise Http404("No Person matches the given query.")
+
+    try:
+        generations = int(request.GET.get("generations", 4))
+    except ValueError:
+        generations = 4
+
+    nodes = walk(root, generations)
+
+    if not nodes:
+        raise Http404("No Person matches the given query.")
+
+    return JsonResponse(
+        {
+            "root": root,
+            "generations": max(0, min(generations, MAX_GENERATIONS)),
+            "people": nodes,
+        }
+    )
+
+
+def person_ancestors(request, person_id):
+    return _family_tree(request, person_id, ancestors)
+
+
+def person_descendants(request, person_id):
+    return _family_tree(request, person_id, descendants)
+
+
+def person_relationship(request, person_id):
+    try:
+        first, second = int(person_id), int(request.GET.get("to", ""))
+        found = kinship.relationship(first, second)
+    except (ValueError, Person.DoesNotExist):
+        raise Http404("No Person matches the given query.")
+
+    if request.htmx:
+        ids = [first, second] + [step["id"] for step in found["path"]]
+        people = Person.objects.in_bulk(ids)
+
+        # the snapshot can still hold someone deleted since it was built
+        if len(people) < len(set(ids)):
+            raise Http404("No Person matches the given query.")
+
+        for step in found["path"]:
+            step["person"] = people[step["id"]]
+
+        context = {"person": people[first], "other": people[second], **found}
+        return render(request, "relationship.html", context)
+
+    return JsonResponse({"from": first, "to": second, **found})
+
+
 def submit_comment(request, person_id):
     person = get_object_or_404(Person, id=person_id)
     fields = {
@@ -146,18 +258,11 @@ def submit_comment(request, person_id):
     return HttpResponse(success_message)
 
 
-def export_csv(request, person_id):
-    person = get_object_or_404(Person, id=person_id)
-    birth = Birth.objects.filter(person=person).first()
-    death = Death.objects.filter(person=person).first()
-    # marriages = Marriage.objects.filter(Q(spouse1=person) | Q(spouse2=person))
+def _render_csv(family) -> bytes:
+    person, birth, death = family.person, family.birth, family.death
 
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = (
-        f'attachment; filename="{person.last_name}_{person.first_name}_record.csv"'
-    )
-
-    writer = csv.writer(response)
+    out = io.StringIO()
+    writer = csv.writer(out)
     writer.writerow(["Field", "Value"])
     writer.writerow(["First Name", person.first_name])
     writer.writerow(["Middle Name", person.middle_name or ""])
@@ -194,7 +299,7 @@ def export_csv(request, person_id):
         ]
     )
 
-    spouses = person.spouses()
+    spouses = family.spouses
     writer.writerow(
         [
             "Spouses",
@@ -204,17 +309,7 @@ def export_csv(request, person_id):
         ]
     )
 
-    children = person.children()
-    writer.writerow(
-        [
-            "Children",
-            ", ".join(f"{c.first_name} {c.last_name}" for c in children)
-            if children
-            else "N/A",
-        ]
-    )
-
-    children = person.children()
+    children = family.children
     writer.writerow(
         [
             "Children",
@@ -224,18 +319,16 @@ def export_csv(request, person_id):
         ]
     )
 
-    return response
+    return out.getvalue().encode()
 
 
-def export_pdf(request, person_id):
+def _render_pdf(family) -> bytes:
     from reportlab.lib import colors
     from reportlab.lib.pagesizes import letter
     from reportlab.lib.units import inch
     from reportlab.pdfgen import canvas
 
-    person = get_object_or_404(Person, id=person_id)
-    birth = Birth.objects.filter(person=person).first()
-    death = Death.objects.filter(person=person).first()
+    person, birth, death = family.person, family.birth, family.death
 
     buffer = io.BytesIO()
     c = canvas.Canvas(buffer, pagesize=letter)
@@ -313,7 +406,7 @@ def export_pdf(request, person_id):
     y = draw_field("Mother:", mother_str, y)
     y = draw_field("Father:", father_str, y)
 
-    spouses = person.spouses()
+    spouses = family.spouses
     spouses_str = (
         ", ".join(f"{s.first_name} {s.last_name}" for s in spouses)
         if spouses
@@ -321,7 +414,7 @@ def export_pdf(request, person_id):
     )
     y = draw_field("Spouses:", spouses_str, y)
 
-    children = person.children()
+    children = family.children
     children_str = (
         ", ".join(f"{ch.first_name} {ch.last_name}" for ch in children)
         if children
@@ -340,12 +433,153 @@ def export_pdf(request, person_id):
 
     c.showPage()
     c.save()
-    buffer.seek(0)
+    return buffer.getvalue()
+
+
+# format -> (content type, renderer of a FamilyNeighborhood)
+EXPORTS = {
+    "csv": ("text/csv", _render_csv),
+    "pdf": ("application/pdf", _render_pdf),
+}
+
+
+def _record_stamp(request, person_id, **kwargs):
+    # condition() asks for the ETag and Last-Modified separately: one query
+    if not hasattr(request, "_record_stamp"):
+        request._record_stamp = versions.stamp(person_id)
+    return request._record_stamp
+
+
+def _record_etag(request, person_id, **kwargs):
+    stamp = _record_stamp(request, person_id)
+    if stamp is None:
+        return None
+    version, modified = stamp
+    # weak: a re-rendered PDF is equivalent, not byte for byte the same
+    return f'W/"{version}-{modified.timestamp():.6f}"'
+
+
+def _record_modified(request, person_id, **kwargs):
+    stamp = _record_stamp(request, person_id)
+    return stamp[1] if stamp else None
+
+
+def _cached_export(request, person_id, fmt):
+    """
+    An export of a person, rendered once per record version. The stamp is
+    read before the family, so an entry is never older than its key.
+    """
+    stamp = _record_stamp(request, person_id)
+    if stamp is None:
+        raise Http404("No Person matches the given query.")
+
+    version, modified = stamp
+    key = f"export:{fmt}:{person_id}:{version}:{modified.timestamp():.6f}"
+    content_type, render_export = EXPORTS[fmt]
+    cached = caches["exports"].get(key)
+
+    if cached is None:
+        family = _family_or_404(person_id)
+        person = family.person
+        filename = f"{person.last_name}_{person.first_name}_record.{fmt}"
+        cached = (render_export(family), filename)
+        caches["exports"].set(key, cached)
+
+    content, filename = cached
+    response = HttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@condition(etag_func=_record_etag, last_modified_func=_record_modified)
+def export_csv(request, person_id):
+    return _cached_export(request, person_id, "csv")
+
+
+@condition(etag_func=_record_etag, last_modified_func=_record_modified)
+def export_pdf(request, person_id):
+    return _cached_export(request, person_id, "pdf")
+
+
+@condition(etag_func=_record_etag, last_modified_func=_record_modified)
+def certificate(request, person_id, kind, suffix="png"):
+    if suffix not in certificate_cache.SUFFIXES:
+        raise Http404("No such certificate size.")
+
+    stamp = _record_stamp(request, person_id)
+    path = stamp and certificate_cache.certificate(kind, person_id, stamp, suffix)
+    if path is None:
+        raise Http404(f"No {kind} record of this person.")
+
+    # ETag and Last-Modified come from the record stamp (condition()),
+    # not from the file, whose mtime moves with every cache hit
+    response = media.response(request, path, conditional=False)
+    response["Content-Disposition"] = f'inline; filename="{kind}_{person_id}.{suffix}"'
+    return response
+
+
+def media_file(request, name):
+    return media.response(request, media.resolve(name))
+
+
+def _gedcom_response(people, filename):
+    response = StreamingHttpResponse(
+        gedcom.export(people), content_type="application/x-gedcom; charset=utf-8"
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}.ged"'
+    return response
+
+
+def export_gedcom(request, person_id):
+    """A person's ancestors and descendants, ?generations= deep (default 4)."""
+    try:
+        person = get_object_or_404(Person, id=int(person_id))
+    except ValueError:
+        raise Http404("No Person matches the given query.")
+
+    try:
+        generations = int(request.GET.get("generations", 4))
+    except ValueError:
+        generations = 4
+    generations = max(0, min(generations, MAX_GENERATIONS))
+
+    return _gedcom_response(
+        gedcom.tree_people(person.pk, generations),
+        f"{person.last_name}_{person.first_name}_tree",
+    )
+
+
+def export_search_gedcom(request, kind):
+    """Everyone in a birth/death search result, or both spouses of a marriage."""
+    if kind not in SEARCHES:
+        raise Http404("No such search.")
+
+    filters, is_fuzzy, is_phonetic = _search_filters(request, kind)
+    res = SEARCHES[kind](filters, fuzzy=is_fuzzy, phonetic=is_phonetic)
+
+    if kind == "marriage":
+        people = Person.objects.filter(
+            Q(pk__in=res.values("spouse1_id")) | Q(pk__in=res.values("spouse2_id"))
+        )
+    else:
+        people = Person.objects.filter(pk__in=res.values("pk"))
+
+    return _gedcom_response(people, f"{kind}_search")
+
+
+def export_search(request, kind, fmt):
+    """Every row of a birth/death/marriage search as CSV or NDJSON, streamed."""
+    if kind not in SEARCHES:
+        raise Http404("No such search.")
+
+    filters, is_fuzzy, is_phonetic = _search_filters(request, kind)
+    res = SEARCHES[kind](filters, fuzzy=is_fuzzy, phonetic=is_phonetic)
 
-    response = HttpResponse(buffer, content_type="application/pdf")
-    response["Content-Disposition"] = (
-        f'attachment; filename="{person.last_name}_{person.first_name}_record.pdf"'
+    response = StreamingHttpResponse(
+        search_export.EXPORTERS[fmt](kind, res),
+        content_type=search_export.CONTENT_TYPES[fmt],
     )
+    response["Content-Disposition"] = f'attachment; filename="{kind}_search.{fmt}"'
     return response
 
 
@@ -0,0 +1,12 @@
+from django.contrib.postgres.operations import CreateExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("db_extensions", "0001_enable_trigram"),
+    ]
+
+    operations = [
+        CreateExtension("fuzzystrmatch"),
+    ]
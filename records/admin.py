@@ -5,18 +5,32 @@ from django.urls import path, reverse
 from django.utils.html import format_html
 
 from .models import Birth, City, Comment, County, Death, Marriage, Person
+from .search.counting import EstimatedCountPaginator
 
 ext_color = "darkorange"
 
 
+# changelists for the large tables count exactly only when the planner says
+# it is cheap, and skip the unfiltered "N total" count altogether; an
+# estimate is shown as "about N" (pages/admin/records/pagination.html)
+class EstimatedCountAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 # Register your models here.
 
 
 @admin.register(Person)
-class PersonAdmin(admin.ModelAdmin):
+class PersonAdmin(EstimatedCountAdmin):
     autocomplete_fields = ["mother", "father"]
 
-    search_fields = ["id", "last_name", "first_name", "middle_name"]
+    search_fields = [
+        "id",
+        "last_name_norm__normcontains",
+        "first_name_norm__normcontains",
+        "middle_name",
+    ]
 
     readonly_fields = (
         "view_birth_link",
@@ -101,12 +115,12 @@ class PersonAdmin(admin.ModelAdmin):
 
 
 @admin.register(Birth)
-class BirthAdmin(admin.ModelAdmin):
+class BirthAdmin(EstimatedCountAdmin):
     autocomplete_fields = ["person"]
 
     search_fields = [
-        "person__last_name",
-        "person__first_name",
+        "person__last_name_norm__normcontains",
+        "person__first_name_norm__normcontains",
         "person__middle_name",
         "birth_date",
         "birth_county__county_code",
@@ -171,12 +185,12 @@ class BirthAdmin(admin.ModelAdmin):
 
 
 @admin.register(Death)
-class DeathAdmin(admin.ModelAdmin):
+class DeathAdmin(EstimatedCountAdmin):
     autocomplete_fields = ["person"]
 
     search_fields = [
-        "person__last_name",
-        "person__first_name",
+        "person__last_name_norm__normcontains",
+        "person__first_name_norm__normcontains",
         "person__middle_name",
         "death_date",
         "death_county__county_code",
@@ -241,15 +255,15 @@ class DeathAdmin(admin.ModelAdmin):
 
 
 @admin.register(Marriage)
-class MarriageAdmin(admin.ModelAdmin):
+class MarriageAdmin(EstimatedCountAdmin):
     autocomplete_fields = ["spouse1", "spouse2"]
 
     search_fields = [
-        "spouse1__last_name",
-        "spouse1__first_name",
+        "spouse1__last_name_norm__normcontains",
+        "spouse1__first_name_norm__normcontains",
         "spouse1__middle_name",
-        "spouse2__last_name",
-        "spouse2__first_name",
+        "spouse2__last_name_norm__normcontains",
+        "spouse2__first_name_norm__normcontains",
         "spouse2__middle_name",
         "marriage_date",
         "marriage_county__county_code",
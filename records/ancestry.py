@@ -0,0 +1,140 @@
+from django.db import connection, transaction
+from django.db.models import F, FilteredRelation, Q
+
+from records.models import Ancestry, Person
+
+# Person.mother/father chains longer than this are not followed; only bad
+# (cyclic) data gets anywhere near it
+MAX_DEPTH = 100
+
+# Ancestor rows of the people matching `where` (on `p`), by one recursive
+# walk up the parent links. UNION drops repeated (person, ancestor, depth)
+# rows, and MAX_DEPTH ends a cycle, so the walk always finishes.
+_FILL_SQL = """
+INSERT INTO {ancestry} (ancestor_id, descendant_id, depth)
+WITH RECURSIVE up (descendant_id, ancestor_id, depth) AS (
+    SELECT p.id, parent.id, 1
+    FROM {person} p
+    JOIN {person} parent ON parent.id IN (p.mother_id, p.father_id)
+    WHERE {where}
+  UNION
+    SELECT up.descendant_id, parent.id, up.depth + 1
+    FROM up
+    JOIN {person} child ON child.id = up.ancestor_id
+    JOIN {person} parent ON parent.id IN (child.mother_id, child.father_id)
+    WHERE up.depth < %(max_depth)s
+)
+SELECT ancestor_id, descendant_id, MIN(depth)
+FROM up
+WHERE ancestor_id <> descendant_id
+GROUP BY ancestor_id, descendant_id
+"""
+
+
+def fill(where: str, params: dict, person_model=Person, ancestry_model=Ancestry) -> int:
+    """Insert the ancestor rows of the people matching `where`."""
+    sql = _FILL_SQL.format(
+        ancestry=connection.ops.quote_name(ancestry_model._meta.db_table),
+        person=connection.ops.quote_name(person_model._meta.db_table),
+        where=where,
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"max_depth": MAX_DEPTH, **params})
+        return cursor.rowcount
+
+
+def below(person_ids) -> set:
+    """The given people and all their descendants."""
+    ids = {pid for pid in person_ids if pid is not None}
+    return ids | set(
+        Ancestry.objects.filter(ancestor_id__in=ids).values_list(
+            "descendant_id", flat=True
+        )
+    )
+
+
+def refresh(person_ids) -> None:
+    """
+    Recompute the rows of people whose parents changed. Everyone below them
+    gains or loses the same ancestors, so their rows are recomputed too;
+    nobody else's ancestry can pass through them.
+    """
+    ids = below(person_ids)
+
+    if not ids:
+        return
+
+    with transaction.atomic():
+        Ancestry.objects.filter(descendant_id__in=ids).delete()
+        fill("p.id = ANY(%(ids)s)", {"ids": list(ids)})
+
+
+def rebuild(
+    batch_size: int = 5000, person_model=Person, ancestry_model=Ancestry
+) -> int:
+    """Drop and recreate every row, in person id ranges; returns the row count."""
+    total = 0
+    last_id = person_model.objects.order_by("-id").values_list("id", flat=True).first()
+
+    with transaction.atomic():
+        ancestry_model.objects.all().delete()
+
+        for start in range(0, last_id or 0, batch_size):
+            total += fill(
+                "p.id > %(start)s AND p.id <= %(end)s",
+                {"start": start, "end": start + batch_size},
+                person_model,
+                ancestry_model,
+            )
+
+    return total
+
+
+# LOOKUPS ============
+
+
+def is_ancestor(ancestor_id: int, descendant_id: int) -> bool:
+    return Ancestry.objects.filter(
+        ancestor_id=ancestor_id, descendant_id=descendant_id
+    ).exists()
+
+
+def ancestors_of(person_id: int):
+    """People above `person_id`, annotated with `depth`, nearest first."""
+    return (
+        Person.objects.filter(descendant_links__descendant_id=person_id)
+        .annotate(depth=F("descendant_links__depth"))
+        .order_by("depth", "id")
+    )
+
+
+def descendants_of(person_id: int):
+    """People below `person_id`, annotated with `depth`, nearest first."""
+    return (
+        Person.objects.filter(ancestor_links__ancestor_id=person_id)
+        .annotate(depth=F("ancestor_links__depth"))
+        .order_by("depth", "id")
+    )
+
+
+def common_ancestors(first_id: int, second_id: int):
+    """
+    People who are ancestors of both, annotated with their `depth_first` and
+    `depth_second`, nearest (smallest sum) first.
+    """
+    return (
+        Person.objects.annotate(
+            to_first=FilteredRelation(
+                "descendant_links",
+                condition=Q(descendant_links__descendant_id=first_id),
+            ),
+            to_second=FilteredRelation(
+                "descendant_links",
+                condition=Q(descendant_links__descendant_id=second_id),
+            ),
+        )
+        .filter(to_first__depth__isnull=False, to_second__depth__isnull=False)
+        .annotate(depth_first=F("to_first__depth"), depth_second=F("to_second__depth"))
+        .order_by(F("depth_first") + F("depth_second"), "id")
+    )
@@ -0,0 +1,180 @@
+import fcntl
+import glob
+import os
+import zlib
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from records import versions
+from records.certificates import KINDS
+from records.image_utils import DERIVATIVES, render_files
+
+# Certificate images rendered on first request and kept as PNG files under
+# MEDIA_ROOT/CERTIFICATE_CACHE_DIR. A file's name holds the person's record
+# stamp (records.versions), so any write that changes what a certificate
+# shows makes a new name and the old file is dropped when it is replaced.
+# The cache is bounded by size: file mtimes are the recency of an LRU,
+# touched on every hit, and the least recently used files are deleted
+# once the total passes CERTIFICATE_CACHE_MAX_BYTES. Each certificate is
+# kept as a full size PNG and its derivatives (image_utils.DERIVATIVES),
+# all rendered together.
+
+# concurrent first requests for one certificate wait on the same lock file
+# (of this many, by hash), in every process, and only one of them renders
+LOCK_STRIPES = 256
+
+# writes (per process) between two size checks of the whole cache
+PRUNE_EVERY = 100
+
+# pruning stops once the cache is this share of its maximum size
+LOW_WATER = 0.9
+
+_writes = 0
+
+
+def root() -> str:
+    return os.path.join(settings.MEDIA_ROOT, settings.CERTIFICATE_CACHE_DIR)
+
+
+# the full size certificate and its derivatives, by name suffix
+SUFFIXES = ("png", *DERIVATIVES)
+
+
+def _path(kind: str, person_id: int, stamp, suffix: str = "png") -> str:
+    version, modified = stamp
+    return os.path.join(
+        root(),
+        kind,
+        f"{person_id % 1000:03d}",
+        f"{person_id}_{version}_{modified.timestamp():.6f}.{suffix}",
+    )
+
+
+@contextmanager
+def _lock(kind: str, person_id: int):
+    stripe = zlib.crc32(f"{kind}:{person_id}".encode()) % LOCK_STRIPES
+    locks = os.path.join(root(), "locks")
+    os.makedirs(locks, exist_ok=True)
+
+    with open(os.path.join(locks, f"{stripe:03d}.lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _hit(path: str) -> bool:
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _render(kind: str, person_id: int) -> dict | None:
+    model, _, fields_of, related = KINDS[kind]
+    record = model.objects.filter(person_id=person_id).select_related(*related).first()
+    if record is None:
+        return None
+    return render_files(kind, *fields_of(record.person, record))
+
+
+def _write(paths: dict, files: dict) -> None:
+    global _writes
+
+    directory = os.path.dirname(paths["png"])
+    os.makedirs(directory, exist_ok=True)
+
+    for suffix, data in files.items():
+        # readers only ever see whole files
+        partial = f"{paths[suffix]}.{os.getpid()}.part"
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, paths[suffix])
+
+    # the person's older versions will not be asked for again
+    person_id = os.path.basename(paths["png"]).split("_", 1)[0]
+    current = set(paths.values())
+    for old in glob.glob(os.path.join(directory, f"{person_id}_*")):
+        if old not in current and not old.endswith(".part"):
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+
+    _writes += 1
+    if _writes % PRUNE_EVERY == 0:
+        prune()
+
+
+def certificate(kind: str, person_id, stamp=None, suffix: str = "png") -> str | None:
+    """
+    The path of the current `kind` ("birth", "death") certificate of a
+    person (or of one of its derivatives, by SUFFIXES), rendered if it is
+    not cached; None without such a record. A hit costs one query, or
+    none when the caller has the person's versions.stamp() already.
+    """
+    # read before the record, so a file is never older than its name
+    if stamp is None:
+        stamp = versions.stamp(person_id)
+    if stamp is None:
+        return None
+
+    person_id = int(person_id)
+    path = _path(kind, person_id, stamp, suffix)
+    if _hit(path):
+        return path
+
+    with _lock(kind, person_id):
+        # rendered while this request waited for the lock
+        if _hit(path):
+            return path
+
+        files = _render(kind, person_id)
+        if files is None:
+            return None
+        _write({s: _path(kind, person_id, stamp, s) for s in SUFFIXES}, files)
+
+    return path
+
+
+def prune(max_bytes: int | None = None) -> int:
+    """
+    Delete the least recently used certificates while the cache is over
+    `max_bytes` (CERTIFICATE_CACHE_MAX_BYTES), down to LOW_WATER of it.
+    Returns the number of files deleted.
+    """
+    if max_bytes is None:
+        max_bytes = settings.CERTIFICATE_CACHE_MAX_BYTES
+
+    files, total = [], 0
+    for kind in KINDS:
+        for directory, _, names in os.walk(os.path.join(root(), kind)):
+            for name in names:
+                if name.endswith(".part"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+    if total <= max_bytes:
+        return 0
+
+    deleted = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes * LOW_WATER:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        deleted += 1
+
+    return deleted
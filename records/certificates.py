@@ -0,0 +1,114 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.files.base import ContentFile
+from django.db.models import Q
+
+from records import derivatives
+from records.image_utils import (
+    birth_certificate_fields,
+    death_certificate_fields,
+    render_files,
+)
+from records.models import Birth, Death
+from records.search import search_table
+
+# Certificate images for Birth and Death rows, in bulk. The main process
+# reads the records and works out what each certificate says; the pool
+# only draws and encodes (records.image_utils needs no database), and the
+# PNG with its derivatives comes back to be written to storage with one
+# UPDATE per batch. One batch renders while the previous one is written.
+
+# records rendered, written and updated together
+BATCH_SIZE = 500
+
+# kind -> (model, image field, fields function, related rows the fields read)
+KINDS = {
+    "birth": (
+        Birth,
+        "birth_record_image",
+        birth_certificate_fields,
+        ("person__mother", "person__father", "birth_city__county", "birth_county"),
+    ),
+    "death": (
+        Death,
+        "death_record_image",
+        death_certificate_fields,
+        ("person", "death_city__county", "death_county"),
+    ),
+}
+
+
+def missing(kind: str):
+    """The `kind` records without a certificate image."""
+    model, field, _, _ = KINDS[kind]
+    return model.objects.filter(Q(**{f"{field}__isnull": True}) | Q(**{field: ""}))
+
+
+def _batches(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Renderer:
+    """
+    Renders certificates with `workers` processes (inline when 1) and
+    stores them as "<kind>_<person id>.png" (under its content hash with
+    records.storage), with their derivatives (records.derivatives) next
+    to them.
+    """
+
+    def __init__(self, workers: int | None = None, batch_size: int = BATCH_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.rendered = 0
+
+    def render(self, kind: str, records) -> int:
+        """Render and store the certificates of the `kind` queryset `records`."""
+        model, field, fields_of, related = KINDS[kind]
+        rows = records.select_related(*related).order_by("pk")
+        batches = _batches(rows.iterator(chunk_size=self.batch_size), self.batch_size)
+
+        if self.workers == 1:
+            for batch in batches:
+                jobs = [(kind, *fields_of(r.person, r)) for r in batch]
+                self._store(model, field, batch, [render_files(*job) for job in jobs])
+            return self.rendered
+
+        with ProcessPoolExecutor(self.workers) as pool:
+            pending = None
+            for batch in batches:
+                futures = [
+                    pool.submit(render_files, kind, *fields_of(r.person, r))
+                    for r in batch
+                ]
+                if pending:
+                    self._store(model, field, *pending)
+                pending = batch, futures
+            if pending:
+                self._store(model, field, *pending)
+
+        return self.rendered
+
+    def _store(self, model, field: str, batch, images) -> None:
+        for record, files in zip(batch, images):
+            if not isinstance(files, dict):
+                files = files.result()
+
+            file = getattr(record, field)
+            kind = field.removesuffix("_record_image")
+            if file:
+                # a re-render replaces the old files; shared blobs are left
+                # to gc_media
+                derivatives.delete(file)
+                file.delete(save=False)
+            png = ContentFile(files.pop("png"))
+            file.save(f"{kind}_{record.person_id}.png", png, save=False)
+            derivatives.save(file, files)
+
+        model.objects.bulk_update(batch, [field])
+        # PersonSearch keeps a copy of the image names
+        search_table.refresh_people(record.person_id for record in batch)
+        self.rendered += len(batch)
@@ -0,0 +1,95 @@
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, UnidentifiedImageError
+
+from records.image_utils import DERIVATIVES, derivatives
+
+# Thumbnail and medium WebP/JPEG copies of the record images, stored next
+# to the original: birth_records/birth_12.png has birth_records/
+# birth_12.thumb.webp and so on. They are made when an image is saved
+# (records.signals), by render_certificates, and for older files by
+# build_image_derivatives. Pages offer them with srcset (see srcsets()).
+
+# image field per model with record images
+IMAGE_FIELDS = {
+    "birth": "birth_record_image",
+    "death": "death_record_image",
+    "marriage": "marriage_record_image",
+}
+
+# srcset descriptor of each derivative size (its width)
+WIDTHS = {suffix: width for suffix, (width, _, _) in DERIVATIVES.items()}
+
+# what the page can ask for; the full image always stays a link away
+SIZES = "(max-width: 640px) 90vw, 512px"
+
+
+def name(original: str, suffix: str) -> str:
+    """The storage name of a derivative of the file named `original`."""
+    return f"{os.path.splitext(original)[0]}.{suffix}"
+
+
+def exist(file) -> bool:
+    """Whether every derivative of a stored FieldFile is there."""
+    return all(file.storage.exists(name(file.name, suffix)) for suffix in DERIVATIVES)
+
+
+def save(file, images: dict) -> None:
+    """Store the encoded derivatives `images` ({suffix: bytes}) of `file`."""
+    for suffix, data in images.items():
+        target = name(file.name, suffix)
+        # the name is derived from the original's, so it is replaced in place
+        file.storage.delete(target)
+        file.storage.save(target, ContentFile(data))
+
+
+def generate(file) -> bool:
+    """Make the derivatives of a stored FieldFile; False if it is no image."""
+    try:
+        with file.storage.open(file.name, "rb") as f, Image.open(f) as img:
+            images = derivatives(img)
+    except (FileNotFoundError, UnidentifiedImageError, OSError):
+        return False
+
+    save(file, images)
+    return True
+
+
+def ensure(file) -> bool:
+    """generate() unless the derivatives are already there."""
+    if not file or exist(file):
+        return False
+    return generate(file)
+
+
+def delete(file) -> None:
+    for suffix in DERIVATIVES:
+        file.storage.delete(name(file.name, suffix))
+
+
+def srcsets(urls: dict) -> dict:
+    """
+    What a <picture> needs, given the URL of each derivative:
+    {"webp": srcset, "jpg": srcset, "src": fallback URL, "sizes": sizes}.
+    """
+    sets = {"webp": [], "jpg": []}
+    for suffix, url in urls.items():
+        sets[suffix.rsplit(".", 1)[1]].append((WIDTHS[suffix], url))
+
+    picture = {
+        fmt: ", ".join(f"{url} {width}w" for width, url in sorted(entries))
+        for fmt, entries in sets.items()
+    }
+    picture["src"] = max(sets["jpg"])[1]
+    picture["sizes"] = SIZES
+    return picture
+
+
+def stored_srcsets(file) -> dict | None:
+    """srcsets() of a stored FieldFile's derivatives, or None if it has none."""
+    if not file or not exist(file):
+        return None
+    return srcsets(
+        {suffix: file.storage.url(name(file.name, suffix)) for suffix in DERIVATIVES}
+    )
@@ -0,0 +1,180 @@
+from datetime import date
+
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+from records.models import Birth, Death, MarriageParticipant, Person, PersonSearch
+
+# how far ancestors()/descendants() may walk: 2**10 pedigree slots at most
+MAX_GENERATIONS = 10
+
+
+class FamilyNeighborhood:
+    """
+    A person and the immediate family shown by record_details and the
+    exports: parents, siblings, spouses, children, and the first birth and
+    death record with their county and city. load() reads all of it in
+    three queries (people, birth, death) instead of one per relation.
+    """
+
+    def __init__(
+        self, person, birth=None, death=None, siblings=(), spouses=(), children=()
+    ):
+        self.person = person
+        self.birth = birth
+        self.death = death
+        self.siblings = list(siblings)
+        self.spouses = list(spouses)
+        self.children = list(children)
+
+    @property
+    def mother(self):
+        return self.person.mother
+
+    @property
+    def father(self):
+        return self.person.father
+
+    @classmethod
+    def load(cls, person_id):
+        """Raises Person.DoesNotExist when there is no such person."""
+        own = Person.objects.filter(pk=person_id)
+        married = MarriageParticipant.objects.filter(person_id=person_id)
+        married_to = married.filter(spouse_id=OuterRef("pk"))
+
+        # the person, their parents (joined), and everyone sharing a parent
+        # with them, having them as a parent, or married to them
+        people = list(
+            Person.objects.select_related("mother", "father")
+            .filter(
+                Q(pk=person_id)
+                | Q(mother_id=Subquery(own.values("mother_id")))
+                | Q(father_id=Subquery(own.values("father_id")))
+                | Q(mother_id=person_id)
+                | Q(father_id=person_id)
+                | Q(pk__in=married.values("spouse_id"))
+            )
+            .annotate(
+                is_spouse=Exists(married_to),
+                married_on=Subquery(
+                    married_to.order_by("marriage__marriage_date").values(
+                        "marriage__marriage_date"
+                    )[:1]
+                ),
+            )
+        )
+
+        person = next((p for p in people if str(p.pk) == str(person_id)), None)
+        if person is None:
+            raise Person.DoesNotExist(f"No person with id {person_id}")
+
+        siblings = [
+            p
+            for p in people
+            if p.pk != person.pk
+            and (
+                (person.mother_id and p.mother_id == person.mother_id)
+                or (person.father_id and p.father_id == person.father_id)
+            )
+        ]
+        children = [p for p in people if person.pk in (p.mother_id, p.father_id)]
+        # in order of marriage, undated marriages last
+        spouses = sorted(
+            (p for p in people if p.is_spouse),
+            key=lambda p: (p.married_on is None, p.married_on or date.min),
+        )
+
+        birth = (
+            Birth.objects.select_related("birth_county", "birth_city__county")
+            .filter(person=person)
+            .first()
+        )
+        death = (
+            Death.objects.select_related("death_county", "death_city__county")
+            .filter(person=person)
+            .first()
+        )
+
+        return cls(person, birth, death, siblings, spouses, children)
+
+
+# One WITH RECURSIVE walk over Person.mother/father, starting at the root
+# person. Each row is one node of the chart: the person, the node it was
+# reached from (`via`) and how. `path` holds the ids on the way down, so a
+# person who is their own ancestor in bad data cannot loop the walk.
+_TREE_SQL = """
+WITH RECURSIVE tree (id, via, relation, generation, path) AS (
+    SELECT id, NULL::bigint, 'self', 0, ARRAY[id]
+    FROM {person}
+    WHERE id = %(root)s
+  UNION ALL
+    SELECT nxt.id, tree.id, {relation}, tree.generation + 1, tree.path || nxt.id
+    FROM tree
+    {step}
+    WHERE tree.generation < %(generations)s
+      AND NOT nxt.id = ANY(tree.path)
+)
+SELECT tree.id, tree.via, tree.relation, tree.generation,
+       p.first_name, p.middle_name, p.last_name, p.sex,
+       s.birth_date, s.death_date
+FROM tree
+JOIN {person} p ON p.id = tree.id
+LEFT JOIN {search} s ON s.person_id = tree.id
+ORDER BY tree.generation, tree.path
+"""
+
+_STEPS = {
+    # parents of the current node
+    "ancestors": (
+        "CASE WHEN nxt.id = cur.mother_id THEN 'mother' ELSE 'father' END",
+        "JOIN {person} cur ON cur.id = tree.id "
+        "JOIN {person} nxt ON nxt.id IN (cur.mother_id, cur.father_id)",
+    ),
+    # children of the current node
+    "descendants": (
+        "'child'",
+        "JOIN {person} nxt ON tree.id IN (nxt.mother_id, nxt.father_id)",
+    ),
+}
+
+_TREE_COLUMNS = (
+    "id",
+    "via",
+    "relation",
+    "generation",
+    "first_name",
+    "middle_name",
+    "last_name",
+    "sex",
+    "birth_date",
+    "death_date",
+)
+
+
+def _walk(direction: str, person_id: int, generations: int) -> list[dict]:
+    relation, step = _STEPS[direction]
+    tables = {
+        "person": connection.ops.quote_name(Person._meta.db_table),
+        "search": connection.ops.quote_name(PersonSearch._meta.db_table),
+    }
+    sql = _TREE_SQL.format(relation=relation, step=step.format(**tables), **tables)
+    generations = max(0, min(generations, MAX_GENERATIONS))
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"root": person_id, "generations": generations})
+        return [dict(zip(_TREE_COLUMNS, row)) for row in cursor.fetchall()]
+
+
+def ancestors(person_id: int, generations: int) -> list[dict]:
+    """
+    The pedigree of a person, `generations` levels up, in one query: the
+    person first (generation 0, relation "self"), then one row per
+    mother/father slot. An ancestor reached along two lines appears twice.
+    Empty when there is no such person.
+    """
+    return _walk("ancestors", person_id, generations)
+
+
+def descendants(person_id: int, generations: int) -> list[dict]:
+    """ancestors() the other way: children, grandchildren, ... (relation "child")."""
+    return _walk("descendants", person_id, generations)
@@ -0,0 +1,311 @@
+import heapq
+from datetime import date
+from itertools import groupby
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import CharField, Exists, OuterRef, Q, Value
+from django.db.models.functions import Cast, Concat, Greatest, Least
+
+from records.models import Ancestry, Marriage, Person, Sex
+
+# GEDCOM 5.5.1 export, streamed. The people to export are a queryset that
+# is only ever used as a subquery, and every record comes from one of
+# three server-side cursors (people, parent pairs, marriages), so a whole
+# search result is written in constant memory and a fixed number of
+# queries, however many people it holds.
+
+# rows fetched per round trip of each server-side cursor
+CHUNK_SIZE = 2000
+
+# bytes of GEDCOM text gathered before a chunk is handed to the response
+WRITE_SIZE = 64 * 1024
+
+_MONTHS = (
+    "JAN",
+    "FEB",
+    "MAR",
+    "APR",
+    "MAY",
+    "JUN",
+    "JUL",
+    "AUG",
+    "SEP",
+    "OCT",
+    "NOV",
+    "DEC",
+)
+
+SOURCE = "IllinoisVitalRecords"
+SOURCE_NAME = "Illinois Vital Records"
+
+
+def family_key(first: str, second: str):
+    """
+    "<low id>_<high id>" of a couple or a child's parents; a single parent
+    is "<id>_<id>" (LEAST/GREATEST skip NULLs). A FAM record's xref.
+    """
+    return Concat(
+        Cast(Least(first, second), CharField()),
+        Value("_"),
+        Cast(Greatest(first, second), CharField()),
+    )
+
+
+def tree_people(person_id: int, generations: int):
+    """A person with their ancestors and descendants, `generations` deep."""
+    return Person.objects.filter(
+        Q(pk=person_id)
+        | Q(
+            pk__in=Ancestry.objects.filter(
+                descendant_id=person_id, depth__lte=generations
+            ).values("ancestor_id")
+        )
+        | Q(
+            pk__in=Ancestry.objects.filter(
+                ancestor_id=person_id, depth__lte=generations
+            ).values("descendant_id")
+        )
+    )
+
+
+def _date(value: date) -> str:
+    return f"{value.day} {_MONTHS[value.month - 1]} {value.year}"
+
+
+def _place(city: str | None, county: str | None) -> str:
+    parts = [city, f"{county} County" if county else None, "Illinois", "USA"]
+    return ", ".join(part for part in parts if part)
+
+
+def _event(tag: str, when: date | None, city=None, county=None) -> list[str]:
+    lines = [f"1 {tag}"]
+    if when:
+        lines.append(f"2 DATE {_date(when)}")
+    if city or county:
+        lines.append(f"2 PLAC {_place(city, county)}")
+    return lines
+
+
+def _text(value: str | None) -> str:
+    # a value may not span lines, and a leading @ would read as a pointer
+    return " ".join((value or "").split()).replace("@", "@@")
+
+
+def _header() -> str:
+    lines = [
+        "0 HEAD",
+        f"1 SOUR {SOURCE}",
+        f"2 NAME {SOURCE_NAME}",
+        f"1 DATE {_date(date.today())}",
+        "1 SUBM @SUBM@",
+        "1 GEDC",
+        "2 VERS 5.5.1",
+        "2 FORM LINEAGE-LINKED",
+        "1 CHAR UTF-8",
+        "0 @SUBM@ SUBM",
+        f"1 NAME {SOURCE_NAME}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _individuals(people):
+    """One INDI record per exported person, by id."""
+    exported = people.values("pk")
+    as_parent = (
+        Person.objects.filter(Q(mother_id=OuterRef("pk")) | Q(father_id=OuterRef("pk")))
+        .annotate(key=family_key("mother_id", "father_id"))
+        .values("key")
+        .order_by("key")
+        .distinct()
+    )
+    as_spouse = (
+        Marriage.objects.filter(
+            Q(spouse1_id=OuterRef("pk")) | Q(spouse2_id=OuterRef("pk"))
+        )
+        .annotate(key=family_key("spouse1_id", "spouse2_id"))
+        .values("key")
+        .order_by("key")
+        .distinct()
+    )
+
+    rows = (
+        Person.objects.filter(pk__in=exported)
+        .select_related("search_row")
+        .annotate(
+            parent_family=family_key("mother_id", "father_id"),
+            # the parents' FAM is only written when one of them is exported
+            parents_exported=Exists(
+                Person.objects.filter(pk__in=exported).filter(
+                    Q(pk=OuterRef("mother_id")) | Q(pk=OuterRef("father_id"))
+                )
+            ),
+            parent_of=ArraySubquery(as_parent),
+            spouse_in=ArraySubquery(as_spouse),
+        )
+        .order_by("pk")
+    )
+
+    for person in rows.iterator(chunk_size=CHUNK_SIZE):
+        given = _text(f"{person.first_name} {person.middle_name}")
+        surname = _text(person.last_name)
+        name = " ".join(part for part in (given, f"/{surname}/") if part)
+        lines = [f"0 @I{person.pk}@ INDI", f"1 NAME {name}"]
+        if given:
+            lines.append(f"2 GIVN {given}")
+        if surname:
+            lines.append(f"2 SURN {surname}")
+        lines.append(f"1 SEX {person.sex if person.sex in Sex.values else 'U'}")
+
+        # bulk-loaded people may not have their search row yet
+        row = getattr(person, "search_row", None)
+        if row is not None and row.has_birth:
+            lines += _event(
+                "BIRT", row.birth_date, row.birth_city_name, row.birth_county_name
+            )
+        if row is not None and row.has_death:
+            lines += _event(
+                "DEAT", row.death_date, row.death_city_name, row.death_county_name
+            )
+
+        if person.parents_exported:
+            lines.append(f"1 FAMC @F{person.parent_family}@")
+        for key in sorted(set(person.parent_of) | set(person.spouse_in)):
+            lines.append(f"1 FAMS @F{key}@")
+
+        yield "\n".join(lines) + "\n"
+
+
+def _families(people):
+    """
+    One FAM record per couple or parent pair with an exported member among
+    the parents: the parent pairs of children (grouped in SQL) merged with
+    the marriages, both read in family key order.
+    """
+    exported = people.values("pk")
+
+    def exported_id(field):
+        return Exists(Person.objects.filter(pk__in=exported, pk=OuterRef(field)))
+
+    parent_pairs = (
+        Person.objects.filter(Q(mother_id__in=exported) | Q(father_id__in=exported))
+        .order_by()
+        .values("mother_id", "father_id")
+        .annotate(
+            low=Least("mother_id", "father_id"),
+            high=Greatest("mother_id", "father_id"),
+            mother_exported=exported_id("mother_id"),
+            father_exported=exported_id("father_id"),
+            children=ArrayAgg(
+                "pk", filter=Q(pk__in=exported), order_by="pk", default=Value([])
+            ),
+        )
+        .order_by("low", "high")
+    )
+    marriages = (
+        Marriage.objects.filter(Q(spouse1_id__in=exported) | Q(spouse2_id__in=exported))
+        .annotate(
+            low=Least("spouse1_id", "spouse2_id"),
+            high=Greatest("spouse1_id", "spouse2_id"),
+            spouse1_exported=exported_id("spouse1_id"),
+            spouse2_exported=exported_id("spouse2_id"),
+        )
+        .values(
+            "low",
+            "high",
+            "spouse1_id",
+            "spouse2_id",
+            "spouse1_exported",
+            "spouse2_exported",
+            "spouse1__sex",
+            "spouse2__sex",
+            "marriage_date",
+            "marriage_city__city_name",
+            "marriage_county__county_name",
+        )
+        .order_by("low", "high", "marriage_date", "pk")
+    )
+
+    merged = heapq.merge(
+        ((row["low"], row["high"], 0, row) for row in _stream(parent_pairs)),
+        ((row["low"], row["high"], 1, row) for row in _stream(marriages)),
+        key=lambda item: item[:3],
+    )
+
+    for (low, high), items in groupby(merged, key=lambda item: item[:2]):
+        rows = [(kind, row) for _, _, kind, row in items]
+        yield _family(low, high, rows)
+
+
+def _stream(queryset):
+    return queryset.iterator(chunk_size=CHUNK_SIZE)
+
+
+def _family(low: int, high: int, rows) -> str:
+    husband = wife = None
+    children = []
+    events = []
+
+    for kind, row in rows:
+        if kind == 0:
+            if row["father_exported"]:
+                husband = row["father_id"]
+            if row["mother_exported"]:
+                wife = row["mother_id"]
+            children += row["children"]
+
+    for kind, row in rows:
+        if kind != 1:
+            continue
+        spouses = [
+            (row["spouse1_id"], row["spouse1__sex"], row["spouse1_exported"]),
+            (row["spouse2_id"], row["spouse2__sex"], row["spouse2_exported"]),
+        ]
+        # by sex where it is known, otherwise spouse1 as HUSB
+        spouses.sort(key=lambda s: {Sex.MALE: 0, Sex.FEMALE: 1}.get(s[1], 2))
+        for person_id, sex, exported in spouses:
+            if not exported or person_id in (husband, wife):
+                continue
+            if husband is None and sex != Sex.FEMALE:
+                husband = person_id
+            elif wife is None:
+                wife = person_id
+        events += _event(
+            "MARR",
+            row["marriage_date"],
+            row["marriage_city__city_name"],
+            row["marriage_county__county_name"],
+        )
+
+    lines = [f"0 @F{low}_{high}@ FAM"]
+    if husband is not None:
+        lines.append(f"1 HUSB @I{husband}@")
+    if wife is not None:
+        lines.append(f"1 WIFE @I{wife}@")
+    lines += [f"1 CHIL @I{child}@" for child in sorted(set(children))]
+    lines += events
+
+    return "\n".join(lines) + "\n"
+
+
+def records(people):
+    """HEAD, the INDI records, the FAM records and TRLR, one string each."""
+    yield _header()
+    yield from _individuals(people)
+    yield from _families(people)
+    yield "0 TRLR\n"
+
+
+def export(people, write_size: int = WRITE_SIZE):
+    """records() of the Person queryset `people`, joined into ~write_size chunks."""
+    buffer, size = [], 0
+
+    for record in records(people):
+        buffer.append(record)
+        size += len(record)
+        if size >= write_size:
+            yield "".join(buffer)
+            buffer, size = [], 0
+
+    if buffer:
+        yield "".join(buffer)
@@ -1,3 +1,4 @@
+import functools
 import io
 import os
 import random
@@ -5,6 +6,9 @@ import random
 from PIL import Image, ImageDraw, ImageFont
 
 
+# fonts are loaded once per (weight, size) and process; a certificate
+# draws with four of them
+@functools.cache
 def _get_font(bold=False, size=18):
     """Try to load a system serif font, fallback to default."""
     bold_paths = [
@@ -120,19 +124,63 @@ def _draw_footer(draw, width, height, border_color, reg_num):
     )
 
 
-def generate_birth_certificate_image(person, birth):
-    """Return a PIL Image of a fake Illinois birth certificate."""
-    width, height = 850, 1100
-    bg_color = (255, 252, 235)
-    border_color = (0, 80, 70)  # teal
-    text_dark = (25, 25, 25)
+# (title, border color, registration number prefix) per certificate type
+CERTIFICATES = {
+    "birth": ("CERTIFICATE OF LIVE BIRTH", (0, 80, 70), "IL-B"),  # teal
+    "death": ("CERTIFICATE OF DEATH", (90, 20, 20), "IL-D"),  # maroon
+}
+
+WIDTH, HEIGHT = 850, 1100
+BG_COLOR = (255, 252, 235)
+TEXT_DARK = (25, 25, 25)
 
-    img = Image.new("RGB", (width, height), color=bg_color)
+
+@functools.cache
+def _certificate_base(kind):
+    """
+    The blank certificate of a type (background, frame and header), drawn
+    once per process, with the y where its fields start. Never drawn on:
+    render_certificate works on a copy.
+    """
+    title, border_color, _ = CERTIFICATES[kind]
+
+    img = Image.new("RGB", (WIDTH, HEIGHT), color=BG_COLOR)
     draw = ImageDraw.Draw(img)
 
-    _draw_certificate_frame(draw, width, height, border_color, bg_color)
-    y = _draw_header(draw, width, "CERTIFICATE OF LIVE BIRTH", border_color)
+    _draw_certificate_frame(draw, WIDTH, HEIGHT, border_color, BG_COLOR)
+    y = _draw_header(draw, WIDTH, title, border_color)
+    return img, y
+
+
+def render_certificate(kind, fields, reg_num):
+    """A certificate of type `kind` ("birth", "death") showing `fields`."""
+    _, border_color, _ = CERTIFICATES[kind]
+    base, y = _certificate_base(kind)
+
+    img = base.copy()
+    draw = ImageDraw.Draw(img)
+
+    _draw_fields(draw, fields, y, WIDTH, border_color, TEXT_DARK)
+    _draw_footer(draw, WIDTH, HEIGHT, border_color, reg_num)
+    return img
 
+
+def render_files(kind, fields, reg_num):
+    """
+    render_certificate() as {"png": full size PNG, **derivatives()}, all
+    encoded; needs no database or Django.
+    """
+    img = render_certificate(kind, fields, reg_num)
+    return {"png": image_to_bytes(img), **derivatives(img)}
+
+
+def _reg_num(kind, raw):
+    year = int(str(raw)[:4]) if raw else 1900
+    return f"{CERTIFICATES[kind][2]}-{year}-{random.randint(10000, 99999)}"
+
+
+def birth_certificate_fields(person, birth):
+    """The (fields, registration number) a birth certificate shows."""
     name = f"{person.first_name} {person.middle_name or ''} {person.last_name}".strip()
     birth_date = str(birth.birth_date) if birth and birth.birth_date else "Unknown"
     birth_city = str(birth.birth_city) if birth and birth.birth_city else "Unknown"
@@ -163,29 +211,12 @@ def generate_birth_certificate_image(person, birth):
         ("Father's Name:", father),
     ]
 
-    _draw_fields(draw, fields, y, width, border_color, text_dark)
-
     raw = birth.birth_date if birth and birth.birth_date else None
-    year = int(str(raw)[:4]) if raw else 1900
-    reg_num = f"IL-B-{year}-{random.randint(10000, 99999)}"
-    _draw_footer(draw, width, height, border_color, reg_num)
-
-    return img
+    return fields, _reg_num("birth", raw)
 
 
-def generate_death_certificate_image(person, death):
-    """Return a PIL Image of a fake Illinois death certificate."""
-    width, height = 850, 1100
-    bg_color = (255, 252, 235)
-    border_color = (90, 20, 20)  # maroon
-    text_dark = (25, 25, 25)
-
-    img = Image.new("RGB", (width, height), color=bg_color)
-    draw = ImageDraw.Draw(img)
-
-    _draw_certificate_frame(draw, width, height, border_color, bg_color)
-    y = _draw_header(draw, width, "CERTIFICATE OF DEATH", border_color)
-
+def death_certificate_fields(person, death):
+    """The (fields, registration number) a death certificate shows."""
     name = f"{person.first_name} {person.middle_name or ''} {person.last_name}".strip()
     death_date = str(death.death_date) if death and death.death_date else "Unknown"
     death_city = str(death.death_city) if death and death.death_city else "Unknown"
@@ -206,21 +237,62 @@ def generate_death_certificate_image(person, death):
         ("Age at Death:", age),
     ]
 
-    _draw_fields(draw, fields, y, width, border_color, text_dark)
-
     raw = death.death_date if death and death.death_date else None
-    year = int(str(raw)[:4]) if raw else 1900
-    reg_num = f"IL-D-{year}-{random.randint(10000, 99999)}"
-    _draw_footer(draw, width, height, border_color, reg_num)
+    return fields, _reg_num("death", raw)
 
-    return img
+
+def generate_birth_certificate_image(person, birth):
+    """Return a PIL Image of a fake Illinois birth certificate."""
+    return render_certificate("birth", *birth_certificate_fields(person, birth))
+
+
+def generate_death_certificate_image(person, death):
+    """Return a PIL Image of a fake Illinois death certificate."""
+    return render_certificate("death", *death_certificate_fields(person, death))
+
+
+# smaller copies of record images for pages to choose from with srcset:
+# name suffix -> (width, PIL format, save options). WebP's method 2 is
+# about three times faster to encode than the default 4, for 4% more bytes.
+DERIVATIVES = {
+    "medium.webp": (600, "WEBP", {"quality": 80, "method": 2}),
+    "medium.jpg": (600, "JPEG", {"quality": 80, "optimize": True, "progressive": True}),
+    "thumb.webp": (240, "WEBP", {"quality": 80, "method": 2}),
+    "thumb.jpg": (240, "JPEG", {"quality": 80, "optimize": True}),
+}
+
+
+def derivatives(img):
+    """The DERIVATIVES of a PIL Image, encoded: {suffix: bytes}."""
+    # widest first, each scaled from the one before: much cheaper than
+    # starting from the full size every time. Never scaled up.
+    scaled = {}
+    current = img.convert("RGB")
+    for width in sorted({width for width, _, _ in DERIVATIVES.values()}, reverse=True):
+        if current.width > width:
+            height = round(current.height * width / current.width)
+            current = current.resize(
+                (width, height), Image.Resampling.LANCZOS, reducing_gap=2.0
+            )
+        scaled[width] = current
+
+    encoded = {}
+    for suffix, (width, image_format, options) in DERIVATIVES.items():
+        buffer = io.BytesIO()
+        scaled[width].save(buffer, format=image_format, **options)
+        encoded[suffix] = buffer.getvalue()
+    return encoded
+
+
+def image_to_bytes(img):
+    """PNG bytes of a PIL Image."""
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
 
 
 def image_to_content_file(img, filename):
     """Convert a PIL Image to a Django ContentFile for saving to an ImageField."""
     from django.core.files.base import ContentFile
 
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG")
-    buffer.seek(0)
-    return ContentFile(buffer.read(), name=filename)
+    return ContentFile(image_to_bytes(img), name=filename)
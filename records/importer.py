@@ -0,0 +1,566 @@
+import csv
+import re
+import time
+from datetime import date
+
+from django.db import connection
+from django.db.models import Q
+
+from records import ancestry
+from records.models import (
+    Birth,
+    City,
+    County,
+    Death,
+    Marriage,
+    Person,
+    PersonSearch,
+    Sex,
+)
+from records.search import participants, result_cache, search_table
+from records.search.documents import refresh_documents
+from records.search.normalize import fill_norms
+
+# Bulk loader behind `manage.py import_records`. Records are read as a
+# stream and written in batches with bulk_create; file-local references
+# (mother, father, spouses) are resolved in a second pass once every
+# person has an id, and the derived tables the signals would have kept
+# current are refreshed for the imported rows at the end.
+
+BATCH_SIZE = 5000
+
+_MONTHS = {
+    "JAN": 1,
+    "FEB": 2,
+    "MAR": 3,
+    "APR": 4,
+    "MAY": 5,
+    "JUN": 6,
+    "JUL": 7,
+    "AUG": 8,
+    "SEP": 9,
+    "OCT": 10,
+    "NOV": 11,
+    "DEC": 12,
+}
+
+_SEXES = {"M": Sex.MALE, "F": Sex.FEMALE}
+
+_GEDCOM_LINE = re.compile(r"^\s*(\d+)\s+(?:(@[^@]+@)\s+)?(\S+)(?:\s(.*))?$")
+_GEDCOM_DATE = re.compile(r"^(\d{1,2}) ([A-Z]{3}) (\d{3,4})$")
+
+_EVENTS = {"BIRT": "birth", "DEAT": "death", "MARR": "marriage"}
+
+
+def parse_date(value: str | None) -> date | None:
+    """ISO dates (CSV) and exact GEDCOM dates ("5 JUN 1920"); None otherwise."""
+    value = (value or "").strip().upper()
+    if not value:
+        return None
+
+    match = _GEDCOM_DATE.match(value)
+    try:
+        if match:
+            day, month, year = match.groups()
+            return date(int(year), _MONTHS[month], int(day))
+        return date.fromisoformat(value)
+    except (KeyError, ValueError):
+        # approximate, partial or impossible dates
+        return None
+
+
+def _int(value) -> int | None:
+    digits = re.match(r"\d+", str(value or "").strip())
+    return int(digits.group()) if digits else None
+
+
+class Places:
+    """
+    The counties and cities named in a file, looked up in maps loaded in
+    two queries. A city missing from a known county is created once.
+    """
+
+    def __init__(self):
+        self.counties = {}
+        for county in County.objects.all():
+            self.counties[str(county.county_code)] = county
+            self.counties[county.county_name.lower()] = county
+
+        self.cities = {
+            (city.county_id, city.city_name.lower()): city
+            for city in City.objects.all()
+        }
+        self.created_cities = 0
+
+    def county(self, value) -> County | None:
+        """By code ("028", 28) or name ("Franklin", "Franklin County")."""
+        value = str(value or "").strip()
+        if value.isdigit():
+            return self.counties.get(str(int(value)))
+
+        value = value.lower().removesuffix(" county").strip()
+        return self.counties.get(value)
+
+    def city(self, county: County | None, name: str | None) -> City | None:
+        name = (name or "").strip()
+        if county is None or not name:
+            return None
+
+        key = (county.pk, name.lower())
+        if key not in self.cities:
+            self.cities[key] = City.objects.create(county=county, city_name=name)
+            self.created_cities += 1
+        return self.cities[key]
+
+
+# READERS ============
+# Both yield ("person", {...}), ("marriage", {...}) and ("parents", {...})
+# items with the same keys; "ref" and the references are file-local ids.
+
+PERSON_FIELDS = (
+    "ref",
+    "first",
+    "middle",
+    "last",
+    "sex",
+    "birth_date",
+    "birth_county",
+    "birth_city",
+    "death_date",
+    "death_age",
+    "death_county",
+    "death_city",
+)
+
+
+def read_csv(path):
+    """
+    People, one per row, with the columns of data/mock's people (id, first,
+    middle, last, sex, birth_date, birth_county_code, birth_city, ...,
+    mother, father); a file whose header has spouse1/spouse2 holds
+    marriages instead (marriage_date, marriage_county_code, marriage_city).
+    County columns may hold codes or names.
+    """
+
+    def county(row, event):
+        return row.get(f"{event}_county_code") or row.get(f"{event}_county")
+
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        marriages = "spouse1" in (reader.fieldnames or ())
+
+        for row in reader:
+            if marriages:
+                yield (
+                    "marriage",
+                    {
+                        "spouse1": row["spouse1"],
+                        "spouse2": row["spouse2"],
+                        "marriage_date": row.get("marriage_date"),
+                        "marriage_county": county(row, "marriage"),
+                        "marriage_city": row.get("marriage_city"),
+                    },
+                )
+                continue
+
+            yield (
+                "person",
+                {
+                    "ref": row["id"],
+                    "first": row.get("first"),
+                    "middle": row.get("middle"),
+                    "last": row.get("last"),
+                    "sex": row.get("sex"),
+                    "birth_date": row.get("birth_date"),
+                    "birth_county": county(row, "birth"),
+                    "birth_city": row.get("birth_city"),
+                    "death_date": row.get("death_date"),
+                    "death_age": row.get("age") or row.get("death_age"),
+                    "death_county": county(row, "death"),
+                    "death_city": row.get("death_city"),
+                },
+            )
+            if row.get("mother") or row.get("father"):
+                yield (
+                    "parents",
+                    {
+                        "child": row["id"],
+                        "mother": row.get("mother") or None,
+                        "father": row.get("father") or None,
+                    },
+                )
+
+
+def _gedcom_records(f):
+    """(xref, tag, [(level, tag, value), ...]) per level 0 record."""
+    record = None
+
+    for line in f:
+        match = _GEDCOM_LINE.match(line.rstrip("\r\n"))
+        if not match:
+            continue
+
+        level, xref, tag, value = match.groups()
+        if level == "0":
+            if record:
+                yield record
+            record = (xref, tag, [])
+        elif record:
+            record[2].append((int(level), tag, (value or "").strip()))
+
+    if record:
+        yield record
+
+
+def _place(value: str) -> tuple[str | None, str | None]:
+    """(city, county) of "City, County County, Illinois, USA" (as exported)."""
+    parts = [part.strip() for part in value.split(",") if part.strip()]
+    county = next(
+        (i for i, part in enumerate(parts) if part.lower().endswith(" county")), None
+    )
+
+    if county is not None:
+        return (parts[county - 1] if county else None), parts[county]
+    # no "County" part: read it as "City, County, ..."
+    return (
+        parts[0] if parts else None,
+        parts[1] if len(parts) > 1 else None,
+    )
+
+
+def _gedcom_person(xref: str, lines) -> dict:
+    person = dict.fromkeys(PERSON_FIELDS)
+    person["ref"] = xref
+    event = None
+
+    for level, tag, value in lines:
+        if level == 1:
+            event = _EVENTS.get(tag)
+            if tag == "NAME":
+                given, _, rest = value.partition("/")
+                first, _, middle = given.strip().partition(" ")
+                person["first"], person["middle"] = first, middle.strip()
+                person["last"] = rest.partition("/")[0].strip()
+            elif tag == "SEX":
+                person["sex"] = value
+        elif level == 2 and event and tag == "DATE":
+            person[f"{event}_date"] = value
+        elif level == 2 and event and tag == "PLAC":
+            person[f"{event}_city"], person[f"{event}_county"] = _place(value)
+        elif level == 2 and event == "death" and tag == "AGE":
+            person["death_age"] = value
+
+    return person
+
+
+def read_gedcom(path):
+    """INDI records as people, FAM records as parent links and marriages."""
+    with open(path, encoding="utf-8-sig") as f:
+        for xref, tag, lines in _gedcom_records(f):
+            if tag == "INDI" and xref:
+                yield "person", _gedcom_person(xref, lines)
+            elif tag == "FAM":
+                links = {"HUSB": None, "WIFE": None}
+                children = []
+                marriages = []
+
+                for level, sub, value in lines:
+                    if level == 1 and sub in links:
+                        links[sub] = value
+                    elif level == 1 and sub == "CHIL":
+                        children.append(value)
+                    elif level == 1 and sub == "MARR":
+                        marriages.append({"marriage_date": None})
+                    elif level == 2 and marriages and sub == "DATE":
+                        marriages[-1]["marriage_date"] = value
+                    elif level == 2 and marriages and sub == "PLAC":
+                        city, county = _place(value)
+                        marriages[-1]["marriage_city"] = city
+                        marriages[-1]["marriage_county"] = county
+
+                for child in children:
+                    yield (
+                        "parents",
+                        {
+                            "child": child,
+                            "mother": links["WIFE"],
+                            "father": links["HUSB"],
+                        },
+                    )
+                if links["HUSB"] and links["WIFE"]:
+                    for marriage in marriages:
+                        yield (
+                            "marriage",
+                            {
+                                "spouse1": links["HUSB"],
+                                "spouse2": links["WIFE"],
+                                **marriage,
+                            },
+                        )
+
+
+def read_mock(people: dict, marriages: list):
+    """The people and marriages of data/mock's family tree (load_mock_data)."""
+    for ref, person in people.items():
+        yield (
+            "person",
+            {
+                "ref": ref,
+                "first": person["first"],
+                "middle": person["middle"],
+                "last": person["last"],
+                "sex": person["sex"],
+                "birth_date": person["birth_date"],
+                "birth_county": person["birth_county_code"],
+                "birth_city": person["birth_city"],
+                "death_date": person["death_date"],
+                "death_age": person["age"],
+                "death_county": person["death_county_code"],
+                "death_city": person["death_city"],
+            },
+        )
+        if person.get("mother") or person.get("father"):
+            yield (
+                "parents",
+                {
+                    "child": ref,
+                    "mother": person.get("mother"),
+                    "father": person.get("father"),
+                },
+            )
+
+    for marriage in marriages:
+        yield (
+            "marriage",
+            {
+                "spouse1": marriage["spouse1"],
+                "spouse2": marriage["spouse2"],
+                "marriage_date": marriage["marriage_date"],
+                # [code, name]
+                "marriage_county": marriage["marriage_county"][0],
+                "marriage_city": marriage["marriage_city"],
+            },
+        )
+
+
+def read(path):
+    """read_gedcom() for .ged files, read_csv() for anything else."""
+    if str(path).lower().endswith(".ged"):
+        return read_gedcom(path)
+    return read_csv(path)
+
+
+# LOADING ============
+
+_SET_PARENTS_SQL = """
+UPDATE {person} AS p
+SET mother_id = v.mother_id, father_id = v.father_id
+FROM (VALUES {values}) AS v (id, mother_id, father_id)
+WHERE p.id = v.id
+"""
+
+
+class Importer:
+    """
+    load() the items of one or more readers, then finish(): parent links
+    and marriages, then the derived tables. `progress` is called with a
+    line of text after each batch and phase.
+    """
+
+    def __init__(self, batch_size: int = BATCH_SIZE, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress or (lambda message: None)
+        self.places = Places()
+
+        self.ids = {}  # file-local ref -> Person id
+        self.parents = {}  # child ref -> [mother ref, father ref]
+        self.marriages = []
+        self.person_ids = []
+        self.marriage_ids = []
+        self.events = 0  # Birth and Death rows
+
+        self.unresolved = 0
+        self.timings = {}
+        self._people = []
+
+    def _phase(self, name: str, started: float, count: int) -> None:
+        elapsed = time.perf_counter() - started
+        self.timings[name] = (count, elapsed)
+        rate = count / elapsed if elapsed else count
+        self.progress(f"{name}: {count} in {elapsed:.1f}s ({rate:,.0f}/s)")
+
+    def load(self, items) -> None:
+        started = time.perf_counter()
+        count = len(self.person_ids)
+
+        for kind, item in items:
+            if kind == "person":
+                self._people.append(item)
+                if len(self._people) >= self.batch_size:
+                    self._flush_people()
+            elif kind == "parents":
+                links = self.parents.setdefault(item["child"], [None, None])
+                links[0] = links[0] or item["mother"]
+                links[1] = links[1] or item["father"]
+            elif kind == "marriage":
+                self.marriages.append(item)
+
+        self._flush_people()
+        if len(self.person_ids) > count:
+            self._phase("people", started, len(self.person_ids) - count)
+
+    def _event(self, model, event: str, person, item: dict):
+        when = parse_date(item[f"{event}_date"])
+        county = self.places.county(item[f"{event}_county"])
+        city = self.places.city(county, item[f"{event}_city"])
+
+        if when is None and county is None and city is None:
+            return None
+
+        fields = {
+            "person": person,
+            f"{event}_date": when,
+            f"{event}_county": county,
+            f"{event}_city": city,
+        }
+        if event == "death":
+            fields["death_age"] = _int(item["death_age"])
+        return model(**fields)
+
+    def _flush_people(self) -> None:
+        if not self._people:
+            return
+
+        people = []
+        for item in self._people:
+            person = Person(
+                first_name=(item["first"] or "").strip(),
+                middle_name=(item["middle"] or "").strip(),
+                last_name=(item["last"] or "").strip(),
+                sex=_SEXES.get((item["sex"] or "").strip().upper(), Sex.UNKNOWN),
+            )
+            fill_norms(person)
+            people.append(person)
+
+        Person.objects.bulk_create(people)
+
+        births, deaths, rows = [], [], []
+        for item, person in zip(self._people, people):
+            self.ids[item["ref"]] = person.pk
+            self.person_ids.append(person.pk)
+
+            birth = self._event(Birth, "birth", person, item)
+            death = self._event(Death, "death", person, item)
+            if birth:
+                births.append(birth)
+            if death:
+                deaths.append(death)
+            rows.append(search_table.build_row(person, birth, death))
+
+        Birth.objects.bulk_create(births)
+        Death.objects.bulk_create(deaths)
+        PersonSearch.objects.bulk_create(rows)
+        self.events += len(births) + len(deaths)
+
+        self.progress(f"  {len(self.person_ids)} people loaded")
+        self._people = []
+
+    def _resolve(self, ref):
+        if ref is None:
+            return None
+        pk = self.ids.get(ref)
+        if pk is None:
+            self.unresolved += 1
+        return pk
+
+    def link_parents(self) -> None:
+        started = time.perf_counter()
+        table = connection.ops.quote_name(Person._meta.db_table)
+        rows = []
+        count = 0
+
+        def flush():
+            sql = _SET_PARENTS_SQL.format(
+                person=table,
+                values=", ".join(["(%s::bigint, %s::bigint, %s::bigint)"] * len(rows)),
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [value for row in rows for value in row])
+
+        for child, (mother, father) in self.parents.items():
+            child_id = self._resolve(child)
+            if child_id is None:
+                continue
+            rows.append((child_id, self._resolve(mother), self._resolve(father)))
+            if len(rows) >= self.batch_size:
+                flush()
+                count += len(rows)
+                rows = []
+
+        if rows:
+            flush()
+            count += len(rows)
+
+        self.parents = {}
+        self._phase("parent links", started, count)
+
+    def link_marriages(self) -> None:
+        started = time.perf_counter()
+
+        for start in range(0, len(self.marriages), self.batch_size):
+            batch = {}
+            for item in self.marriages[start : start + self.batch_size]:
+                spouses = self._resolve(item["spouse1"]), self._resolve(item["spouse2"])
+                if None in spouses or spouses[0] == spouses[1]:
+                    continue
+                # Marriage.save() keeps the lower id first
+                spouse1, spouse2 = sorted(spouses)
+                when = parse_date(item.get("marriage_date"))
+                county = self.places.county(item.get("marriage_county"))
+                # one row per unique_marriages key, or the upsert fails
+                batch[(spouse1, spouse2, when)] = Marriage(
+                    spouse1_id=spouse1,
+                    spouse2_id=spouse2,
+                    marriage_date=when,
+                    marriage_county=county,
+                    marriage_city=self.places.city(county, item.get("marriage_city")),
+                )
+
+            marriages = Marriage.objects.bulk_create(
+                batch.values(),
+                update_conflicts=True,
+                unique_fields=["spouse1", "spouse2", "marriage_date"],
+                update_fields=["marriage_county", "marriage_city"],
+            )
+            participants.refresh_marriages(marriages)
+            self.marriage_ids += [marriage.pk for marriage in marriages]
+
+        self.marriages = []
+        self._phase("marriages", started, len(self.marriage_ids))
+
+    def refresh_derived(self) -> None:
+        """
+        The rest of what the signals do for single saves: name keys, norms
+        and search rows were written with the people, participant rows
+        with the marriages.
+        """
+        started = time.perf_counter()
+
+        for start in range(0, len(self.person_ids), self.batch_size):
+            ids = self.person_ids[start : start + self.batch_size]
+            refresh_documents(Birth, Q(person_id__in=ids))
+            refresh_documents(Death, Q(person_id__in=ids))
+            refresh_documents(PersonSearch, Q(pk__in=ids))
+            ancestry.fill("p.id = ANY(%(ids)s)", {"ids": ids})
+
+        for start in range(0, len(self.marriage_ids), self.batch_size):
+            ids = self.marriage_ids[start : start + self.batch_size]
+            refresh_documents(Marriage, Q(pk__in=ids))
+
+        result_cache.invalidate()
+        self._phase("derived tables", started, len(self.person_ids))
+
+    def finish(self) -> None:
+        self.link_parents()
+        self.link_marriages()
+        self.refresh_derived()
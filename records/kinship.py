@@ -0,0 +1,344 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from records.models import Marriage, Person, Sex
+from records.search import result_cache
+
+# Relationship calculator. The parent links and marriages are copied into
+# a compact in-memory graph (int32 index arrays, children and spouses in
+# CSR form) once per data version, and a relationship is a bidirectional
+# BFS over it, so a lookup never touches the database.
+
+# longest path (in parent/child/spouse steps) looked for
+MAX_STEPS = 16
+
+UP, DOWN, SPOUSE = "U", "D", "S"
+_INVERSE = {UP: DOWN, DOWN: UP, SPOUSE: SPOUSE}
+
+_SEX_CODES = {Sex.MALE: 1, Sex.FEMALE: 2}
+
+# (male, female, unknown)
+_WORDS = {
+    "parent": ("father", "mother", "parent"),
+    "child": ("son", "daughter", "child"),
+    "sibling": ("brother", "sister", "sibling"),
+    "pibling": ("uncle", "aunt", "aunt/uncle"),
+    "nibling": ("nephew", "niece", "niece/nephew"),
+    "spouse": ("husband", "wife", "spouse"),
+}
+
+_STEP_WORDS = {UP: "parent", DOWN: "child", SPOUSE: "spouse"}
+
+_ORDINALS = (
+    "first",
+    "second",
+    "third",
+    "fourth",
+    "fifth",
+    "sixth",
+    "seventh",
+    "eighth",
+    "ninth",
+    "tenth",
+)
+
+
+def _ordinal(n: int) -> str:
+    if n <= len(_ORDINALS):
+        return _ORDINALS[n - 1]
+    if n % 100 in (11, 12, 13):
+        return f"{n}th"
+    suffix = {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+
+def _removed(n: int) -> str:
+    if n == 0:
+        return ""
+    return {1: " once removed", 2: " twice removed"}.get(n, f" {n} times removed")
+
+
+def _csr(owners: np.ndarray, members: np.ndarray, size: int):
+    """(start, members sorted by owner): members of i are members[start[i]:start[i+1]]"""
+    order = np.argsort(owners, kind="stable")
+    start = np.zeros(size + 1, dtype=np.int32)
+    start[1:] = np.cumsum(np.bincount(owners, minlength=size))
+    return start, members[order].astype(np.int32)
+
+
+class KinshipGraph:
+    def __init__(
+        self, ids, sex, mother, father, child_start, children, spouse_start, spouses
+    ):
+        self.ids = ids
+        self.sex = sex
+        self.mother = mother
+        self.father = father
+        self.child_start = child_start
+        self.children = children
+        self.spouse_start = spouse_start
+        self.spouses = spouses
+
+    @classmethod
+    def build(cls):
+        """Snapshot Person and Marriage (two queries)."""
+        people = list(
+            Person.objects.order_by("id").values_list(
+                "id", "mother_id", "father_id", "sex"
+            )
+        )
+        ids = np.array([p[0] for p in people], dtype=np.int64)
+        sex = np.array([_SEX_CODES.get(p[3], 0) for p in people], dtype=np.int8)
+
+        def index(values) -> np.ndarray:
+            """Person ids -> positions in `ids`, -1 for None/unknown."""
+            raw = np.fromiter((-1 if v is None else v for v in values), dtype=np.int64)
+            if not len(ids):
+                return np.full(len(raw), -1, dtype=np.int32)
+            found = np.searchsorted(ids, raw).clip(0, len(ids) - 1)
+            return np.where(ids[found] == raw, found, -1).astype(np.int32)
+
+        mother = index(p[1] for p in people)
+        father = index(p[2] for p in people)
+
+        couples = list(Marriage.objects.values_list("spouse1_id", "spouse2_id"))
+        spouse1 = index(c[0] for c in couples)
+        spouse2 = index(c[1] for c in couples)
+
+        # child lists: one (parent, child) pair per known parent link
+        child = np.arange(len(ids), dtype=np.int32)
+        parents = np.concatenate([mother, father])
+        kids = np.concatenate([child, child])
+        linked = parents >= 0
+        child_start, children = _csr(parents[linked], kids[linked], len(ids))
+
+        # spouse lists: each marriage in both directions
+        married = (spouse1 >= 0) & (spouse2 >= 0)
+        spouse1, spouse2 = spouse1[married], spouse2[married]
+        spouse_start, spouses = _csr(
+            np.concatenate([spouse1, spouse2]),
+            np.concatenate([spouse2, spouse1]),
+            len(ids),
+        )
+
+        return cls(
+            ids, sex, mother, father, child_start, children, spouse_start, spouses
+        )
+
+    def index(self, person_id: int) -> int | None:
+        i = int(np.searchsorted(self.ids, person_id))
+        if i < len(self.ids) and self.ids[i] == person_id:
+            return i
+        return None
+
+    def _neighbors(self, i: int):
+        for parent in (self.mother[i], self.father[i]):
+            if parent >= 0:
+                yield int(parent), UP
+        for c in self.children[self.child_start[i] : self.child_start[i + 1]]:
+            yield int(c), DOWN
+        for s in self.spouses[self.spouse_start[i] : self.spouse_start[i + 1]]:
+            yield int(s), SPOUSE
+
+    def path(self, source: int, target: int, max_steps: int = MAX_STEPS):
+        """
+        Shortest (nodes, steps) from index `source` to `target`, or None.
+        steps[k] is how nodes[k + 1] relates to nodes[k] (U: parent,
+        D: child, S: spouse). Of equally short paths the one with the
+        fewest spouse steps wins, so blood relations beat in-law routes.
+        """
+        if source == target:
+            return [source], []
+
+        # node -> (node it was reached from, step taken), per side
+        seen = ({source: (None, None)}, {target: (None, None)})
+        frontiers = ([source], [target])
+        depth = [0, 0]
+
+        while frontiers[0] and frontiers[1] and sum(depth) < max_steps:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            mine, other = seen[side], seen[1 - side]
+            depth[side] += 1
+            meets = []
+            frontier = []
+
+            for node in frontiers[side]:
+                for nxt, step in self._neighbors(node):
+                    if nxt in mine:
+                        continue
+                    mine[nxt] = (node, step)
+                    frontier.append(nxt)
+                    if nxt in other:
+                        meets.append(nxt)
+
+            frontiers = (
+                (frontier, frontiers[1]) if side == 0 else (frontiers[0], frontier)
+            )
+
+            if meets:
+                paths = [self._join(meet, seen) for meet in meets]
+                return min(paths, key=lambda p: (len(p[1]), p[1].count(SPOUSE)))
+
+        return None
+
+    def _join(self, meet: int, seen):
+        nodes, steps = [meet], []
+
+        # back to the source
+        node, step = seen[0][meet]
+        while node is not None:
+            nodes.insert(0, node)
+            steps.insert(0, step)
+            node, step = seen[0][node]
+
+        # on to the target; these steps were taken from the target's end
+        node, step = seen[1][meet]
+        while node is not None:
+            nodes.append(node)
+            steps.append(_INVERSE[step])
+            node, step = seen[1][node]
+
+        return nodes, steps
+
+    # LABELS ============
+
+    def _word(self, kind: str, node: int) -> str:
+        male, female, unknown = _WORDS[kind]
+        return {1: male, 2: female}.get(int(self.sex[node]), unknown)
+
+    def _full_siblings(self, a: int, b: int) -> bool:
+        return (
+            self.mother[a] >= 0
+            and self.father[a] >= 0
+            and self.mother[a] == self.mother[b]
+            and self.father[a] == self.father[b]
+        )
+
+    def _blood(self, up: int, down: int, nodes) -> str:
+        """Label of nodes[-1] seen from nodes[0] when the path is U^up D^down."""
+        first, last = nodes[0], nodes[-1]
+
+        if down == 0:
+            word = self._word("parent", last)
+            if up == 1:
+                return word
+            return "great-" * (up - 2) + "grand" + word
+        if up == 0:
+            word = self._word("child", last)
+            if down == 1:
+                return word
+            return "great-" * (down - 2) + "grand" + word
+        if up == 1 and down == 1:
+            word = self._word("sibling", last)
+            return word if self._full_siblings(first, last) else f"half-{word}"
+        if up == 1:
+            return "great-" * (down - 2) + self._word("nibling", last)
+        if down == 1:
+            return "great-" * (up - 2) + self._word("pibling", last)
+
+        return f"{_ordinal(min(up, down) - 1)} cousin{_removed(abs(up - down))}"
+
+    def label(self, nodes, steps) -> str:
+        """What nodes[-1] is to nodes[0], e.g. "second cousin once removed"."""
+        moves = "".join(steps)
+        blood = moves.lstrip(UP)
+
+        if not moves:
+            return "self"
+        if SPOUSE not in moves and not blood.lstrip(DOWN):
+            return self._blood(len(moves) - len(blood), len(blood), nodes)
+        if moves == SPOUSE:
+            return self._word("spouse", nodes[-1])
+
+        rest = moves.strip(SPOUSE)
+        up = len(rest) - len(rest.lstrip(UP))
+        down = len(rest) - up
+
+        if len(rest) == len(moves) - 1 and not rest.lstrip(UP).lstrip(DOWN):
+            # the spouse's blood relative
+            if moves[0] == SPOUSE:
+                relative = self._blood(up, down, nodes[1:])
+                if (up, down) == (0, 1):
+                    return "step" + relative
+                if (up, down) in ((1, 0), (1, 1)):
+                    return relative + "-in-law"
+                return "spouse's " + relative
+            # a blood relative's spouse
+            if (up, down) == (1, 0):
+                return "step" + self._word("parent", nodes[-1])
+            if (up, down) in ((0, 1), (1, 1)):
+                kind = "child" if up == 0 else "sibling"
+                return self._word(kind, nodes[-1]) + "-in-law"
+            relative = self._blood(up, down, nodes[:-1])
+            return f"{relative}'s {self._word('spouse', nodes[-1])}"
+
+        # anything else: a chain such as "mother's husband's daughter"
+        return "'s ".join(self.step_words(nodes, steps))
+
+    def step_words(self, nodes, steps) -> list[str]:
+        """What each node after the first is to the one before it."""
+        return [
+            self._word(_STEP_WORDS[step], node) for step, node in zip(steps, nodes[1:])
+        ]
+
+
+_lock = threading.Lock()
+_snapshot = (None, 0.0, None)  # (data version, built at, KinshipGraph)
+
+
+def graph() -> KinshipGraph:
+    """
+    The current snapshot, rebuilt first if Person or Marriage changed or it
+    is older than KINSHIP_SNAPSHOT_TTL. The "kinship" stamp only moves for
+    writes this process sees when the search cache is per process, so the
+    age bounds how stale imports and other workers' writes can leave it.
+    """
+    global _snapshot
+
+    version = result_cache.generation("kinship")
+
+    if not _is_current(version):
+        with _lock:
+            if not _is_current(version):
+                _snapshot = (version, time.monotonic(), KinshipGraph.build())
+
+    return _snapshot[2]
+
+
+def _is_current(version) -> bool:
+    snapshot_version, built_at, _ = _snapshot
+    age = time.monotonic() - built_at
+    return snapshot_version == version and age < settings.KINSHIP_SNAPSHOT_TTL
+
+
+def relationship(first_id: int, second_id: int, max_steps: int = MAX_STEPS):
+    """
+    How `second_id` is related to `first_id`:
+    {"label": ..., "path": [{"id", "relation"}, ...]}, with "label" None
+    when no path of at most `max_steps` steps exists. Raises
+    Person.DoesNotExist for an id the snapshot does not know.
+    """
+    kin = graph()
+    source, target = kin.index(first_id), kin.index(second_id)
+
+    if source is None or target is None:
+        raise Person.DoesNotExist(f"No person with id {first_id} or {second_id}")
+
+    found = kin.path(source, target, max_steps)
+
+    if found is None:
+        return {"label": None, "path": []}
+
+    nodes, steps = found
+    relations = ["self"] + kin.step_words(nodes, steps)
+
+    return {
+        "label": kin.label(nodes, steps),
+        "path": [
+            {"id": int(kin.ids[node]), "relation": relation}
+            for node, relation in zip(nodes, relations)
+        ],
+    }
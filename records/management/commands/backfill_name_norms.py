@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from records.models import Person, PersonSearch
+from records.search import result_cache
+from records.search.normalize import backfill
+
+
+class Command(BaseCommand):
+    help = "Recompute the normalized first/last names of every person"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Number of people normalized per batch",
+        )
+
+    def handle(self, *args, **options):
+        total = backfill(Person, PersonSearch, options["batch_size"])
+
+        result_cache.invalidate()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Normalized names refreshed ({total} people)")
+        )
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from records import derivatives
+from records.models import Birth, Death, Marriage
+
+MODELS = {"birth": Birth, "death": Death, "marriage": Marriage}
+
+
+class Command(BaseCommand):
+    help = "Make the thumbnail and medium WebP/JPEG copies of stored record images"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind",
+            choices=sorted(MODELS),
+            action="append",
+            help="Only this kind of record image (repeatable; default: all)",
+        )
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            help="Remake derivatives that are already there",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        built = skipped = unreadable = 0
+
+        for kind in options["kind"] or sorted(MODELS):
+            field = derivatives.IMAGE_FIELDS[kind]
+            records = (
+                MODELS[kind]
+                .objects.exclude(Q(**{f"{field}__isnull": True}) | Q(**{field: ""}))
+                .only(field)
+                .order_by("pk")
+            )
+
+            for record in records.iterator(chunk_size=2000):
+                file = getattr(record, field)
+                if not options["overwrite"] and derivatives.exist(file):
+                    skipped += 1
+                elif derivatives.generate(file):
+                    built += 1
+                else:
+                    unreadable += 1
+                    self.stderr.write(f"{kind} {record.pk}: cannot read {file.name}")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Built derivatives of {built} images in {elapsed:.1f}s "
+                f"({built / (elapsed or 1):,.1f} images/s); {skipped} already "
+                f"had them, {unreadable} could not be read"
+            )
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from records.storage import collect
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored record images (and their derivatives) that no record "
+        "references any more"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=float,
+            default=3600,
+            help="Keep files younger than this many seconds (uploads in flight)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be deleted",
+        )
+
+    def handle(self, *args, **options):
+        stats = collect(min_age=options["min_age"], dry_run=options["dry_run"])
+
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(
+            f"{stats['referenced']} stored files are referenced, "
+            f"{stats['shared']} of them by more than one record"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {stats['deleted']} unreferenced files "
+                f"({stats['freed'] / 1024**2:,.1f} MiB)"
+            )
+        )
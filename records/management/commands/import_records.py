@@ -0,0 +1,62 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from records.importer import BATCH_SIZE, Importer, read
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk load people, births, deaths and marriages from GEDCOM (.ged) or CSV files"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="+",
+            help=(
+                "GEDCOM or CSV files; references (mother, father, spouses) "
+                "may point into any of them"
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Number of rows written per statement",
+        )
+
+    def handle(self, *args, **options):
+        for path in options["paths"]:
+            if not os.path.isfile(path):
+                raise CommandError(f"No such file: {path}")
+
+        started = time.perf_counter()
+        importer = Importer(options["batch_size"], progress=self.stdout.write)
+
+        # all or nothing: a failed import leaves no half-linked people behind
+        with transaction.atomic():
+            for path in options["paths"]:
+                importer.load(read(path))
+            importer.finish()
+
+        elapsed = time.perf_counter() - started
+        people = len(importer.person_ids)
+
+        if importer.unresolved:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{importer.unresolved} references to unknown ids were skipped"
+                )
+            )
+        if importer.places.created_cities:
+            self.stdout.write(f"{importer.places.created_cities} new cities created")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {people} people and {len(importer.marriage_ids)} "
+                f"marriages in {elapsed:.1f}s ({people / (elapsed or 1):,.0f} people/s)"
+            )
+        )
@@ -1,14 +1,13 @@
 import os
+import time
+from itertools import islice
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
-from records.image_utils import (
-    generate_birth_certificate_image,
-    generate_death_certificate_image,
-    image_to_content_file,
-)
-from records.models import Birth, City, County, Death, Marriage, Person, Sex
+from records import certificates
+from records.importer import BATCH_SIZE, Importer, read_mock
 from records.utils import load_mock_data
 
 
@@ -21,6 +20,12 @@ class Command(BaseCommand):
             action="store_true",
             help="Use test input file and redirect image output",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Number of rows written per statement",
+        )
 
     def handle(self, *args, **options):
         test_mode = options.get("test_input", False)
@@ -34,102 +39,30 @@ class Command(BaseCommand):
         try:
             _, people, marriages = load_mock_data(test_mode)
 
-            person_map = {}
-            image_count = 0
-
-            for pid, pdata in people.items():
-                if pdata["sex"] == "M":
-                    sex = Sex.MALE
-                elif pdata["sex"] == "F":
-                    sex = Sex.FEMALE
-                else:
-                    sex = Sex.UNKNOWN
-
-                person = Person.objects.create(
-                    first_name=pdata["first"],
-                    middle_name=pdata["middle"],
-                    last_name=pdata["last"],
-                    sex=sex,
-                )
-
-                b_county = County.objects.get(county_code=pdata["birth_county_code"])
-                b_city = City.objects.get(
-                    county=b_county,
-                    city_name=pdata["birth_city"],
-                )
+            started = time.perf_counter()
+            importer = Importer(options["batch_size"], progress=self.stdout.write)
 
-                d_county = County.objects.get(county_code=pdata["death_county_code"])
-                d_city = City.objects.get(
-                    county=d_county,
-                    city_name=pdata["death_city"],
-                )
+            with transaction.atomic():
+                importer.load(read_mock(people, marriages))
+                importer.finish()
 
-                Birth.objects.create(
-                    person=person,
-                    birth_date=pdata["birth_date"],
-                    birth_county=b_county,
-                    birth_city=b_city,
-                )
-
-                Death.objects.create(
-                    person=person,
-                    death_date=pdata["death_date"],
-                    death_age=pdata["age"],
-                    death_county=d_county,
-                    death_city=d_city,
-                )
-
-                person_map[pid] = person
+            elapsed = time.perf_counter() - started
+            rows = len(importer.person_ids) + importer.events
+            rows += len(importer.marriage_ids)
+            self.stdout.write(
+                f"Loaded {len(importer.person_ids)} people, {importer.events} "
+                f"births and deaths and {len(importer.marriage_ids)} marriages "
+                f"in {elapsed:.1f}s ({rows / (elapsed or 1):,.0f} rows/s)"
+            )
 
+            # certificate images for the first few people; render_certificates
+            # does the rest, or they are drawn when first viewed
             max_images = 1 if test_mode else 100
-
-            for pid, pdata in people.items():
-                person = person_map[pid]
-
-                if pdata.get("mother"):
-                    person.mother = person_map[pdata["mother"]]
-
-                if pdata.get("father"):
-                    person.father = person_map[pdata["father"]]
-
-                person.save()
-
-                if image_count < max_images:
-                    birth_obj = person.birth.first()
-                    death_obj = person.death.first()
-
-                    birth_img = generate_birth_certificate_image(person, birth_obj)
-                    birth_obj.birth_record_image.save(
-                        f"birth_{person.id}.png",
-                        image_to_content_file(birth_img, f"birth_{person.id}.png"),
-                        save=True,
-                    )
-
-                    death_img = generate_death_certificate_image(person, death_obj)
-                    death_obj.death_record_image.save(
-                        f"death_{person.id}.png",
-                        image_to_content_file(death_img, f"death_{person.id}.png"),
-                        save=True,
-                    )
-
-                    image_count += 1
-
-            for marriage in marriages:
-                m_county = County.objects.get(
-                    county_code=marriage["marriage_county"][0]
-                )
-                m_city = City.objects.get(
-                    county=m_county,
-                    city_name=marriage["marriage_city"],
-                )
-
-                Marriage.objects.create(
-                    spouse1=person_map[marriage["spouse1"]],
-                    spouse2=person_map[marriage["spouse2"]],
-                    marriage_date=marriage["marriage_date"],
-                    marriage_county=m_county,
-                    marriage_city=m_city,
-                )
+            ids = [importer.ids[ref] for ref in islice(people, max_images)]
+            renderer = certificates.Renderer(workers=1 if test_mode else None)
+            for kind in certificates.KINDS:
+                records = certificates.missing(kind).filter(person_id__in=ids)
+                renderer.render(kind, records)
 
             self.stdout.write(
                 self.style.SUCCESS("Database populated with mock data successfully")
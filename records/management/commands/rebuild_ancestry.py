@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from records.ancestry import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ancestry closure table from Person.mother/father"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of person ids walked per statement",
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild(batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Ancestry rebuilt ({total} rows)"))
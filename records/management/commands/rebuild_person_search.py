@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from records.search import participants
+from records.search.search_table import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the denormalized person search table and the marriage "
+        "participant rows from scratch"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Number of people (or marriages) refreshed per batch",
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Person search table rebuilt ({total} rows)")
+        )
+
+        total = participants.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Marriage participants rebuilt ({total} marriages)")
+        )
@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from records.certificates import BATCH_SIZE, KINDS, Renderer, missing
+
+
+class Command(BaseCommand):
+    help = "Render birth and death certificate images with a pool of processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind",
+            choices=sorted(KINDS),
+            action="append",
+            help="Only render this kind of certificate (repeatable; default: all)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of rendering processes (default: one per CPU)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Number of certificates rendered and stored per batch",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Render at most this many certificates of each kind",
+        )
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            help="Re-render records that already have an image",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] is not None and options["workers"] < 1:
+            raise CommandError("--workers must be at least 1")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        renderer = Renderer(options["workers"], options["batch_size"])
+        total_started = time.perf_counter()
+
+        for kind in options["kind"] or sorted(KINDS):
+            model = KINDS[kind][0]
+            records = model.objects.all() if options["overwrite"] else missing(kind)
+            if options["limit"] is not None:
+                first = records.order_by("pk").values("pk")[: options["limit"]]
+                records = records.filter(pk__in=first)
+
+            started = time.perf_counter()
+            before = renderer.rendered
+            renderer.render(kind, records)
+            count = renderer.rendered - before
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{kind}: {count} certificates in {elapsed:.1f}s "
+                f"({count / (elapsed or 1):,.1f} certificates/s)"
+            )
+
+        elapsed = time.perf_counter() - total_started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rendered {renderer.rendered} certificates with "
+                f"{renderer.workers} workers in {elapsed:.1f}s "
+                f"({renderer.rendered / (elapsed or 1):,.1f} certificates/s)"
+            )
+        )
@@ -0,0 +1,115 @@
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import (
+    ImproperlyConfigured,
+    PermissionDenied,
+    SuspiciousFileOperation,
+)
+from django.db.models import FileField
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.utils.module_loading import import_string
+from django.views.static import was_modified_since
+
+from records import storage
+from records.models import Birth, Death, Marriage
+
+# Files under MEDIA_ROOT are checked here (resolve() for where they are,
+# authorize() for who asks) and then handed to whatever serves them best,
+# by MEDIA_SENDFILE:
+#   ""                  FileResponse; under gunicorn its file wrapper
+#                       sends the file with sendfile(), off the Python heap
+#   "x-accel-redirect"  nginx sends it: MEDIA_ACCEL_PREFIX must be an
+#                       `internal` location aliased to MEDIA_ROOT
+#   "x-sendfile"        Apache (mod_xsendfile) or lighttpd sends it
+# With either header the worker answers with an empty response at once
+# instead of streaming the file itself.
+
+SENDFILE_MODES = ("", "x-accel-redirect", "x-sendfile")
+
+
+def _served_dirs() -> set:
+    # where record images are stored (by content, or under the upload_to
+    # names from before), and the on-demand certificates
+    dirs = {storage.BLOB_DIR, settings.CERTIFICATE_CACHE_DIR}
+    for model in (Birth, Death, Marriage):
+        for field in model._meta.fields:
+            if isinstance(field, FileField):
+                dirs.add(str(field.upload_to).strip("/").split("/")[0])
+    return dirs
+
+
+def resolve(name: str) -> str:
+    """
+    The absolute path of the media file `name`, if it may be served: an
+    image in one of the record image directories or the certificate
+    cache. Http404 otherwise, so nothing else under MEDIA_ROOT shows.
+    """
+    try:
+        path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404("No such file.")
+
+    # by the resolved path, so "birth_records/../x" is not in birth_records
+    top = os.path.relpath(path, settings.MEDIA_ROOT).split(os.sep, 1)[0]
+    content_type, _ = mimetypes.guess_type(path)
+    if top not in _served_dirs() or not (content_type or "").startswith("image/"):
+        raise Http404("No such file.")
+
+    if not os.path.isfile(path):
+        raise Http404("No such file.")
+    return path
+
+
+def authorize(request, name: str) -> None:
+    """
+    PermissionDenied unless MEDIA_PERMISSION lets `request` read the media
+    file `name`. The setting is the dotted path of a callable
+    (request, name) -> bool; empty, the default, lets everyone read, as the
+    records on this site are public and visitors have no accounts.
+    """
+    check = settings.MEDIA_PERMISSION
+    if check and not import_string(check)(request, name):
+        raise PermissionDenied
+
+
+def response(request, path: str, conditional: bool = True):
+    """
+    A response that sends the file at `path` (under MEDIA_ROOT), once
+    authorize() allows it. When sent by Django it answers
+    If-Modified-Since by the file's mtime, unless the view has validators
+    of its own (`conditional` off).
+    """
+    name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, "/")
+    authorize(request, name)
+
+    content_type, encoding = mimetypes.guess_type(path)
+    content_type = content_type or "application/octet-stream"
+    mode = settings.MEDIA_SENDFILE
+    if mode not in SENDFILE_MODES:
+        raise ImproperlyConfigured(f"MEDIA_SENDFILE must be one of {SENDFILE_MODES}")
+
+    if mode == "x-accel-redirect":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = quote(settings.MEDIA_ACCEL_PREFIX + name)
+    elif mode == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = path
+    elif not conditional:
+        response = FileResponse(open(path, "rb"), content_type=content_type)
+    else:
+        stat = os.stat(path)
+        if not was_modified_since(
+            request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime
+        ):
+            return HttpResponseNotModified()
+        response = FileResponse(open(path, "rb"), content_type=content_type)
+        response["Last-Modified"] = http_date(stat.st_mtime)
+
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
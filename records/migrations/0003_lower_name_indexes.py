@@ -0,0 +1,54 @@
+# Generated by Django 6.0 on 2026-10-17 11:50
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0002_alter_birth_person_alter_death_person_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ['-creation_time'], 'verbose_name': 'Comment', 'verbose_name_plural': 'Comments'},
+        ),
+        migrations.AlterField(
+            model_name='person',
+            name='first_name',
+            field=models.CharField(blank=True, db_index=True, default='Unknown', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='person',
+            name='last_name',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='person',
+            name='middle_name',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='city',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('city_name'), name='text_pattern_ops'), name='city_name_lower'),
+        ),
+        migrations.AddIndex(
+            model_name='county',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('county_name'), name='text_pattern_ops'), name='county_name_lower'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('first_name'), name='text_pattern_ops'), name='person_first_name_lower'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('last_name'), name='text_pattern_ops'), name='person_last_name_lower'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('middle_name'), name='text_pattern_ops'), name='person_middle_name_lower'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 6.0 on 2026-10-17 12:55
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0004_person_full_name_trgm_gist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonSearch',
+            fields=[
+                ('person', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_row', serialize=False, to='records.person')),
+                ('last_name', models.CharField(blank=True, default='', max_length=100)),
+                ('first_name', models.CharField(blank=True, default='', max_length=100)),
+                ('middle_name', models.CharField(blank=True, default='', max_length=100)),
+                ('sex', models.CharField(blank=True, choices=[('M', 'Male'), ('F', 'Female'), ('U', 'Unknown')], max_length=1, null=True)),
+                ('has_birth', models.BooleanField(default=False)),
+                ('birth_date', models.DateField(blank=True, db_index=True, null=True)),
+                ('birth_county_code', models.IntegerField(blank=True, null=True)),
+                ('birth_county_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('birth_city_id', models.IntegerField(blank=True, null=True)),
+                ('birth_city_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('birth_record_image', models.FileField(blank=True, null=True, upload_to='birth_records/')),
+                ('has_death', models.BooleanField(default=False)),
+                ('death_date', models.DateField(blank=True, db_index=True, null=True)),
+                ('death_county_code', models.IntegerField(blank=True, null=True)),
+                ('death_county_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('death_city_id', models.IntegerField(blank=True, null=True)),
+                ('death_city_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('death_record_image', models.FileField(blank=True, null=True, upload_to='death_records/')),
+            ],
+            options={
+                'verbose_name': 'Person Search Row',
+                'verbose_name_plural': 'Person Search Rows',
+                'ordering': ['last_name', 'first_name', 'middle_name'],
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['first_name'], name='psearch_first_name_trgm', opclasses=['gin_trgm_ops']), django.contrib.postgres.indexes.GinIndex(fields=['last_name'], name='psearch_last_name_trgm', opclasses=['gin_trgm_ops']), django.contrib.postgres.indexes.GinIndex(fields=['middle_name'], name='psearch_middle_name_trgm', opclasses=['gin_trgm_ops']), models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('first_name'), name='text_pattern_ops'), name='psearch_first_name_lower'), models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('last_name'), name='text_pattern_ops'), name='psearch_last_name_lower'), models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('middle_name'), name='text_pattern_ops'), name='psearch_middle_name_lower'), models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('birth_county_name'), name='text_pattern_ops'), name='psearch_birth_county_lower'), models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('birth_city_name'), name='text_pattern_ops'), name='psearch_birth_city_lower'), models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('death_county_name'), name='text_pattern_ops'), name='psearch_death_county_lower'), models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('death_city_name'), name='text_pattern_ops'), name='psearch_death_city_lower')],
+            },
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO records_personsearch (
+                person_id, last_name, first_name, middle_name, sex,
+                has_birth, birth_date, birth_county_code, birth_county_name,
+                birth_city_id, birth_city_name, birth_record_image,
+                has_death, death_date, death_county_code, death_county_name,
+                death_city_id, death_city_name, death_record_image
+            )
+            SELECT
+                p.id, p.last_name, p.first_name, p.middle_name, p.sex,
+                b.id IS NOT NULL, b.birth_date, b.birth_county_id, bco.county_name,
+                b.birth_city_id, bci.city_name, NULLIF(b.birth_record_image, ''),
+                d.id IS NOT NULL, d.death_date, d.death_county_id, dco.county_name,
+                d.death_city_id, dci.city_name, NULLIF(d.death_record_image, '')
+            FROM records_person p
+            LEFT JOIN LATERAL (
+                SELECT * FROM records_birth
+                WHERE person_id = p.id
+                ORDER BY birth_date, birth_county_id
+                LIMIT 1
+            ) b ON TRUE
+            LEFT JOIN records_county bco ON bco.county_code = b.birth_county_id
+            LEFT JOIN records_city bci ON bci.id = b.birth_city_id
+            LEFT JOIN LATERAL (
+                SELECT * FROM records_death
+                WHERE person_id = p.id
+                ORDER BY death_date, death_county_id
+                LIMIT 1
+            ) d ON TRUE
+            LEFT JOIN records_county dco ON dco.county_code = d.death_county_id
+            LEFT JOIN records_city dci ON dci.id = d.death_city_id;
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
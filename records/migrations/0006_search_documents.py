@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-17 13:20
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def fill_documents(apps, schema_editor):
+    from records.search.documents import refresh_documents
+
+    for name in ("Birth", "Death", "Marriage", "PersonSearch"):
+        refresh_documents(apps.get_model("records", name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0005_person_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='birth',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='death',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='marriage',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='personsearch',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_documents, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='birth',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='birth_document_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='death',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='death_document_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='marriage',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='marriage_document_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='personsearch',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='psearch_document_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_extensions', '0002_enable_fuzzystrmatch'),
+        ('records', '0006_search_documents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='first_name_metaphone',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=8),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='first_name_metaphone_alt',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=8),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='first_name_soundex',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=8),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='last_name_metaphone',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=8),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='last_name_metaphone_alt',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=8),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='last_name_soundex',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=8),
+        ),
+    ]
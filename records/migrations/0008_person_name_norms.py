@@ -0,0 +1,100 @@
+# Generated by Django 6.0 on 2026-10-17 15:20
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def fill_norms(apps, schema_editor):
+    from records.search.normalize import backfill
+
+    backfill(
+        apps.get_model("records", "Person"),
+        apps.get_model("records", "PersonSearch"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0007_person_phonetic_keys'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='person',
+            name='person_first_name_lower',
+        ),
+        migrations.RemoveIndex(
+            model_name='person',
+            name='person_last_name_lower',
+        ),
+        migrations.RemoveIndex(
+            model_name='personsearch',
+            name='psearch_first_name_trgm',
+        ),
+        migrations.RemoveIndex(
+            model_name='personsearch',
+            name='psearch_last_name_trgm',
+        ),
+        migrations.RemoveIndex(
+            model_name='personsearch',
+            name='psearch_first_name_lower',
+        ),
+        migrations.RemoveIndex(
+            model_name='personsearch',
+            name='psearch_last_name_lower',
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='first_name_norm',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='last_name_norm',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='personsearch',
+            name='first_name_norm',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='personsearch',
+            name='last_name_norm',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(fill_norms, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['first_name_norm'], name='person_first_name_norm', opclasses=['text_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['last_name_norm'], name='person_last_name_norm', opclasses=['text_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['first_name_norm'], name='person_first_name_norm_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['last_name_norm'], name='person_last_name_norm_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='personsearch',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['first_name_norm'], name='psearch_first_name_norm_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='personsearch',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['last_name_norm'], name='psearch_last_name_norm_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='personsearch',
+            index=models.Index(fields=['first_name_norm'], name='psearch_first_name_norm', opclasses=['text_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='personsearch',
+            index=models.Index(fields=['last_name_norm'], name='psearch_last_name_norm', opclasses=['text_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-17 15:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0008_person_name_norms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarriageParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.PositiveSmallIntegerField(choices=[(1, 'Spouse 1'), (2, 'Spouse 2')])),
+                ('marriage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='records.marriage')),
+                ('person', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='records.person')),
+                ('spouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='records.person')),
+            ],
+            options={
+                'verbose_name': 'Marriage Participant',
+                'verbose_name_plural': 'Marriage Participants',
+                'indexes': [models.Index(fields=['person', 'spouse'], name='participant_person_spouse')],
+                'constraints': [models.UniqueConstraint(fields=('marriage', 'role'), name='unique_marriage_roles')],
+            },
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO records_marriageparticipant (marriage_id, role, person_id, spouse_id)
+            SELECT id, 1, spouse1_id, spouse2_id FROM records_marriage
+            UNION ALL
+            SELECT id, 2, spouse2_id, spouse1_id FROM records_marriage
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
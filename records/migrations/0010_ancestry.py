@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-17 16:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_ancestry(apps, schema_editor):
+    from records.ancestry import rebuild
+
+    rebuild(
+        person_model=apps.get_model("records", "Person"),
+        ancestry_model=apps.get_model("records", "Ancestry"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0009_marriage_participants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ancestry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='records.person')),
+                ('descendant', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='records.person')),
+            ],
+            options={
+                'verbose_name': 'Ancestry',
+                'verbose_name_plural': 'Ancestries',
+                'indexes': [models.Index(fields=['descendant', 'ancestor'], name='ancestry_descendant')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_ancestry')],
+            },
+        ),
+        migrations.RunPython(fill_ancestry, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-17 17:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0010_ancestry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='record_modified',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='record_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-17 19:40
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0011_person_record_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='personsearch',
+            index=django.contrib.postgres.indexes.GistIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Concat('first_name', models.Value(' '), 'middle_name', models.Value(' '), 'last_name'), name='gist_trgm_ops'), name='psearch_full_name_trgm_gist'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 6.0 on 2026-10-17 20:10
+
+import records.search.phonetic
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0012_psearch_full_name_trgm_gist'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='person',
+            name='first_name_soundex',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='first_name_metaphone',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='first_name_metaphone_alt',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='last_name_soundex',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='last_name_metaphone',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='last_name_metaphone_alt',
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='first_name_soundex',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=records.search.phonetic.Soundex('first_name'), output_field=models.CharField(max_length=8)),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='first_name_metaphone',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=records.search.phonetic.DMetaphone('first_name'), output_field=models.CharField(max_length=8)),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='first_name_metaphone_alt',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=records.search.phonetic.DMetaphoneAlt('first_name'), output_field=models.CharField(max_length=8)),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='last_name_soundex',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=records.search.phonetic.Soundex('last_name'), output_field=models.CharField(max_length=8)),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='last_name_metaphone',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=records.search.phonetic.DMetaphone('last_name'), output_field=models.CharField(max_length=8)),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='last_name_metaphone_alt',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=records.search.phonetic.DMetaphoneAlt('last_name'), output_field=models.CharField(max_length=8)),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-17 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0013_person_phonetic_keys_generated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='personsearch',
+            name='multiple_births',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='personsearch',
+            name='multiple_deaths',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE records_personsearch ps SET
+                multiple_births = (
+                    SELECT count(*) > 1 FROM records_birth WHERE person_id = ps.person_id
+                ),
+                multiple_deaths = (
+                    SELECT count(*) > 1 FROM records_death WHERE person_id = ps.person_id
+                );
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
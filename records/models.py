@@ -1,8 +1,11 @@
-from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.functions import Concat, Lower
 from django.utils import timezone
 
+from records.search.phonetic import DMetaphone, DMetaphoneAlt, Soundex
+
 #####################################
 #          PERSON TABLES            #
 #####################################
@@ -26,7 +29,12 @@ class County(models.Model):
                 fields=["county_name"],
                 name="county_name_trgm",
                 opclasses=["gin_trgm_ops"],
-            )
+            ),
+            # lower(name) equality and prefix LIKE (see record_search._wild_match)
+            models.Index(
+                OpClass(Lower("county_name"), name="text_pattern_ops"),
+                name="county_name_lower",
+            ),
         ]
 
     county_code = models.IntegerField(primary_key=True)
@@ -46,7 +54,11 @@ class City(models.Model):
         indexes = [
             GinIndex(
                 fields=["city_name"], name="city_name_trgm", opclasses=["gin_trgm_ops"]
-            )
+            ),
+            models.Index(
+                OpClass(Lower("city_name"), name="text_pattern_ops"),
+                name="city_name_lower",
+            ),
         ]
 
     county = models.ForeignKey(County, on_delete=models.CASCADE, related_name="city")
@@ -57,6 +69,13 @@ class City(models.Model):
         return f"{self.city_name}, {self.county} County"
 
 
+# "first middle last", indexed with gist_trgm_ops (on Person and PersonSearch)
+# so ranked fuzzy search can pull its top-K candidates with a KNN (<->) scan
+PERSON_FULL_NAME = Concat(
+    "first_name", models.Value(" "), "middle_name", models.Value(" "), "last_name"
+)
+
+
 # Create your models here.
 class Person(models.Model):
     # metadata
@@ -80,6 +99,37 @@ class Person(models.Model):
                 name="person_middle_name_trgm",
                 opclasses=["gin_trgm_ops"],
             ),
+            # normalized name equality and prefix LIKE, and infix LIKE
+            # (see record_search._norm_match)
+            models.Index(
+                fields=["first_name_norm"],
+                name="person_first_name_norm",
+                opclasses=["text_pattern_ops"],
+            ),
+            models.Index(
+                fields=["last_name_norm"],
+                name="person_last_name_norm",
+                opclasses=["text_pattern_ops"],
+            ),
+            GinIndex(
+                fields=["first_name_norm"],
+                name="person_first_name_norm_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["last_name_norm"],
+                name="person_last_name_norm_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            # lower(name) equality and prefix LIKE (see record_search._wild_match)
+            models.Index(
+                OpClass(Lower("middle_name"), name="text_pattern_ops"),
+                name="person_middle_name_lower",
+            ),
+            GistIndex(
+                OpClass(PERSON_FULL_NAME, name="gist_trgm_ops"),
+                name="person_full_name_trgm_gist",
+            ),
         ]
 
     # BASIC ===========================================
@@ -92,12 +142,62 @@ class Person(models.Model):
         db_index=True, max_length=100, blank=True, default=""
     )
 
+    # accent/punctuation-folded copies of the names that exact and wildcard
+    # searches compare against (records.search.normalize.norm)
+    first_name_norm = models.CharField(
+        max_length=100, blank=True, default="", editable=False
+    )
+    last_name_norm = models.CharField(
+        max_length=100, blank=True, default="", editable=False
+    )
+
     # sex
     sex = models.CharField(
         db_index=True, max_length=1, choices=Sex.choices, blank=True, null=True
     )
     # =================================================
 
+    # PHONETIC KEYS ===================================
+    # Soundex and Double Metaphone codes of the names, computed by PostgreSQL
+    # on every write (see records/search/phonetic.py)
+    first_name_soundex = models.GeneratedField(
+        expression=Soundex("first_name"),
+        output_field=models.CharField(max_length=8),
+        db_persist=True,
+        db_index=True,
+    )
+    first_name_metaphone = models.GeneratedField(
+        expression=DMetaphone("first_name"),
+        output_field=models.CharField(max_length=8),
+        db_persist=True,
+        db_index=True,
+    )
+    first_name_metaphone_alt = models.GeneratedField(
+        expression=DMetaphoneAlt("first_name"),
+        output_field=models.CharField(max_length=8),
+        db_persist=True,
+        db_index=True,
+    )
+    last_name_soundex = models.GeneratedField(
+        expression=Soundex("last_name"),
+        output_field=models.CharField(max_length=8),
+        db_persist=True,
+        db_index=True,
+    )
+    last_name_metaphone = models.GeneratedField(
+        expression=DMetaphone("last_name"),
+        output_field=models.CharField(max_length=8),
+        db_persist=True,
+        db_index=True,
+    )
+    last_name_metaphone_alt = models.GeneratedField(
+        expression=DMetaphoneAlt("last_name"),
+        output_field=models.CharField(max_length=8),
+        db_persist=True,
+        db_index=True,
+    )
+    # =================================================
+
     # RELATIONS =======================================
     mother = models.ForeignKey(
         "self",
@@ -116,6 +216,14 @@ class Person(models.Model):
     )
     # ==================================================
 
+    # RECORD VERSION ==================================
+    # stamp of everything this person's exports show, bumped in SQL by
+    # records.signals (see records/versions.py); a saved instance keeps
+    # the values it was loaded with
+    record_version = models.PositiveIntegerField(default=1, editable=False)
+    record_modified = models.DateTimeField(default=timezone.now, editable=False)
+    # ==================================================
+
     def __str__(self):
         return f"{self.last_name}, {self.first_name} {self.middle_name}"
 
@@ -180,6 +288,13 @@ class Birth(models.Model):
         verbose_name = "Birth"
         verbose_name_plural = "Births"
         ordering = ["birth_date", "birth_county"]
+        indexes = [
+            GinIndex(
+                fields=["search_document"],
+                name="birth_document_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
 
     person = models.ForeignKey(
         Person,
@@ -203,6 +318,10 @@ class Birth(models.Model):
         upload_to="birth_records/", blank=True, null=True
     )
 
+    # lowercased text of this record and its person/place rows, matched by
+    # narrow_down; kept current by records.signals
+    search_document = models.TextField(blank=True, default="", editable=False)
+
     def __str__(self):
         return f"{self.person}: {self.birth_date}"
 
@@ -213,6 +332,13 @@ class Death(models.Model):
         verbose_name = "Death"
         verbose_name_plural = "Deaths"
         ordering = ["death_date", "death_county"]
+        indexes = [
+            GinIndex(
+                fields=["search_document"],
+                name="death_document_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
 
     person = models.ForeignKey(
         Person,
@@ -246,6 +372,10 @@ class Death(models.Model):
         upload_to="death_records/", blank=True, null=True
     )
 
+    # lowercased text of this record and its person/place rows, matched by
+    # narrow_down; kept current by records.signals
+    search_document = models.TextField(blank=True, default="", editable=False)
+
     def __str__(self):
         return f"{self.person}: {self.death_date}"
 
@@ -256,6 +386,13 @@ class Marriage(models.Model):
         verbose_name = "Marriage"
         verbose_name_plural = "Marriages"
         ordering = ["marriage_date", "marriage_county"]
+        indexes = [
+            GinIndex(
+                fields=["search_document"],
+                name="marriage_document_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["spouse1", "spouse2", "marriage_date"], name="unique_marriages"
@@ -285,6 +422,10 @@ class Marriage(models.Model):
         upload_to="marriage_records/", blank=True, null=True
     )
 
+    # lowercased text of this record and its person/place rows, matched by
+    # narrow_down; kept current by records.signals
+    search_document = models.TextField(blank=True, default="", editable=False)
+
     def spouse(self, person):
         if person == self.spouse1:
             return self.spouse2
@@ -302,6 +443,202 @@ class Marriage(models.Model):
         super().save(*args, **kwargs)
 
 
+#################################
+#         SEARCH TABLES         #
+#################################
+
+
+# one denormalized row per person for the birth/death result pages; kept
+# current by records.signals, rebuilt by `manage.py rebuild_person_search`.
+# Birth.person and Death.person allow several records per person, but the
+# row copies only the first of each; multiple_births/multiple_deaths mark
+# the people whose other records a search must check on Birth/Death
+class PersonSearch(models.Model):
+    # metadata
+    class Meta:
+        verbose_name = "Person Search Row"
+        verbose_name_plural = "Person Search Rows"
+        ordering = ["last_name", "first_name", "middle_name"]
+        indexes = [
+            GinIndex(
+                fields=["first_name_norm"],
+                name="psearch_first_name_norm_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["last_name_norm"],
+                name="psearch_last_name_norm_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["middle_name"],
+                name="psearch_middle_name_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            models.Index(
+                fields=["first_name_norm"],
+                name="psearch_first_name_norm",
+                opclasses=["text_pattern_ops"],
+            ),
+            models.Index(
+                fields=["last_name_norm"],
+                name="psearch_last_name_norm",
+                opclasses=["text_pattern_ops"],
+            ),
+            models.Index(
+                OpClass(Lower("middle_name"), name="text_pattern_ops"),
+                name="psearch_middle_name_lower",
+            ),
+            models.Index(
+                OpClass(Lower("birth_county_name"), name="text_pattern_ops"),
+                name="psearch_birth_county_lower",
+            ),
+            models.Index(
+                OpClass(Lower("birth_city_name"), name="text_pattern_ops"),
+                name="psearch_birth_city_lower",
+            ),
+            models.Index(
+                OpClass(Lower("death_county_name"), name="text_pattern_ops"),
+                name="psearch_death_county_lower",
+            ),
+            models.Index(
+                OpClass(Lower("death_city_name"), name="text_pattern_ops"),
+                name="psearch_death_city_lower",
+            ),
+            GinIndex(
+                fields=["search_document"],
+                name="psearch_document_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GistIndex(
+                OpClass(PERSON_FULL_NAME, name="gist_trgm_ops"),
+                name="psearch_full_name_trgm_gist",
+            ),
+        ]
+
+    person = models.OneToOneField(
+        Person, primary_key=True, on_delete=models.CASCADE, related_name="search_row"
+    )
+
+    # PERSON ==========================================
+    last_name = models.CharField(max_length=100, blank=True, default="")
+    first_name = models.CharField(max_length=100, blank=True, default="")
+    middle_name = models.CharField(max_length=100, blank=True, default="")
+    first_name_norm = models.CharField(
+        max_length=100, blank=True, default="", editable=False
+    )
+    last_name_norm = models.CharField(
+        max_length=100, blank=True, default="", editable=False
+    )
+    sex = models.CharField(max_length=1, choices=Sex.choices, blank=True, null=True)
+    # =================================================
+
+    # BIRTH (first by Birth ordering) =================
+    has_birth = models.BooleanField(default=False)
+    multiple_births = models.BooleanField(default=False)
+    birth_date = models.DateField(db_index=True, blank=True, null=True)
+    birth_county_code = models.IntegerField(blank=True, null=True)
+    birth_county_name = models.CharField(max_length=100, blank=True, null=True)
+    birth_city_id = models.IntegerField(blank=True, null=True)
+    birth_city_name = models.CharField(max_length=100, blank=True, null=True)
+    # copy of the stored file name, so templates can still use .url
+    birth_record_image = models.FileField(
+        upload_to="birth_records/", blank=True, null=True
+    )
+    # =================================================
+
+    # DEATH (first by Death ordering) =================
+    has_death = models.BooleanField(default=False)
+    multiple_deaths = models.BooleanField(default=False)
+    death_date = models.DateField(db_index=True, blank=True, null=True)
+    death_county_code = models.IntegerField(blank=True, null=True)
+    death_county_name = models.CharField(max_length=100, blank=True, null=True)
+    death_city_id = models.IntegerField(blank=True, null=True)
+    death_city_name = models.CharField(max_length=100, blank=True, null=True)
+    death_record_image = models.FileField(
+        upload_to="death_records/", blank=True, null=True
+    )
+    # =================================================
+
+    # see Birth.search_document
+    search_document = models.TextField(blank=True, default="", editable=False)
+
+    def __str__(self):
+        return f"{self.last_name}, {self.first_name} {self.middle_name}"
+
+
+# one row per spouse of each marriage, with the other spouse alongside, so
+# marriage search matches both spouse orders with a single lookup; kept
+# current by records.signals
+class MarriageParticipant(models.Model):
+    # metadata
+    class Meta:
+        verbose_name = "Marriage Participant"
+        verbose_name_plural = "Marriage Participants"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["marriage", "role"], name="unique_marriage_roles"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["person", "spouse"], name="participant_person_spouse"),
+        ]
+
+    class Role(models.IntegerChoices):
+        SPOUSE1 = 1, "Spouse 1"
+        SPOUSE2 = 2, "Spouse 2"
+
+    marriage = models.ForeignKey(
+        Marriage, on_delete=models.CASCADE, related_name="participants"
+    )
+    role = models.PositiveSmallIntegerField(choices=Role.choices)
+    # indexed by participant_person_spouse
+    person = models.ForeignKey(
+        Person, on_delete=models.CASCADE, related_name="+", db_index=False
+    )
+    spouse = models.ForeignKey(Person, on_delete=models.CASCADE, related_name="+")
+
+    def __str__(self):
+        return f"{self.person} ({self.get_role_display()}) in {self.marriage}"
+
+
+# closure of Person.mother/father: one row per (ancestor, descendant) pair
+# at the shortest number of generations between them; kept current by
+# records.signals, rebuilt by `manage.py rebuild_ancestry`
+class Ancestry(models.Model):
+    # metadata
+    class Meta:
+        verbose_name = "Ancestry"
+        verbose_name_plural = "Ancestries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ancestor", "descendant"], name="unique_ancestry"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["descendant", "ancestor"], name="ancestry_descendant"),
+        ]
+
+    # both indexed by the pair indexes above
+    ancestor = models.ForeignKey(
+        Person,
+        on_delete=models.CASCADE,
+        related_name="descendant_links",
+        db_index=False,
+    )
+    descendant = models.ForeignKey(
+        Person,
+        on_delete=models.CASCADE,
+        related_name="ancestor_links",
+        db_index=False,
+    )
+    # 1 = parent, 2 = grandparent, ...
+    depth = models.PositiveSmallIntegerField()
+
+    def __str__(self):
+        return f"{self.ancestor} -> {self.descendant} ({self.depth})"
+
+
 #################################
 #         COMMENT MODELS        #
 #################################
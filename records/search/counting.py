@@ -0,0 +1,129 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import OperationalError, connections, transaction
+from django.utils.functional import cached_property
+
+
+class ResultCount(int):
+    """A row count that knows whether it is exact or the planner's estimate."""
+
+    def __new__(cls, value, exact):
+        obj = super().__new__(cls, value)
+        obj.exact = exact
+        return obj
+
+
+def _planner_rows(queryset) -> int:
+    sql, params = queryset.query.sql_with_params()
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _exact_count(queryset, timeout_ms) -> int | None:
+    """COUNT(*) under a statement_timeout; None if it runs out of time."""
+    try:
+        with (
+            transaction.atomic(using=queryset.db),
+            connections[queryset.db].cursor() as cursor,
+        ):
+            cursor.execute(
+                "SELECT current_setting('statement_timeout'), "
+                "set_config('statement_timeout', %s, true)",
+                [f"{timeout_ms}ms"],
+            )
+            previous = cursor.fetchone()[0]
+
+            count = queryset.count()
+
+            # a released savepoint keeps SET LOCAL until the outer commit
+            cursor.execute(
+                "SELECT set_config('statement_timeout', %s, true)", [previous]
+            )
+            return count
+    except OperationalError:
+        return None
+
+
+def result_count(queryset, limit=None, timeout_ms=None) -> ResultCount:
+    """
+    Exact count when the planner expects at most `limit` rows and the count
+    finishes within `timeout_ms`; the planner's row estimate otherwise.
+    """
+    if limit is None:
+        limit = settings.SEARCH_EXACT_COUNT_LIMIT
+    if timeout_ms is None:
+        timeout_ms = settings.SEARCH_COUNT_TIMEOUT_MS
+
+    queryset = queryset.order_by()
+    try:
+        estimate = _planner_rows(queryset)
+    except EmptyResultSet:
+        return ResultCount(0, exact=True)
+
+    if estimate <= limit:
+        count = _exact_count(queryset, timeout_ms)
+        if count is not None:
+            return ResultCount(count, exact=True)
+
+    return ResultCount(estimate, exact=False)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists that counts through result_count. An
+    estimated count does not decide the page range: a page fetches one row
+    more than it shows, and num_pages runs to the page after it only when
+    that row exists, so every row stays reachable and no page link leads to
+    an empty page.
+    """
+
+    # the last page known to have rows, for an estimated count
+    _last_page = 1
+
+    @cached_property
+    def count(self):
+        return result_count(self.object_list)
+
+    @property
+    def num_pages(self):
+        if self.count.exact:
+            return super().num_pages
+        return self._last_page
+
+    def validate_number(self, number):
+        if self.count.exact:
+            return super().validate_number(number)
+
+        # no upper bound: page() finds out whether the page has rows
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages["invalid_page"])
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+        return number
+
+    def page(self, number):
+        if self.count.exact:
+            return super().page(number)
+
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom : bottom + self.per_page + 1])
+
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages["no_results"])
+
+        self._last_page = number + 1 if len(rows) > self.per_page else number
+        return self._get_page(rows[: self.per_page], number, self)
@@ -0,0 +1,81 @@
+from django.db.models import (
+    CharField,
+    DateField,
+    OuterRef,
+    Q,
+    Subquery,
+    TextField,
+    Value,
+)
+from django.db.models.functions import Concat, Lower
+
+from records.models import Birth, Death, Marriage
+
+# records whose search_document reads columns of other tables; PersonSearch
+# also has a document but keeps it current itself (see search_table)
+DOCUMENT_MODELS = (Birth, Death, Marriage)
+
+DOCUMENT_FIELD = "search_document"
+
+
+def document_paths(model) -> list[str]:
+    """
+    The columns a record's document is built from, i.e. what narrow_down
+    used to OR together: the record's own text and date fields plus the text
+    fields of every many-to-one relation, one hop away.
+    """
+    paths = []
+
+    # derived columns (this document, phonetic keys) are not editable
+    for field in model._meta.concrete_fields:
+        if not field.editable:
+            continue
+
+        if isinstance(field, (CharField, TextField, DateField)):
+            paths.append(field.name)
+
+        if field.many_to_one:
+            for rel_field in field.related_model._meta.concrete_fields:
+                if rel_field.editable and isinstance(rel_field, (CharField, TextField)):
+                    paths.append(f"{field.name}__{rel_field.name}")
+
+    return paths
+
+
+def document_expression(model):
+    """lower("col1" || ' ' || "col2" ...), NULLs as empty strings."""
+    parts = []
+    for path in document_paths(model):
+        parts += [path, Value(" ")]
+
+    return Lower(Concat(*parts[:-1], output_field=TextField()))
+
+
+def refresh_documents(model, q=Q()) -> None:
+    """Recompute search_document for the rows of `model` matching `q`."""
+    document = (
+        model.objects.filter(pk=OuterRef("pk"))
+        .annotate(document=document_expression(model))
+        .values("document")
+    )
+    model.objects.filter(q).update(**{DOCUMENT_FIELD: Subquery(document)})
+
+
+def dependents(instance) -> dict:
+    """Q per document model selecting the rows that point at `instance`."""
+    refs = {}
+
+    for model in DOCUMENT_MODELS:
+        q = Q()
+        for field in model._meta.concrete_fields:
+            if field.many_to_one and field.related_model is type(instance):
+                q |= Q(**{field.name: instance.pk})
+        if q:
+            refs[model] = q
+
+    return refs
+
+
+def refresh_dependents(instance) -> None:
+    for model, q in dependents(instance).items():
+        refresh_documents(model, q)
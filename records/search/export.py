@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Whole search results as CSV or NDJSON, streamed. Each kind reads a fixed
+# list of columns with values(), so the joins it needs (spouses, marriage
+# places) are part of the one query, and rows come off a server-side
+# cursor CHUNK_SIZE at a time: memory stays flat however many rows match.
+
+# rows fetched per round trip of the server-side cursor
+CHUNK_SIZE = 2000
+
+# characters of output gathered before a chunk is handed to the response
+WRITE_SIZE = 64 * 1024
+
+_PERSON_COLUMNS = {
+    "person_id": "pk",
+    "first_name": "first_name",
+    "middle_name": "middle_name",
+    "last_name": "last_name",
+    "sex": "sex",
+    "birth_date": "birth_date",
+    "birth_city": "birth_city_name",
+    "birth_county": "birth_county_name",
+    "death_date": "death_date",
+    "death_city": "death_city_name",
+    "death_county": "death_county_name",
+}
+
+# output column -> lookup, per search kind
+COLUMNS = {
+    "birth": _PERSON_COLUMNS,
+    "death": _PERSON_COLUMNS,
+    "marriage": {
+        "marriage_id": "pk",
+        "marriage_date": "marriage_date",
+        "marriage_city": "marriage_city__city_name",
+        "marriage_county": "marriage_county__county_name",
+        "spouse1_id": "spouse1_id",
+        "spouse1_first_name": "spouse1__first_name",
+        "spouse1_middle_name": "spouse1__middle_name",
+        "spouse1_last_name": "spouse1__last_name",
+        "spouse2_id": "spouse2_id",
+        "spouse2_first_name": "spouse2__first_name",
+        "spouse2_middle_name": "spouse2__middle_name",
+        "spouse2_last_name": "spouse2__last_name",
+    },
+}
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+
+def rows(kind: str, results):
+    """The result rows of a `kind` search as {column: value}, in result order."""
+    columns = COLUMNS[kind]
+    lookups = list(columns.values())
+
+    for values in results.values_list(*lookups).iterator(chunk_size=CHUNK_SIZE):
+        yield dict(zip(columns, values))
+
+
+class _Echo:
+    """A csv.writer target that hands each formatted row straight back."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _buffered(lines, write_size: int):
+    buffer = io.StringIO()
+    first = True
+
+    for line in lines:
+        buffer.write(line)
+        # the first line (the CSV header, before the query runs) goes alone
+        if first or buffer.tell() >= write_size:
+            yield buffer.getvalue()
+            buffer = io.StringIO()
+            first = False
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_csv(kind: str, results, write_size: int = WRITE_SIZE):
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(COLUMNS[kind])
+        for row in rows(kind, results):
+            yield writer.writerow(row.values())
+
+    return _buffered(lines(), write_size)
+
+
+def export_ndjson(kind: str, results, write_size: int = WRITE_SIZE):
+    lines = (
+        json.dumps(row, cls=DjangoJSONEncoder) + "\n" for row in rows(kind, results)
+    )
+    return _buffered(lines, write_size)
+
+
+EXPORTERS = {"csv": export_csv, "ndjson": export_ndjson}
@@ -0,0 +1,43 @@
+from django.db.models import CharField, Lookup
+from django.db.models.functions import Lower
+
+from records.search.normalize import norm
+
+# Lets filters address the lowercased expression indexes on name columns,
+# e.g. person__last_name__lower="smith" or person__last_name__lower__startswith.
+CharField.register_lookup(Lower)
+
+
+@CharField.register_lookup
+class ILike(Lookup):
+    """Raw ILIKE match, served by the gin_trgm_ops indexes."""
+
+    lookup_name = "ilike"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} ILIKE {rhs}", (*lhs_params, *rhs_params)
+
+
+@CharField.register_lookup
+class NormContains(Lookup):
+    """
+    Substring match against a <name>_norm column with the search term
+    normalized the same way, e.g. last_name_norm__normcontains="O'Bri".
+    A term with no normalized form ("-", "&") matches nothing rather than
+    LIKE '%%', which would match every row.
+    """
+
+    lookup_name = "normcontains"
+
+    def get_db_prep_lookup(self, value, connection):
+        return "%s", [f"%{connection.ops.prep_for_like_query(norm(value))}%"]
+
+    def as_sql(self, compiler, connection):
+        if not norm(self.rhs):
+            return "FALSE", ()
+
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} LIKE {rhs}", (*lhs_params, *rhs_params)
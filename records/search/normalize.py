@@ -0,0 +1,73 @@
+import re
+import unicodedata
+
+from django.db.models import OuterRef, Subquery
+
+# name columns stored a second time in normalized form as <field>_norm
+NORMALIZED_FIELDS = ("first_name", "last_name")
+
+_WILDCARD_SPLIT = re.compile(r"([%_])")
+
+
+def norm(value: str | None) -> str:
+    """
+    script/data_generator.py's norm() (lowercase, no whitespace) that also
+    folds accents and drops punctuation: "José", "jose" and "Jo-Se" are all
+    "jose", "O'Brien" is "obrien".
+    """
+    if value is None:
+        return ""
+
+    decomposed = unicodedata.normalize("NFKD", value.casefold())
+    return "".join(c for c in decomposed if c.isalnum())
+
+
+def norm_pattern(value: str) -> str:
+    """norm() for a wildcard pattern: % and _ survive, the pieces are folded."""
+    return "".join(
+        piece if piece in ("%", "_") else norm(piece)
+        for piece in _WILDCARD_SPLIT.split(value)
+    )
+
+
+def fill_norms(person) -> None:
+    for field in NORMALIZED_FIELDS:
+        setattr(person, f"{field}_norm", norm(getattr(person, field)))
+
+
+def backfill(person_model, search_model, batch_size: int = 2000) -> int:
+    """
+    Recompute every <field>_norm on Person in id batches, then copy them to
+    the PersonSearch rows. Returns the number of people.
+    """
+    norm_fields = [f"{field}_norm" for field in NORMALIZED_FIELDS]
+    total = 0
+    last_id = 0
+
+    while True:
+        people = list(
+            person_model.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .only("id", *NORMALIZED_FIELDS)[:batch_size]
+        )
+        if not people:
+            break
+
+        for person in people:
+            fill_norms(person)
+        person_model.objects.bulk_update(people, norm_fields)
+
+        ids = [person.id for person in people]
+        search_model.objects.filter(pk__in=ids).update(
+            **{
+                field: Subquery(
+                    person_model.objects.filter(pk=OuterRef("pk")).values(field)
+                )
+                for field in norm_fields
+            }
+        )
+
+        total += len(people)
+        last_id = ids[-1]
+
+    return total
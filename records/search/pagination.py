@@ -0,0 +1,214 @@
+import base64
+import binascii
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+from records.search.counting import ResultCount, result_count
+
+# cursor (seek) pagination: a page is "the next per_page rows after this
+# sort key", so deep pages cost the same as the first one and no page needs
+# COUNT(*) or OFFSET
+
+
+def _encode(payload: dict) -> str:
+    raw = json.dumps(payload, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(token: str) -> dict | None:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+    if not isinstance(payload, dict) or not isinstance(payload.get("n"), int):
+        return None
+    return payload
+
+
+def _beyond(keys, values) -> Q:
+    """
+    Rows strictly after `values` in the order `keys` ((alias, descending)
+    pairs). Mirrors PostgreSQL's defaults: NULLs sort last ascending and
+    first descending.
+    """
+    (alias, descending), value = keys[0], values[0]
+
+    if value is None:
+        after = Q(**{f"{alias}__isnull": False}) if descending else Q(pk__in=[])
+        same = Q(**{f"{alias}__isnull": True})
+    elif descending:
+        after = Q(**{f"{alias}__lt": value})
+        same = Q(**{alias: value})
+    else:
+        after = Q(**{f"{alias}__gt": value}) | Q(**{f"{alias}__isnull": True})
+        same = Q(**{alias: value})
+
+    if len(keys) == 1:
+        return after
+    return after | (same & _beyond(keys[1:], values[1:]))
+
+
+class CursorPage:
+    """One page of results plus the opaque tokens of its neighbours."""
+
+    def __init__(self, object_list, number, paginator, previous_token, next_token):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self.previous_token = previous_token
+        self.next_token = next_token
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return bool(self.next_token)
+
+    def has_previous(self):
+        return bool(self.previous_token)
+
+
+class KeysetPaginator:
+    """
+    Paginates `queryset` on its ordering (or the model's Meta.ordering)
+    with pk appended as the tiebreaker. Pages are addressed by the opaque
+    tokens on CursorPage instead of page numbers. The total is only
+    counted when `with_count` is set, through counting.result_count.
+    """
+
+    def __init__(self, queryset, per_page, with_count=False):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not {"pk", "-pk", "id", "-id"} & set(ordering):
+            ordering.append("pk")
+
+        self.per_page = per_page
+        self.with_count = with_count
+        self.keys = []
+        keyed = {}
+
+        for i, term in enumerate(ordering):
+            alias = f"keyset_{i}"
+            self.keys.append((alias, term.startswith("-")))
+            keyed[alias] = F(term.lstrip("-"))
+
+        self.queryset = queryset.annotate(**keyed)
+
+    def _token(self, direction, obj, number) -> str:
+        key = [getattr(obj, alias) for alias, _ in self.keys]
+        return _encode({"d": direction, "k": key, "n": number})
+
+    def _ordered(self, keys):
+        return self.queryset.order_by(
+            *[f"-{alias}" if descending else alias for alias, descending in keys]
+        )
+
+    @cached_property
+    def count(self):
+        """A ResultCount (possibly the planner's estimate), or None."""
+        if not self.with_count:
+            return None
+        return result_count(self.queryset)
+
+    @property
+    def num_pages(self):
+        # an estimate is shown as "about N results", never as a page total
+        count = self.count
+        if count is None or not count.exact:
+            return None
+        return max(1, -(-count // self.per_page))
+
+    def get_page(self, token=None) -> CursorPage:
+        """The page a token points at; the first page for a missing or bad one."""
+        payload = _decode(token) if token else None
+
+        if (
+            payload is None
+            or payload.get("d") not in ("n", "p")
+            or not isinstance(payload.get("k"), list)
+            or len(payload["k"]) != len(self.keys)
+        ):
+            return self._forward(self._ordered(self.keys), 1, has_prev=False)
+
+        values = payload["k"]
+        number = max(payload["n"], 1)
+
+        if payload["d"] == "n":
+            rows = self._ordered(self.keys).filter(_beyond(self.keys, values))
+            return self._forward(rows, number, has_prev=True)
+
+        # walk backwards: flip every direction, then restore the order
+        flipped = [(alias, not descending) for alias, descending in self.keys]
+        rows = list(
+            self._ordered(flipped).filter(_beyond(flipped, values))[: self.per_page + 1]
+        )
+        has_prev = len(rows) > self.per_page
+        rows = rows[: self.per_page][::-1]
+
+        return self._page(rows, number if has_prev else 1, has_prev, bool(rows))
+
+    def _forward(self, queryset, number, has_prev) -> CursorPage:
+        rows = list(queryset[: self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return self._page(rows[: self.per_page], number, has_prev, has_next)
+
+    def _page(self, rows, number, has_prev, has_next) -> CursorPage:
+        return CursorPage(
+            rows,
+            number,
+            self,
+            self._token("p", rows[0], number - 1) if rows and has_prev else "",
+            self._token("n", rows[-1], number + 1) if rows and has_next else "",
+        )
+
+
+class IdListPaginator:
+    """
+    Pages over an already ordered list of pks, e.g. one held by
+    result_cache. The total is exact and free, and a page is a single
+    pk__in query against `queryset`.
+    """
+
+    def __init__(self, queryset, ids, per_page):
+        self.queryset = queryset
+        self.ids = ids
+        self.per_page = per_page
+
+    @cached_property
+    def count(self):
+        return ResultCount(len(self.ids), exact=True)
+
+    @property
+    def num_pages(self):
+        return max(1, -(-self.count // self.per_page))
+
+    def _token(self, number) -> str:
+        return _encode({"d": "i", "n": number})
+
+    def get_page(self, token=None) -> CursorPage:
+        """The page a token points at; the first page for a missing or bad one."""
+        payload = _decode(token) if token else None
+        number = 1
+
+        if payload is not None and payload.get("d") == "i":
+            number = min(max(payload["n"], 1), self.num_pages)
+
+        start = (number - 1) * self.per_page
+        ids = self.ids[start : start + self.per_page]
+        rows = {obj.pk: obj for obj in self.queryset.filter(pk__in=ids)}
+
+        return CursorPage(
+            # rows deleted since the ids were cached are simply skipped
+            [rows[pk] for pk in ids if pk in rows],
+            number,
+            self,
+            self._token(number - 1) if number > 1 else "",
+            self._token(number + 1) if number < self.num_pages else "",
+        )
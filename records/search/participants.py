@@ -0,0 +1,63 @@
+from django.db import transaction
+
+from records.models import Marriage, MarriageParticipant
+from records.search import result_cache
+
+Role = MarriageParticipant.Role
+
+
+def _build_rows(marriage) -> list[MarriageParticipant]:
+    return [
+        MarriageParticipant(
+            marriage_id=marriage.id,
+            role=Role.SPOUSE1,
+            person_id=marriage.spouse1_id,
+            spouse_id=marriage.spouse2_id,
+        ),
+        MarriageParticipant(
+            marriage_id=marriage.id,
+            role=Role.SPOUSE2,
+            person_id=marriage.spouse2_id,
+            spouse_id=marriage.spouse1_id,
+        ),
+    ]
+
+
+def refresh_marriages(marriages) -> None:
+    """Write the participant rows of the given marriages (one statement)."""
+    rows = [row for marriage in marriages for row in _build_rows(marriage)]
+
+    if not rows:
+        return
+
+    MarriageParticipant.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["marriage", "role"],
+        update_fields=["person", "spouse"],
+    )
+
+
+def rebuild(batch_size: int = 2000) -> int:
+    """Drop and recreate every participant row; returns the number of marriages."""
+    total = 0
+    last_id = 0
+
+    with transaction.atomic():
+        MarriageParticipant.objects.all().delete()
+
+        while True:
+            marriages = list(
+                Marriage.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .only("id", "spouse1_id", "spouse2_id")[:batch_size]
+            )
+            if not marriages:
+                break
+
+            refresh_marriages(marriages)
+            total += len(marriages)
+            last_id = marriages[-1].id
+
+    result_cache.invalidate("marriage")
+    return total
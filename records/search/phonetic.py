@@ -0,0 +1,47 @@
+from django.db.models import CharField, Func, Q, Value
+
+# Sound-alike keys from PostgreSQL's fuzzystrmatch extension. Person keeps
+# a Soundex code and both Double Metaphone codes of its first and last
+# name in indexed generated columns (the functions are IMMUTABLE), so every
+# write path keeps them current; a phonetic search compares keys by equality.
+
+
+class Soundex(Func):
+    function = "soundex"
+    output_field = CharField()
+
+
+class DMetaphone(Func):
+    function = "dmetaphone"
+    output_field = CharField()
+
+
+class DMetaphoneAlt(Func):
+    function = "dmetaphone_alt"
+    output_field = CharField()
+
+
+def has_keys(name: str) -> bool:
+    """Whether `name` has a letter to key on; the keys of anything else are ''."""
+    return any("a" <= c <= "z" for c in name.lower())
+
+
+def phonetic_match(field: str, name: str, prefix: str = "") -> Q:
+    """
+    Sound-alike match of `name` against the keys of `field`: the Soundex
+    codes are equal, or the Double Metaphone codes (primary and alternate)
+    share one. The key of `name` is a constant the planner folds, so each
+    branch is a btree equality. A name without keys matches nothing, not
+    every row whose keys are blank.
+    """
+    if not has_keys(name):
+        return Q(pk__in=[])
+
+    column = f"{prefix}{field}"
+    codes = [DMetaphone(Value(name)), DMetaphoneAlt(Value(name))]
+
+    return (
+        Q(**{f"{column}_soundex": Soundex(Value(name))})
+        | Q(**{f"{column}_metaphone__in": codes})
+        | Q(**{f"{column}_metaphone_alt__in": codes})
+    )
@@ -1,21 +1,88 @@
-import re
+from datetime import MAXYEAR, MINYEAR, date
+
+from django.contrib.postgres.search import (
+    TrigramDistance,
+    TrigramSimilarity,
+    TrigramWordSimilarity,
+)
+from django.db.models import CharField, Exists, OuterRef, Q, TextField, Value
+from django.db.models.functions import Greatest
+from django.db.models.lookups import GreaterThanOrEqual
+
+from records.models import (
+    PERSON_FULL_NAME,
+    Birth,
+    City,
+    County,
+    Death,
+    Marriage,
+    MarriageParticipant,
+    Person,
+    PersonSearch,
+)
+from records.search import lookups  # noqa: F401  registers __lower and __ilike
+from records.search.normalize import NORMALIZED_FIELDS, norm, norm_pattern
+from records.search.phonetic import has_keys, phonetic_match
 
-from django.db import connection
-from django.db.models import CharField, DateField, Q, TextField
+# HELPERS ============
 
-from records.models import Birth, City, County, Death, Marriage, Person
+WILDCARDS = ("%", "_")
 
-# HELPERS ============
+# minimum trigram similarity per name part, and how many nearest people a
+# fuzzy search considers at most
+FUZZY_THRESHOLD = 0.3
+FUZZY_TOP_K = 500
 
 
-def _wild_clean(filters: dict) -> dict:
-    esc = {}
-    for k, v in filters.items():
-        escaped = re.escape(v)
-        escaped = escaped.replace("%", ".*")
-        escaped = escaped.replace("_", ".")
-        esc[k] = f"^{escaped}$"
-    return esc
+def _has_wildcard(value: str) -> bool:
+    return any(w in value for w in WILDCARDS)
+
+
+def _wild_match(field: str, value: str) -> Q:
+    """
+    Case-insensitive, fully anchored wildcard match (% = any run, _ = one char),
+    compiled to the cheapest indexable form:
+
+    - no wildcards       -> lower(field) = value      (lowercased btree)
+    - single trailing %  -> lower(field) LIKE 'val%'  (text_pattern_ops range)
+    - anything else      -> field ILIKE pattern       (trigram GIN)
+    """
+    if not _has_wildcard(value):
+        return Q(**{f"{field}__lower": value.lower()})
+
+    head = value[:-1]
+    if value.endswith("%") and head and not _has_wildcard(head):
+        return Q(**{f"{field}__lower__startswith": head.lower()})
+
+    # % and _ are already LIKE wildcards; only the escape character needs care
+    return Q(**{f"{field}__ilike": value.replace("\\", "\\\\")})
+
+
+def _norm_match(field: str, value: str) -> Q:
+    """
+    _wild_match against a stored <name>_norm column: the value is folded the
+    same way (normalize.norm), so "Jose" finds "José" and "OBrien" finds
+    "O'Brien". The column is already lowercase, so no lower() is needed.
+    """
+    if not _has_wildcard(value):
+        return Q(**{field: norm(value)})
+
+    head = value[:-1]
+    if value.endswith("%") and head and not _has_wildcard(head):
+        return Q(**{f"{field}__startswith": norm(head)})
+
+    return Q(**{f"{field}__ilike": norm_pattern(value)})
+
+
+def _wild_clean(filters: dict, prefix: str = "") -> Q:
+    q = Q()
+    for field, value in filters.items():
+        # a value that is all punctuation has no normalized form to look for
+        if field in NORMALIZED_FIELDS and norm(value):
+            q &= _norm_match(f"{prefix}{field}_norm", value)
+        else:
+            q &= _wild_match(f"{prefix}{field}", value)
+    return q
 
 
 def _get_model_filters(filters: dict, model):
@@ -23,7 +90,7 @@ def _get_model_filters(filters: dict, model):
     fields_model = {
         f.name
         for f in model._meta.concrete_fields
-        if isinstance(f, (CharField, TextField))
+        if f.editable and isinstance(f, (CharField, TextField))
     }
     for k, v in filters.items():
         if k in fields_model:
@@ -50,10 +117,14 @@ def _marriage_to_person_filters(filters: dict) -> tuple[dict, dict]:
     return _get_person_filters(filters_spouse1), _get_person_filters(filters_spouse2)
 
 
-def _get_date_range(d, variance) -> tuple[int, int]:
-    s = d - variance
-    e = d + variance
-    return s, e
+def _get_date_range(d, variance) -> tuple[date, date]:
+    """
+    Half-open [Jan 1 of d - variance, Jan 1 of d + variance + 1) so the
+    date column is compared directly and its btree index stays usable.
+    """
+    s = max(d - variance, MINYEAR)
+    e = min(d + variance + 1, MAXYEAR)
+    return date(s, 1, 1), date(e, 1, 1)
 
 
 def _get_person_filters(filters: dict):
@@ -83,163 +154,237 @@ def _get_city_filters(filters: dict):
 # SEARCH =================
 
 
-def birth_search(filters: dict, fuzzy: bool = False):
-    filters_birth = _wild_clean(_get_birth_filters(filters))
-    filters_county = _wild_clean(_get_county_filters(filters))
-    filters_city = _wild_clean(_get_city_filters(filters))
-
+def birth_search(filters: dict, fuzzy: bool = False, phonetic: bool = False):
     q = Q()
 
     # Birth fields
-    for field, pattern in filters_birth.items():
-        q &= Q(**{f"{field}__iregex": pattern})
+    q &= _wild_clean(_get_birth_filters(filters))
 
-    # Person fields (JOIN)
+    # Person fields (JOIN); a fuzzy name is matched by _nearest_people
     if fuzzy:
-        q &= _fuzzy_person_search(
+        names = _names(filters)
+        _, score = _fuzzy_person_search(*names)
+    elif phonetic:
+        q &= _phonetic_person_search(
             filters.get("first_name"),
             filters.get("middle_name"),
             filters.get("last_name"),
         )
     else:
-        filters_person = _wild_clean(_get_person_filters(filters))
-        for field, pattern in filters_person.items():
-            q &= Q(**{f"person__{field}__iregex": pattern})
+        q &= _wild_clean(_get_person_filters(filters), "person__")
 
     # County JOIN
-    for field, pattern in filters_county.items():
-        q &= Q(**{f"birth_county__{field}__iregex": pattern})
+    q &= _wild_clean(_get_county_filters(filters), "birth_county__")
 
     # City JOIN
-    for field, pattern in filters_city.items():
-        q &= Q(**{f"birth_city__{field}__iregex": pattern})
+    q &= _wild_clean(_get_city_filters(filters), "birth_city__")
 
     birth_date, variance = _get_date_and_variance(filters, "birth_date")
 
     if birth_date is not None:
         s, e = _get_date_range(birth_date, variance)
-        q &= Q(birth_date__year__gte=s, birth_date__year__lte=e)
+        q &= Q(birth_date__gte=s, birth_date__lt=e)
+
+    res = Birth.objects.filter(q)
 
-    return Birth.objects.filter(q).distinct()
+    if fuzzy:
+        res = _rank_by(res.filter(_nearest_people(names, res)), score)
 
+    return res.distinct()
 
-def death_search(filters: dict, fuzzy: bool = False):
-    filters_death = _wild_clean(_get_death_filters(filters))
-    filters_county = _wild_clean(_get_county_filters(filters))
-    filters_city = _wild_clean(_get_city_filters(filters))
 
+def death_search(filters: dict, fuzzy: bool = False, phonetic: bool = False):
     q = Q()
 
     # Death fields
-    for field, pattern in filters_death.items():
-        q &= Q(**{f"{field}__iregex": pattern})
+    q &= _wild_clean(_get_death_filters(filters))
 
-    # Person fields (JOIN)
+    # Person fields (JOIN); a fuzzy name is matched by _nearest_people
     if fuzzy:
-        q &= _fuzzy_person_search(
+        names = _names(filters)
+        _, score = _fuzzy_person_search(*names)
+    elif phonetic:
+        q &= _phonetic_person_search(
             filters.get("first_name"),
             filters.get("middle_name"),
             filters.get("last_name"),
         )
     else:
-        filters_person = _wild_clean(_get_person_filters(filters))
-        for field, pattern in filters_person.items():
-            q &= Q(**{f"person__{field}__iregex": pattern})
+        q &= _wild_clean(_get_person_filters(filters), "person__")
 
     # County JOIN
-    for field, pattern in filters_county.items():
-        q &= Q(**{f"death_county__{field}__iregex": pattern})
+    q &= _wild_clean(_get_county_filters(filters), "death_county__")
 
     # City JOIN
-    for field, pattern in filters_city.items():
-        q &= Q(**{f"death_city__{field}__iregex": pattern})
+    q &= _wild_clean(_get_city_filters(filters), "death_city__")
 
     death_date, variance = _get_date_and_variance(filters, "death_date")
 
     if death_date is not None:
         s, e = _get_date_range(death_date, variance)
-        q &= Q(death_date__year__gte=s, death_date__year__lte=e)
+        q &= Q(death_date__gte=s, death_date__lt=e)
+
+    res = Death.objects.filter(q)
 
-    return Death.objects.filter(q).distinct()
+    if fuzzy:
+        res = _rank_by(res.filter(_nearest_people(names, res)), score)
 
+    return res.distinct()
 
-def marriage_search(filters: dict, fuzzy: bool = False):
-    filters_marriage = _wild_clean(_get_marriage_filters(filters))
+
+def marriage_search(filters: dict, fuzzy: bool = False, phonetic: bool = False):
     filters_spouse1, filters_spouse2 = _marriage_to_person_filters(filters)
-    filters_spouse1 = _wild_clean(filters_spouse1)
-    filters_spouse2 = _wild_clean(filters_spouse2)
-    filters_county = _wild_clean(_get_county_filters(filters))
-    filters_city = _wild_clean(_get_city_filters(filters))
 
     q = Q()
 
     # Marriage fields
-    for field, pattern in filters_marriage.items():
-        q &= Q(**{f"{field}__iregex": pattern})
+    q &= _wild_clean(_get_marriage_filters(filters))
 
-    for field, pattern in filters_county.items():
-        q &= Q(**{f"marriage_county__{field}__iregex": pattern})
+    q &= _wild_clean(_get_county_filters(filters), "marriage_county__")
 
-    for field, pattern in filters_city.items():
-        q &= Q(**{f"marriage_city__{field}__iregex": pattern})
+    q &= _wild_clean(_get_city_filters(filters), "marriage_city__")
 
-    q_s1_set1 = Q()
-    q_s2_set2 = Q()
-    q_s1_set2 = Q()
-    q_s2_set1 = Q()
+    marriage_date, variance = _get_date_and_variance(filters, "marriage_date")
 
-    # spouse 1
+    if marriage_date is not None:
+        s, e = _get_date_range(marriage_date, variance)
+        q &= Q(marriage_date__gte=s, marriage_date__lt=e)
+
+    # Spouses: every marriage has a participant row per spouse with the
+    # other spouse next to it, so "one spouse matches set 1 and the other
+    # set 2, in either order" is one semi-join on the participant table
+    # (no OR of the two orders, no DISTINCT)
     if fuzzy:
-        q_s1_set1 &= _fuzzy_person_search(
-            filters_spouse1.get("first_name"),
-            filters_spouse1.get("middle_name"),
-            filters_spouse1.get("last_name"),
-            "spouse1__",
-        )
-        q_s1_set2 &= _fuzzy_person_search(
-            filters_spouse2.get("first_name"),
-            filters_spouse2.get("middle_name"),
-            filters_spouse2.get("last_name"),
-            "spouse1__",
-        )
+        # KNN over one set's names on Person; the other set and the
+        # marriage filters are checked through the participant rows
+        near, other = filters_spouse1, filters_spouse2
+        if not any(_names(near)):
+            near, other = other, near
+
+        if any(_names(near)):
+            q_spouse, _ = _spouse_search(other, "spouse__", True, False)
+            participants = MarriageParticipant.objects.filter(q_spouse)
+            if q:
+                participants = participants.filter(
+                    marriage__in=Marriage.objects.filter(q)
+                )
+            participants = participants.filter(
+                _nearest_people(_names(near), participants)
+            )
+            q &= Q(pk__in=participants.values("marriage"))
     else:
-        for field, pattern in filters_spouse1.items():
-            q_s1_set1 &= Q(**{f"spouse1__{field}__iregex": pattern})
-        for field, pattern in filters_spouse2.items():
-            q_s1_set2 &= Q(**{f"spouse1__{field}__iregex": pattern})
+        q_person, _ = _spouse_search(filters_spouse1, "person__", False, phonetic)
+        q_spouse, _ = _spouse_search(filters_spouse2, "spouse__", False, phonetic)
+
+        if q_person or q_spouse:
+            participants = MarriageParticipant.objects.filter(q_person & q_spouse)
+            q &= Q(pk__in=participants.values("marriage"))
+
+    res = Marriage.objects.filter(q)
 
-    # spouse 2
     if fuzzy:
-        q_s2_set2 &= _fuzzy_person_search(
-            filters_spouse2.get("first_name"),
-            filters_spouse2.get("middle_name"),
-            filters_spouse2.get("last_name"),
-            "spouse2__",
+        # the better of the two spouse orders
+        _, score_s1_set1 = _spouse_search(filters_spouse1, "spouse1__", True, False)
+        _, score_s2_set2 = _spouse_search(filters_spouse2, "spouse2__", True, False)
+        _, score_s1_set2 = _spouse_search(filters_spouse2, "spouse1__", True, False)
+        _, score_s2_set1 = _spouse_search(filters_spouse1, "spouse2__", True, False)
+
+        res = _rank_by(
+            res,
+            Greatest(
+                score_s1_set1 + score_s2_set2,
+                score_s1_set2 + score_s2_set1,
+            ),
         )
-        q_s2_set1 &= _fuzzy_person_search(
-            filters_spouse1.get("first_name"),
-            filters_spouse1.get("middle_name"),
-            filters_spouse1.get("last_name"),
-            "spouse2__",
+
+    return res
+
+
+def _names(filters: dict) -> tuple:
+    return (
+        filters.get("first_name"),
+        filters.get("middle_name"),
+        filters.get("last_name"),
+    )
+
+
+def _spouse_search(filters: dict, prefix: str, fuzzy: bool, phonetic: bool):
+    """(q, fuzzy score or None) matching one spouse's name filters at `prefix`."""
+    names = _names(filters)
+
+    if fuzzy:
+        return _fuzzy_person_search(*names, prefix)
+    if phonetic:
+        return _phonetic_person_search(*names, prefix), None
+    return _wild_clean(filters, prefix), None
+
+
+_EVENT_MODELS = {"birth": Birth, "death": Death}
+
+
+def _person_row_search(event: str, filters: dict, fuzzy: bool, phonetic: bool):
+    """
+    Birth/death search over the denormalized PersonSearch table: one row per
+    person, no joins and no DISTINCT. The row copies a person's first
+    record; people with more than one are also matched on the others.
+    """
+    q = Q(**{f"has_{event}": True})
+
+    # Person fields
+    if fuzzy:
+        names = _names(filters)
+        q_person, score = _fuzzy_person_search(*names, "")
+        q &= q_person
+    elif phonetic:
+        q &= _phonetic_person_search(
+            filters.get("first_name"),
+            filters.get("middle_name"),
+            filters.get("last_name"),
+            "",
         )
     else:
-        for field, pattern in filters_spouse2.items():
-            q_s2_set2 &= Q(**{f"spouse2__{field}__iregex": pattern})
-        for field, pattern in filters_spouse1.items():
-            q_s2_set1 &= Q(**{f"spouse2__{field}__iregex": pattern})
+        q &= _wild_clean(_get_person_filters(filters))
 
-    q_order1 = q_s1_set1 & q_s2_set2
-    q_order2 = q_s1_set2 & q_s2_set1
+    # County / City names and date, on the row's copy of the first record
+    q_row = _wild_clean(_get_county_filters(filters), f"{event}_")
+    q_row &= _wild_clean(_get_city_filters(filters), f"{event}_")
 
-    q &= q_order1 | q_order2
+    # ... and on the records themselves for people with more than one
+    q_record = _wild_clean(_get_county_filters(filters), f"{event}_county__")
+    q_record &= _wild_clean(_get_city_filters(filters), f"{event}_city__")
 
-    marriage_date, variance = _get_date_and_variance(filters, "marriage_date")
+    date_field = f"{event}_date"
+    year, variance = _get_date_and_variance(filters, date_field)
 
-    if marriage_date is not None:
-        s, e = _get_date_range(marriage_date, variance)
-        q &= Q(marriage_date__year__gte=s, marriage_date__year__lte=e)
+    if year is not None:
+        s, e = _get_date_range(year, variance)
+        q_row &= Q(**{f"{date_field}__gte": s, f"{date_field}__lt": e})
+        q_record &= Q(**{f"{date_field}__gte": s, f"{date_field}__lt": e})
+
+    if q_row:
+        records = _EVENT_MODELS[event].objects.filter(q_record)
+        q &= q_row | Q(
+            **{f"multiple_{event}s": True}, pk__in=records.values("person")
+        )
+
+    res = PersonSearch.objects.filter(q).order_by(
+        date_field, f"{event}_county_name", "pk"
+    )
+
+    if fuzzy and q_person:
+        res = _rank_by(res.filter(pk__in=_nearest(res, names)), score)
+    elif fuzzy:
+        res = _rank_by(res, score)
+
+    return res
 
-    return Marriage.objects.filter(q).distinct()
+
+def birth_row_search(filters: dict, fuzzy: bool = False, phonetic: bool = False):
+    return _person_row_search("birth", filters, fuzzy, phonetic)
+
+
+def death_row_search(filters: dict, fuzzy: bool = False, phonetic: bool = False):
+    return _person_row_search("death", filters, fuzzy, phonetic)
 
 
 def get_marriage_by_person(person):
@@ -254,41 +399,128 @@ def get_marriage_by_person(person):
         return marriage
 
 
+def _name_parts(first_name: str, middle_name: str, last_name: str) -> dict:
+    return {
+        field: value
+        for field, value in (
+            ("first_name", first_name),
+            ("middle_name", middle_name),
+            ("last_name", last_name),
+        )
+        if value
+    }
+
+
 def _fuzzy_person_search(
-    first_name: str, middle_name: str, last_name: str, prefix: str = "person__"
+    first_name: str,
+    middle_name: str,
+    last_name: str,
+    prefix: str = "person__",
+    threshold: float = FUZZY_THRESHOLD,
 ):
-    with connection.cursor() as cursor:
-        cursor.execute("SET pg_trgm.similarity_threshold = .3;")
+    """
+    Ranked fuzzy name match, returned as (q, score).
+
+    Every given name part must reach `threshold` similarity (the old
+    trigram_similar rule, but without the session-wide SET), and the mean
+    part similarity is the score results are ordered by. The top-K cap is
+    applied to the fully filtered query afterwards (see _nearest).
+    """
+    parts = _name_parts(first_name, middle_name, last_name)
+
+    if not parts:
+        return Q(), Value(0.0)
 
     q = Q()
+    similarities = []
+
+    for field, value in parts.items():
+        similarity = TrigramSimilarity(f"{prefix}{field}", value)
+        q &= Q(GreaterThanOrEqual(similarity, threshold))
+        similarities.append(similarity)
+
+    score = sum(similarities[1:], similarities[0]) / len(similarities)
+    return q, score
+
+
+def _nearest(objects, names: tuple):
+    """
+    The pks of the FUZZY_TOP_K rows of `objects` nearest the searched name.
+    `objects` is a Person or PersonSearch queryset with every filter of the
+    search already applied, so this is ORDER BY <-> LIMIT K on the table's
+    own full-name gist_trgm_ops index: one bounded KNN index scan, with the
+    other conditions (per-part thresholds included) checked on the rows it
+    walks. pg_trgm's indexable % and <% read their threshold from the
+    session, which is why the threshold is not an index condition.
+    """
+    target = " ".join(_name_parts(*names).values())
+    distance = TrigramDistance(PERSON_FULL_NAME, target)
+    return objects.order_by(distance).values("pk")[:FUZZY_TOP_K]
+
+
+def _nearest_people(names: tuple, records, field: str = "person") -> Q:
+    """
+    Restrict `records` (already filtered) to those of the nearest people
+    (see _nearest) that have one of them: the records are a semi-join of
+    the KNN scan on Person, so no filter can lose matches to K closer
+    names elsewhere.
+    """
+    q_names, _ = _fuzzy_person_search(*names, "")
+
+    if not q_names:
+        return Q()
+
+    people = Person.objects.filter(
+        q_names, Exists(records.filter(**{field: OuterRef("pk")}))
+    )
+    return Q(**{f"{field}__in": _nearest(people, names)})
+
+
+def _phonetic_person_search(
+    first_name: str,
+    middle_name: str,
+    last_name: str,
+    prefix: str = "person__",
+) -> Q:
+    """
+    Sound-alike match on the first and last name keys (btree seeks on
+    Person); a middle name, or a name with no letters to key on, is still
+    matched like a normal search.
+    """
+    q = Q()
+
+    for field, value in (("first_name", first_name), ("last_name", last_name)):
+        if value and has_keys(value):
+            q &= phonetic_match(field, value)
+        elif value:
+            q &= _wild_clean({field: value})
 
-    if first_name:
-        q &= Q(**{f"{prefix}first_name__trigram_similar": first_name})
     if middle_name:
-        q &= Q(**{f"{prefix}middle_name__trigram_similar": middle_name})
-    if last_name:
-        q &= Q(**{f"{prefix}last_name__trigram_similar": last_name})
+        q &= _wild_match("middle_name", middle_name)
+
+    if not q:
+        return q
+    return Q(**{f"{prefix}pk__in": Person.objects.filter(q).values("id")})
 
-    return q
+
+def _rank_by(objects, score):
+    ordering = objects.query.order_by or objects.model._meta.ordering
+    return objects.annotate(score=score).order_by("-score", *ordering)
 
 
 def narrow_down(query: str, objects):
+    """
+    Search within results: one substring match on the precomputed
+    search_document (trigram GIN), best word-similarity first.
+    """
     if not query:
         return objects
 
-    model = objects.model
-    q = Q()
-
-    for field in model._meta.get_fields():
-        # Direct text fields
-        if isinstance(field, (CharField, TextField, DateField)):
-            q |= Q(**{f"{field.name}__icontains": query})
-
-        # ForeignKey relations (1 level deep)
-        if field.is_relation and field.many_to_one:
-            rel_model = field.related_model
-            for rel_field in rel_model._meta.get_fields():
-                if rel_field.concrete and isinstance(rel_field, (CharField, TextField)):
-                    q |= Q(**{f"{field.name}__{rel_field.name}__icontains": query})
+    query = query.lower()
+    ordering = objects.query.order_by or objects.model._meta.ordering
 
-    return objects.filter(q).distinct()
+    return (
+        objects.filter(search_document__contains=query)
+        .annotate(match=TrigramWordSimilarity(query, "search_document"))
+        .order_by("-match", *ordering)
+    )
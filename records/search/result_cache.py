@@ -0,0 +1,117 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from records.models import Birth, City, County, Death, Marriage, Person
+from records.search.pagination import IdListPaginator, KeysetPaginator
+
+# Ordered result ids per (search, normalized filters, name mode), in the
+# "search" cache (see CACHES). Entries are never deleted one by one:
+# each search kind has a generation stamp that is part of every key, and
+# a write to any table the kind reads from replaces the stamp.
+
+# the tables each kind of search result is built from; "kinship" is the
+# in-memory family graph of records.kinship, which only uses the stamp
+DEPENDS_ON = {
+    "birth": (Person, Birth, Death, County, City),
+    "death": (Person, Birth, Death, County, City),
+    "marriage": (Person, Marriage, County, City),
+    "kinship": (Person, Marriage),
+}
+
+# stored instead of an id list when a search matched too much to cache
+TOO_BROAD = "too-broad"
+
+
+def _cache():
+    return caches["search"]
+
+
+def _generation_key(kind: str) -> str:
+    return f"search:gen:{kind}"
+
+
+def generation(kind: str) -> str:
+    """The current stamp of `kind`; it changes whenever one of its tables does."""
+    key = _generation_key(kind)
+    stamp = _cache().get(key)
+
+    if stamp is None:
+        stamp = str(time.time_ns())
+        # add, not set: another request may have just started a generation
+        if not _cache().add(key, stamp, timeout=None):
+            stamp = _cache().get(key, stamp)
+
+    return stamp
+
+
+def invalidate(*kinds: str) -> None:
+    for kind in kinds or DEPENDS_ON:
+        _cache().set(_generation_key(kind), str(time.time_ns()), timeout=None)
+
+
+def invalidate_for(model) -> None:
+    """Invalidate every kind of search built from `model`'s table."""
+    invalidate(*[kind for kind, models in DEPENDS_ON.items() if model in models])
+
+
+def normalize_filters(filters: dict) -> dict:
+    # matching is case-insensitive and blank fields are ignored, so
+    # " SMITH" and "smith" are the same search
+    normalized = {}
+    for field, value in filters.items():
+        value = str(value).strip().lower()
+        if value:
+            normalized[field] = value
+    return normalized
+
+
+def cache_key(
+    kind: str, filters: dict, fuzzy: bool = False, phonetic: bool = False
+) -> str:
+    payload = json.dumps(
+        [normalize_filters(filters), bool(fuzzy), bool(phonetic)],
+        sort_keys=True,
+        default=str,
+    )
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    return f"search:{kind}:{generation(kind)}:{digest}"
+
+
+def cached_ids(
+    kind: str, filters: dict, queryset, fuzzy: bool = False, phonetic: bool = False
+) -> list | None:
+    """
+    The ordered pks of `queryset`, from the cache or computed and stored;
+    None when the search matches more than SEARCH_CACHE_MAX_IDS rows.
+    """
+    key = cache_key(kind, filters, fuzzy, phonetic)
+    ids = _cache().get(key)
+
+    if ids is None:
+        limit = settings.SEARCH_CACHE_MAX_IDS
+        ids = list(queryset.values_list("pk", flat=True)[: limit + 1])
+        if len(ids) > limit:
+            ids = TOO_BROAD
+        _cache().set(key, ids)
+
+    return None if ids == TOO_BROAD else ids
+
+
+def search_paginator(
+    kind: str,
+    filters: dict,
+    queryset,
+    per_page: int,
+    fuzzy: bool = False,
+    phonetic: bool = False,
+):
+    """Pages from the cached id list when there is one, by keyset otherwise."""
+    ids = cached_ids(kind, filters, queryset, fuzzy, phonetic)
+
+    if ids is None:
+        return KeysetPaginator(queryset, per_page, with_count=True)
+    return IdListPaginator(queryset, ids, per_page)
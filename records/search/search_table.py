@@ -0,0 +1,176 @@
+from django.db import transaction
+from django.db.models import Prefetch, Q
+
+from records.models import Birth, City, County, Death, Person, PersonSearch
+from records.search import result_cache
+from records.search.documents import DOCUMENT_FIELD, refresh_documents
+
+# every PersonSearch column except the person key and the document, which
+# is derived from the others in SQL afterwards
+ROW_FIELDS = [
+    f.name
+    for f in PersonSearch._meta.concrete_fields
+    if not f.primary_key and f.name != DOCUMENT_FIELD
+]
+
+
+def _event_columns(event: str, record, more: bool = False) -> dict:
+    if record is None:
+        return {
+            f"has_{event}": False,
+            f"multiple_{event}s": False,
+            f"{event}_date": None,
+            f"{event}_county_code": None,
+            f"{event}_county_name": None,
+            f"{event}_city_id": None,
+            f"{event}_city_name": None,
+            f"{event}_record_image": None,
+        }
+
+    county = getattr(record, f"{event}_county")
+    city = getattr(record, f"{event}_city")
+    image = getattr(record, f"{event}_record_image")
+
+    return {
+        f"has_{event}": True,
+        f"multiple_{event}s": more,
+        f"{event}_date": getattr(record, f"{event}_date"),
+        f"{event}_county_code": county.county_code if county else None,
+        f"{event}_county_name": county.county_name if county else None,
+        f"{event}_city_id": city.id if city else None,
+        f"{event}_city_name": city.city_name if city else None,
+        f"{event}_record_image": image.name if image else None,
+    }
+
+
+def build_row(
+    person, birth=None, death=None, more_births=False, more_deaths=False
+) -> PersonSearch:
+    """
+    The search row of `person` given their first birth and death record,
+    and whether they have more than one of each.
+    """
+    return PersonSearch(
+        person_id=person.id,
+        last_name=person.last_name,
+        first_name=person.first_name,
+        middle_name=person.middle_name,
+        first_name_norm=person.first_name_norm,
+        last_name_norm=person.last_name_norm,
+        sex=person.sex,
+        **_event_columns("birth", birth, more_births),
+        **_event_columns("death", death, more_deaths),
+    )
+
+
+def _build_row(person) -> PersonSearch:
+    births = person.birth.all()
+    deaths = person.death.all()
+
+    return build_row(
+        person,
+        births[0] if births else None,
+        deaths[0] if deaths else None,
+        len(births) > 1,
+        len(deaths) > 1,
+    )
+
+
+def refresh_people(person_ids) -> None:
+    """Recompute the search rows of the given people (3 queries + 2 writes)."""
+    ids = {pid for pid in person_ids if pid is not None}
+
+    if not ids:
+        return
+
+    people = (
+        Person.objects.filter(id__in=ids)
+        .order_by()
+        .prefetch_related(
+            Prefetch(
+                "birth",
+                queryset=Birth.objects.select_related("birth_county", "birth_city"),
+            ),
+            Prefetch(
+                "death",
+                queryset=Death.objects.select_related("death_county", "death_city"),
+            ),
+        )
+    )
+
+    PersonSearch.objects.bulk_create(
+        [_build_row(person) for person in people],
+        update_conflicts=True,
+        unique_fields=["person"],
+        update_fields=ROW_FIELDS,
+    )
+    refresh_documents(PersonSearch, Q(pk__in=ids))
+
+
+def _update_rows(q: Q, **values) -> None:
+    # `q` may select on a column being cleared, so pin the rows first
+    pks = list(PersonSearch.objects.filter(q).values_list("pk", flat=True))
+    if not pks:
+        return
+
+    PersonSearch.objects.filter(pk__in=pks).update(**values)
+    refresh_documents(PersonSearch, Q(pk__in=pks))
+
+
+def rename_county(county: County) -> None:
+    for event in ("birth", "death"):
+        _update_rows(
+            Q(**{f"{event}_county_code": county.pk}),
+            **{f"{event}_county_name": county.county_name},
+        )
+
+
+def rename_city(city: City) -> None:
+    for event in ("birth", "death"):
+        _update_rows(
+            Q(**{f"{event}_city_id": city.pk}),
+            **{f"{event}_city_name": city.city_name},
+        )
+
+
+def forget_county(county_code: int) -> None:
+    # mirrors on_delete=SET_NULL on Birth/Death.*_county
+    for event in ("birth", "death"):
+        _update_rows(
+            Q(**{f"{event}_county_code": county_code}),
+            **{f"{event}_county_code": None, f"{event}_county_name": None},
+        )
+
+
+def forget_city(city_id: int) -> None:
+    for event in ("birth", "death"):
+        _update_rows(
+            Q(**{f"{event}_city_id": city_id}),
+            **{f"{event}_city_id": None, f"{event}_city_name": None},
+        )
+
+
+def rebuild(batch_size: int = 2000) -> int:
+    """Drop and recreate every search row; returns the number of rows."""
+    total = 0
+    last_id = 0
+
+    with transaction.atomic():
+        PersonSearch.objects.all().delete()
+
+        while True:
+            ids = list(
+                Person.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            refresh_people(ids)
+            total += len(ids)
+            last_id = ids[-1]
+
+    # a rebuild usually follows bulk writes, which cached searches never saw
+    result_cache.invalidate()
+    return total
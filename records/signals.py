@@ -0,0 +1,314 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from records import ancestry, derivatives, versions
+from records.models import Birth, City, County, Death, Marriage, Person
+from records.search import (
+    documents,
+    normalize,
+    participants,
+    result_cache,
+    search_table,
+)
+
+# PERSON SEARCH TABLE ============
+# Keeps PersonSearch in step with the rows it is built from. Bulk writes
+# (bulk_create, QuerySet.update) bypass these; run rebuild_person_search
+# after them.
+
+
+@receiver(post_save, sender=Person)
+def person_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search_table.refresh_people([instance.id])
+
+
+@receiver(pre_save, sender=Birth)
+@receiver(pre_save, sender=Death)
+def record_moving(sender, instance, raw=False, **kwargs):
+    # remember the previous owner so a record moved between people
+    # refreshes both of them
+    instance._search_prev_person_id = None
+    if not raw and instance.pk is not None:
+        instance._search_prev_person_id = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("person_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Birth)
+@receiver(post_save, sender=Death)
+def record_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search_table.refresh_people(
+            [instance.person_id, getattr(instance, "_search_prev_person_id", None)]
+        )
+
+
+@receiver(post_delete, sender=Birth)
+@receiver(post_delete, sender=Death)
+def record_deleted(sender, instance, origin=None, **kwargs):
+    # when the person itself is being deleted its row cascades away; refreshing
+    # here would re-insert it just before the person goes
+    if isinstance(origin, Person) or getattr(origin, "model", None) is Person:
+        return
+    search_table.refresh_people([instance.person_id])
+
+
+@receiver(post_save, sender=County)
+def county_saved(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        search_table.rename_county(instance)
+
+
+@receiver(post_save, sender=City)
+def city_saved(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        search_table.rename_city(instance)
+
+
+@receiver(post_delete, sender=County)
+def county_deleted(sender, instance, **kwargs):
+    search_table.forget_county(instance.pk)
+
+
+@receiver(post_delete, sender=City)
+def city_deleted(sender, instance, **kwargs):
+    search_table.forget_city(instance.pk)
+
+
+# MARRIAGE PARTICIPANTS ============
+# Rows cascade away with their marriage; bulk writes need
+# rebuild_person_search.
+
+
+@receiver(post_save, sender=Marriage)
+def marriage_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        participants.refresh_marriages([instance])
+
+
+# NORMALIZED NAMES ============
+# Person.<name>_norm is computed in Python (normalize.norm) before the row
+# is written, so the post_save receivers above already see it.
+
+
+@receiver(pre_save, sender=Person)
+def person_normalizing(sender, instance, update_fields=None, **kwargs):
+    normalize.fill_norms(instance)
+
+    # save(update_fields=[...]) would not write the columns filled in above
+    if update_fields is not None and set(normalize.NORMALIZED_FIELDS) & set(
+        update_fields
+    ):
+        sender.objects.filter(pk=instance.pk).update(
+            **{
+                f"{field}_norm": getattr(instance, f"{field}_norm")
+                for field in normalize.NORMALIZED_FIELDS
+            }
+        )
+
+
+# SEARCH DOCUMENTS ============
+# Birth/Death/Marriage.search_document copies person and place names, so it
+# is refreshed when the record or anything it points at changes.
+
+
+@receiver(post_save, sender=Birth)
+@receiver(post_save, sender=Death)
+@receiver(post_save, sender=Marriage)
+def record_document_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        documents.refresh_documents(sender, Q(pk=instance.pk))
+
+
+@receiver(post_save, sender=Person)
+@receiver(post_save, sender=County)
+@receiver(post_save, sender=City)
+def referenced_row_saved(sender, instance, created=False, raw=False, **kwargs):
+    # nothing can point at a row that was just created
+    if not created and not raw:
+        documents.refresh_dependents(instance)
+
+
+@receiver(pre_delete, sender=County)
+@receiver(pre_delete, sender=City)
+def place_deleting(sender, instance, **kwargs):
+    # SET_NULL runs as a plain UPDATE with no signals, and afterwards the
+    # records no longer point here, so note them now
+    instance._document_dependents = {
+        model: list(model.objects.filter(q).values_list("pk", flat=True))
+        for model, q in documents.dependents(instance).items()
+    }
+
+
+@receiver(post_delete, sender=County)
+@receiver(post_delete, sender=City)
+def place_deleted(sender, instance, **kwargs):
+    for model, pks in getattr(instance, "_document_dependents", {}).items():
+        if pks:
+            documents.refresh_documents(model, Q(pk__in=pks))
+
+
+# ANCESTRY ============
+# Ancestry rows follow Person.mother/father. Bulk writes need
+# rebuild_ancestry.
+
+
+@receiver(pre_save, sender=Person)
+def person_reparenting(sender, instance, raw=False, **kwargs):
+    instance._ancestry_prev_parents = None
+    if not raw and instance.pk is not None:
+        instance._ancestry_prev_parents = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("mother_id", "father_id")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Person)
+def person_reparented(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+
+    parents = (instance.mother_id, instance.father_id)
+    previous = getattr(instance, "_ancestry_prev_parents", None)
+
+    if created and parents == (None, None):
+        return
+    if not created and previous == parents:
+        return
+
+    ancestry.refresh([instance.pk])
+
+
+@receiver(pre_delete, sender=Person)
+def person_deleting(sender, instance, **kwargs):
+    # the children lose this parent (SET_NULL) without a save of their own
+    instance._ancestry_below = ancestry.below([instance.pk]) - {instance.pk}
+
+
+@receiver(post_delete, sender=Person)
+def person_deleted(sender, instance, **kwargs):
+    ancestry.refresh(getattr(instance, "_ancestry_below", ()))
+
+
+# RECORD VERSIONS ============
+# A person's exports show their own rows and their parents', spouses' and
+# children's names, so a write bumps the stamp of everyone it touches.
+# SET_NULL and CASCADE run without saves, so deletes note the people
+# first.
+
+
+@receiver(post_save, sender=Person)
+def person_versioned(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versions.bump(
+            versions.relatives([instance.pk])
+            | set(getattr(instance, "_ancestry_prev_parents", None) or ())
+        )
+
+
+@receiver(post_save, sender=Birth)
+@receiver(post_save, sender=Death)
+def record_versioned(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versions.bump(
+            [instance.person_id, getattr(instance, "_search_prev_person_id", None)]
+        )
+
+
+@receiver(pre_save, sender=Marriage)
+def marriage_respousing(sender, instance, raw=False, **kwargs):
+    instance._versions_prev_spouses = ()
+    if not raw and instance.pk is not None:
+        instance._versions_prev_spouses = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("spouse1_id", "spouse2_id")
+            .first()
+            or ()
+        )
+
+
+@receiver(post_save, sender=Marriage)
+def marriage_versioned(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versions.bump(
+            [instance.spouse1_id, instance.spouse2_id]
+            + list(getattr(instance, "_versions_prev_spouses", ()))
+        )
+
+
+@receiver(post_delete, sender=Birth)
+@receiver(post_delete, sender=Death)
+def record_unversioned(sender, instance, **kwargs):
+    versions.bump([instance.person_id])
+
+
+@receiver(post_delete, sender=Marriage)
+def marriage_unversioned(sender, instance, **kwargs):
+    versions.bump([instance.spouse1_id, instance.spouse2_id])
+
+
+@receiver(post_save, sender=County)
+@receiver(post_save, sender=City)
+def place_versioned(sender, instance, created=False, raw=False, **kwargs):
+    # a new place is on nobody's records yet
+    if not created and not raw:
+        versions.bump(versions.at_place(instance))
+
+
+@receiver(pre_delete, sender=Person)
+@receiver(pre_delete, sender=County)
+@receiver(pre_delete, sender=City)
+def versioned_row_deleting(sender, instance, **kwargs):
+    if sender is Person:
+        instance._versions_affected = versions.relatives([instance.pk])
+    else:
+        instance._versions_affected = versions.at_place(instance)
+
+
+@receiver(post_delete, sender=Person)
+@receiver(post_delete, sender=County)
+@receiver(post_delete, sender=City)
+def versioned_row_deleted(sender, instance, **kwargs):
+    versions.bump(getattr(instance, "_versions_affected", set()) - {instance.pk})
+
+
+# IMAGE DERIVATIVES ============
+# A saved record image gets its thumbnail and medium copies. Bulk writes
+# (render_certificates makes its own) need build_image_derivatives.
+
+
+@receiver(post_save, sender=Birth)
+@receiver(post_save, sender=Death)
+@receiver(post_save, sender=Marriage)
+def record_image_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        field = derivatives.IMAGE_FIELDS[sender._meta.model_name]
+        derivatives.ensure(getattr(instance, field))
+
+
+# SEARCH RESULT CACHE ============
+# Any write to a table a cached search reads from starts a new generation
+# for the kinds of search built from it.
+
+
+@receiver([post_save, post_delete], sender=Person)
+@receiver([post_save, post_delete], sender=Birth)
+@receiver([post_save, post_delete], sender=Death)
+@receiver([post_save, post_delete], sender=Marriage)
+@receiver([post_save, post_delete], sender=County)
+@receiver([post_save, post_delete], sender=City)
+def results_changed(sender, raw=False, **kwargs):
+    if raw:
+        return
+    result_cache.invalidate_for(sender)
+    # a search that ran before the commit could have cached the old rows
+    # under the new generation, so start another one once they are visible
+    transaction.on_commit(partial(result_cache.invalidate_for, sender))
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import time
+import uuid
+from collections import Counter
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+
+from records import derivatives
+from records.models import Birth, Death, Marriage, PersonSearch
+
+# Record images stored by content: a file saved as birth_records/scan.png
+# is written once to blobs/<ab>/<cd>/<sha256>.png, and every record with
+# the same bytes points at that name. A blob is shared, so deleting one
+# through the storage does nothing: collect() (manage.py gc_media)
+# removes the blobs no row references any more. Names already inside
+# the blob tree are kept as they are; that is how the derivatives of a
+# blob (<sha256>.thumb.webp, ...) are stored next to it.
+
+BLOB_DIR = "blobs"
+
+# (model, field) of every column that holds a stored file name
+FILE_COLUMNS = [
+    (Birth, "birth_record_image"),
+    (Death, "death_record_image"),
+    (Marriage, "marriage_record_image"),
+]
+
+# copies of the names above, kept by collect() but not counted
+COPY_COLUMNS = [
+    (PersonSearch, "birth_record_image"),
+    (PersonSearch, "death_record_image"),
+]
+
+
+def is_blob(name: str) -> bool:
+    return name.replace("\\", "/").startswith(f"{BLOB_DIR}/")
+
+
+def _is_content_named(name: str) -> bool:
+    # <sha256>.png itself, not one of its derivatives <sha256>.thumb.webp
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return len(stem) == 64 and all(c in "0123456789abcdef" for c in stem)
+
+
+def blob_name(name: str, content) -> str:
+    """The content-addressed name of `content`, keeping the extension of `name`."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    key = digest.hexdigest()
+    extension = os.path.splitext(name)[1].lower()
+    return f"{BLOB_DIR}/{key[:2]}/{key[2:4]}/{key}{extension}"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that names what it saves by content (see above).
+    Identical files are written once. Anything in the blob tree is written
+    to a temporary name and moved into place, so readers never see part
+    of a file, and a derivative saved again replaces the old one.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        if not is_blob(name):
+            name = blob_name(name, content)
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # a blob's name is its content: an existing file is the same file
+        if is_blob(name):
+            return name
+        return super().get_available_name(name, max_length=max_length)
+
+    def _save(self, name, content):
+        if not is_blob(name):
+            return super()._save(name, content)
+        if _is_content_named(name) and self.exists(name):
+            # a row is about to point at it again: restart its age (and its
+            # derivatives') so collect() keeps them until that row commits
+            for stored in [name] + [
+                derivatives.name(name, suffix) for suffix in derivatives.DERIVATIVES
+            ]:
+                try:
+                    os.utime(self.path(stored))
+                except FileNotFoundError:
+                    pass
+            return name
+
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.{uuid.uuid4().hex}.part"
+        with open(partial, "wb") as f:
+            for chunk in content.chunks():
+                f.write(chunk if isinstance(chunk, bytes) else chunk.encode())
+        if self.file_permissions_mode is not None:
+            os.chmod(partial, self.file_permissions_mode)
+        os.replace(partial, path)
+        return name
+
+    def delete(self, name):
+        # other rows may point at the same blob; collect() removes it
+        if not is_blob(name):
+            super().delete(name)
+
+
+def _names(columns):
+    for model, field in columns:
+        rows = (
+            model.objects.exclude(**{f"{field}__isnull": True})
+            .exclude(**{field: ""})
+            .values_list(field, flat=True)
+        )
+        yield from rows.iterator(chunk_size=10000)
+
+
+def references() -> Counter:
+    """How many records point at each stored file name."""
+    return Counter(_names(FILE_COLUMNS))
+
+
+def _stem(name: str) -> str:
+    for suffix in derivatives.WIDTHS:
+        if name.endswith(f".{suffix}"):
+            return name.removesuffix(f".{suffix}")
+    return os.path.splitext(name)[0]
+
+
+def _stored_dirs() -> set:
+    # the blob tree, and the upload_to directories files were saved under
+    # before storage by content
+    dirs = {BLOB_DIR}
+    for model, field in FILE_COLUMNS + COPY_COLUMNS:
+        upload_to = str(model._meta.get_field(field).upload_to)
+        dirs.add(upload_to.strip("/").split("/")[0])
+    return dirs
+
+
+def collect(min_age: float = 3600, dry_run: bool = False, storage=None) -> dict:
+    """
+    Delete the stored files no row references, with their derivatives:
+    unreferenced blobs and the orphans that plain upload_to names left
+    behind. Files younger than `min_age` seconds are kept, since their
+    rows may not be committed yet. Returns counts of what was (or, with
+    `dry_run`, would be) deleted.
+    """
+    storage = storage or default_storage
+    counts = references()
+    # by name without extension, which a file shares with its derivatives
+    keep = {_stem(name) for name in counts}
+    keep.update(_stem(name) for name in _names(COPY_COLUMNS))
+
+    stats = {
+        "referenced": len(counts),
+        "shared": sum(1 for count in counts.values() if count > 1),
+        "deleted": 0,
+        "freed": 0,
+    }
+    cutoff = time.time() - min_age
+
+    for top in sorted(_stored_dirs()):
+        root = storage.path(top)
+        for directory, _, names in os.walk(root, topdown=False):
+            for filename in names:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, storage.path("")).replace(os.sep, "/")
+                if _stem(name) in keep:
+                    continue
+                try:
+                    stat = os.stat(path)
+                    if stat.st_mtime > cutoff:
+                        continue
+                    if not dry_run:
+                        os.remove(path)
+                except FileNotFoundError:
+                    continue
+                stats["deleted"] += 1
+                stats["freed"] += stat.st_size
+
+            if not dry_run and directory != root:
+                try:
+                    os.rmdir(directory)  # only once it is empty
+                except OSError:
+                    pass
+
+    return stats
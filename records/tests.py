@@ -1,13 +1,59 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
 from datetime import date
-
-from django.core.management import call_command
-from django.test import Client, TestCase
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.db.models import F
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-
+from PIL import Image
+
+from records import (
+    ancestry,
+    certificate_cache,
+    certificates,
+    derivatives,
+    gedcom,
+    image_utils,
+    kinship,
+    storage,
+)
 from records.comment_utils import add_comment
-from records.models import Birth, City, Comment, County, Death, Marriage, Person, Sex
+from records.family import FamilyNeighborhood, ancestors, descendants
+from records.models import (
+    Ancestry,
+    Birth,
+    City,
+    Comment,
+    County,
+    Death,
+    Marriage,
+    MarriageParticipant,
+    Person,
+    PersonSearch,
+    Sex,
+)
+from records.search import export as search_export
+from records.search import record_search, result_cache
+from records.search.counting import EstimatedCountPaginator, result_count
+from records.search.normalize import norm, norm_pattern
+from records.search.pagination import IdListPaginator, KeysetPaginator
+from records.search.phonetic import phonetic_match
 from records.search.record_search import (
+    birth_row_search,
     birth_search,
+    death_row_search,
     death_search,
     marriage_search,
     narrow_down,
@@ -219,6 +265,29 @@ class FamilyStructureTestPopulatedDB(TestCase):
             f"No sibling set with breadth >= 3 found (max breadth: {max_siblings})",
         )
 
+    def test_bulk_load_fills_derived_tables(self):
+        """
+        mock_populate loads with bulk writes, which skip the signals; the
+        search rows, participants and ancestry are filled all the same.
+        """
+        people = Person.objects.count()
+        self.assertEqual(PersonSearch.objects.count(), people)
+        self.assertEqual(Birth.objects.count(), people)
+        self.assertEqual(
+            MarriageParticipant.objects.count(), 2 * Marriage.objects.count()
+        )
+        self.assertFalse(Person.objects.filter(last_name_norm="").exists())
+
+        child = Person.objects.filter(mother__isnull=False).first()
+        self.assertTrue(
+            Ancestry.objects.filter(
+                ancestor=child.mother, descendant=child, depth=1
+            ).exists()
+        )
+        self.assertEqual(
+            Birth.objects.exclude(birth_record_image__in=["", None]).count(), 1
+        )
+
 
 class ParentPresenceTest(TestCase):
     """
@@ -306,6 +375,24 @@ class SearchTests(TestCase):
         results = birth_search({"city_name": "Edward%"})
         self.assertEqual(results.count(), 2)
 
+    def test_birth_exact_is_case_insensitive(self):
+        results = birth_search({"last_name": "sMiTh"})
+        self.assertEqual(results.count(), 1)
+        self.assertEqual(results.first().person, self.john)
+
+    def test_birth_infix_wildcard(self):
+        results = birth_search({"last_name": "%m_th%"})
+        self.assertEqual(results.count(), 2)
+
+    def test_exact_and_prefix_use_indexed_column(self):
+        exact = str(birth_search({"last_name": "Smith"}).query)
+        prefix = str(birth_search({"county_name": "Mad%"}).query)
+        infix = str(birth_search({"last_name": "%mit%"}).query)
+
+        self.assertIn('"records_person"."last_name_norm" = smith', exact)
+        self.assertIn('LOWER("records_county"."county_name")::text LIKE', prefix)
+        self.assertIn('"records_person"."last_name_norm" ILIKE', infix)
+
     # ---------------------
     # Death Search Tests
     # ---------------------
@@ -336,6 +423,219 @@ class SearchTests(TestCase):
         self.assertEqual(results.count(), 1)
 
 
+class DateRangeSearchTest(TestCase):
+    """
+    Year/variance filters must compare the date column directly so its
+    btree index is usable (no EXTRACT(year ...) wrapper).
+    """
+
+    def setUp(self):
+        self.person = Person.objects.create(first_name="Ann", last_name="Lee")
+        self.other = Person.objects.create(first_name="Bo", last_name="Lee")
+
+        Birth.objects.create(person=self.person, birth_date=date(1901, 12, 31))
+        Birth.objects.create(person=self.other, birth_date=date(1902, 1, 1))
+        Death.objects.create(person=self.person, death_date=date(1950, 6, 1))
+        Marriage.objects.create(
+            spouse1=self.person, spouse2=self.other, marriage_date=date(1925, 1, 1)
+        )
+
+        # the tables are tiny, so force the planner to show whether an index
+        # path exists at all
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off;")
+
+    def assertDateIndexUsed(self, qs, column):
+        plan = qs.explain()
+        index_lines = [
+            line
+            for line in plan.splitlines()
+            if "Index Cond" in line and column in line
+        ]
+        self.assertTrue(index_lines, f"No index scan on {column}:\n{plan}")
+        self.assertNotIn("EXTRACT", plan.upper())
+
+    def test_range_is_half_open(self):
+        results = birth_search({"birth_date": "1900", "variance": "1"})
+        self.assertEqual(results.count(), 1)
+        self.assertEqual(results.first().person, self.person)
+
+    def test_birth_search_uses_date_index(self):
+        qs = birth_search({"birth_date": "1901", "variance": "2"})
+        self.assertDateIndexUsed(qs, "birth_date")
+
+    def test_death_search_uses_date_index(self):
+        qs = death_search({"death_date": "1950", "variance": "0"})
+        self.assertDateIndexUsed(qs, "death_date")
+
+    def test_marriage_search_uses_date_index(self):
+        qs = marriage_search({"marriage_date": "1925", "variance": "3"})
+        self.assertDateIndexUsed(qs, "marriage_date")
+
+
+class PersonSearchTableTest(TestCase):
+    def setUp(self):
+        self.county = County.objects.create(county_code=1, county_name="Madison")
+        self.city = City.objects.create(county=self.county, city_name="Alton")
+
+        self.person = Person.objects.create(first_name="John", last_name="Smith")
+        self.birth = Birth.objects.create(
+            person=self.person,
+            birth_date=date(1900, 5, 1),
+            birth_county=self.county,
+            birth_city=self.city,
+        )
+
+    def test_row_follows_person_and_birth_saves(self):
+        row = PersonSearch.objects.get(person=self.person)
+        self.assertEqual(row.last_name, "Smith")
+        self.assertTrue(row.has_birth)
+        self.assertEqual(row.birth_date, date(1900, 5, 1))
+        self.assertEqual(row.birth_county_name, "Madison")
+        self.assertEqual(row.birth_city_name, "Alton")
+        self.assertFalse(row.has_death)
+
+        self.person.last_name = "Smyth"
+        self.person.save()
+        Death.objects.create(person=self.person, death_date=date(1970, 1, 1))
+
+        row.refresh_from_db()
+        self.assertEqual(row.last_name, "Smyth")
+        self.assertTrue(row.has_death)
+        self.assertEqual(row.death_date, date(1970, 1, 1))
+
+    def test_row_follows_lookup_renames_and_deletes(self):
+        self.county.county_name = "St. Clair"
+        self.county.save()
+        self.city.city_name = "Belleville"
+        self.city.save()
+
+        row = PersonSearch.objects.get(person=self.person)
+        self.assertEqual(row.birth_county_name, "St. Clair")
+        self.assertEqual(row.birth_city_name, "Belleville")
+
+        self.city.delete()
+        row.refresh_from_db()
+        self.assertIsNone(row.birth_city_name)
+
+        self.birth.delete()
+        row.refresh_from_db()
+        self.assertFalse(row.has_birth)
+
+    def test_person_delete_removes_row(self):
+        self.person.delete()
+        self.assertFalse(PersonSearch.objects.exists())
+
+    def test_rebuild_command(self):
+        PersonSearch.objects.all().delete()
+        call_command("rebuild_person_search", verbosity=0)
+
+        self.assertEqual(PersonSearch.objects.get().birth_county_name, "Madison")
+
+    def test_row_search(self):
+        other = Person.objects.create(first_name="Jane", last_name="Smythe")
+        Birth.objects.create(person=other, birth_date=date(1903, 1, 1))
+
+        results = birth_row_search({"last_name": "sm%", "county_name": "Madison"})
+        self.assertEqual([r.person for r in results], [self.person])
+
+        results = birth_row_search({"birth_date": "1902", "variance": "2"})
+        self.assertEqual([r.person for r in results], [self.person, other])
+
+        results = birth_row_search({"last_name": "Smyth"}, fuzzy=True)
+        self.assertEqual([r.person for r in results], [other, self.person])
+
+        self.assertFalse(death_row_search({"last_name": "Smith"}).exists())
+
+    def test_second_birth_record_is_searched(self):
+        cook = County.objects.create(county_code=2, county_name="Cook")
+        Birth.objects.create(
+            person=self.person, birth_date=date(1950, 1, 1), birth_county=cook
+        )
+
+        row = PersonSearch.objects.get(person=self.person)
+        self.assertTrue(row.multiple_births)
+        self.assertEqual(row.birth_date, date(1900, 5, 1))
+
+        for filters in (
+            {"birth_date": "1950"},
+            {"county_name": "Cook"},
+            {"county_name": "Madison", "birth_date": "1900"},
+        ):
+            with self.subTest(**filters):
+                results = birth_row_search(filters)
+                self.assertEqual([r.person for r in results], [self.person])
+
+        self.assertFalse(
+            birth_row_search({"county_name": "Cook", "birth_date": "1900"}).exists()
+        )
+
+
+class MarriageParticipantTest(TestCase):
+    def setUp(self):
+        self.smith = Person.objects.create(first_name="John", last_name="Smith")
+        self.jones = Person.objects.create(first_name="Ann", last_name="Jones")
+        self.brown = Person.objects.create(first_name="Eve", last_name="Smith")
+
+        self.marriage = Marriage.objects.create(
+            spouse1=self.smith, spouse2=self.jones, marriage_date=date(1920, 1, 1)
+        )
+
+    def pairs(self):
+        return set(MarriageParticipant.objects.values_list("role", "person", "spouse"))
+
+    def test_rows_follow_marriage(self):
+        self.assertEqual(
+            self.pairs(),
+            {(1, self.smith.pk, self.jones.pk), (2, self.jones.pk, self.smith.pk)},
+        )
+
+        self.marriage.spouse2 = self.brown
+        self.marriage.save()
+        self.assertEqual(
+            self.pairs(),
+            {(1, self.smith.pk, self.brown.pk), (2, self.brown.pk, self.smith.pk)},
+        )
+
+        self.marriage.delete()
+        self.assertFalse(MarriageParticipant.objects.exists())
+
+    def test_either_order_without_or_or_distinct(self):
+        for filters in (
+            {"spouse1_last_name": "Smith", "spouse2_last_name": "Jones"},
+            {"spouse1_last_name": "Jones", "spouse2_first_name": "John"},
+            {"spouse2_last_name": "Jones"},
+        ):
+            res = marriage_search(filters)
+            self.assertEqual(list(res), [self.marriage], filters)
+
+            sql = str(res.query)
+            self.assertNotIn("DISTINCT", sql)
+            self.assertNotIn(" OR ", sql)
+
+    def test_one_person_cannot_be_both_spouses(self):
+        res = marriage_search(
+            {"spouse1_last_name": "Smith", "spouse2_last_name": "Smith"}
+        )
+        self.assertFalse(res.exists())
+
+    def test_fuzzy_and_phonetic(self):
+        res = marriage_search(
+            {"spouse1_last_name": "Jonse", "spouse2_last_name": "Smyth"}, fuzzy=True
+        )
+        self.assertEqual(list(res), [self.marriage])
+
+        res = marriage_search(
+            {"spouse1_last_name": "Jonez", "spouse2_last_name": "Smyth"}, phonetic=True
+        )
+        self.assertEqual(list(res), [self.marriage])
+
+    def test_rebuild_command(self):
+        MarriageParticipant.objects.all().delete()
+        call_command("rebuild_person_search", batch_size=1, verbosity=0)
+        self.assertEqual(len(self.pairs()), 2)
+
+
 class FuzzySearchTest(TestCase):
     def setUp(self):
         # Counties and cities
@@ -431,6 +731,235 @@ class FuzzySearchTest(TestCase):
         results = marriage_search(filters, fuzzy=True)
         self.assertIn(self.marriage1, results)
 
+    def test_fuzzy_results_ordered_by_score(self):
+        results = list(birth_search({"last_name": "Smyth"}, fuzzy=True))
+
+        self.assertEqual(results, [self.birth2, self.birth1])
+        self.assertGreater(results[0].score, results[1].score)
+
+    def test_fuzzy_top_k_applies_after_filters(self):
+        # "Jon L Smyth" is the nearest name overall, but born in 1991
+        filters = {"last_name": "Smyth", "birth_date": "1990"}
+
+        with mock.patch.object(record_search, "FUZZY_TOP_K", 1):
+            self.assertEqual(list(birth_search(filters, fuzzy=True)), [self.birth1])
+            results = birth_row_search(filters, fuzzy=True)
+            self.assertEqual([r.person for r in results], [self.person1])
+
+    def test_candidates_come_from_one_knn_index_scan(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off;")
+
+        filters = {"last_name": "Smyth", "county_name": "Cook"}
+        plan = birth_row_search(filters, fuzzy=True).explain()
+        self.assertIn("Index Scan using psearch_full_name_trgm_gist", plan)
+
+        plan = marriage_search({"spouse1_last_name": "Smyth"}, fuzzy=True).explain()
+        self.assertIn("Index Scan using person_full_name_trgm_gist", plan)
+
+    def test_fuzzy_threshold_is_per_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            list(death_search({"last_name": "Smith"}, fuzzy=True))
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn("<->", ctx.captured_queries[0]["sql"])
+
+
+class PhoneticSearchTest(TestCase):
+    def setUp(self):
+        self.meyer = Person.objects.create(first_name="Katherine", last_name="Meyer")
+        self.schmidt = Person.objects.create(first_name="Hans", last_name="Schmidt")
+        self.jones = Person.objects.create(first_name="Ann", last_name="Jones")
+
+        for person in (self.meyer, self.schmidt, self.jones):
+            Birth.objects.create(person=person, birth_date=date(1900, 1, 1))
+
+        Marriage.objects.create(
+            spouse1=self.meyer, spouse2=self.schmidt, marriage_date=date(1920, 1, 1)
+        )
+
+    def test_keys_follow_name_changes(self):
+        self.meyer.refresh_from_db()
+        self.assertEqual(self.meyer.last_name_soundex, "M600")
+        self.assertEqual(self.meyer.last_name_metaphone, "MR")
+
+        self.meyer.last_name = "Smith"
+        self.meyer.save()
+        self.meyer.refresh_from_db()
+        self.assertEqual(self.meyer.last_name_soundex, "S530")
+        self.assertEqual(self.meyer.last_name_metaphone_alt, "XMT")
+
+    def test_sound_alike_spellings_match(self):
+        births = birth_search({"last_name": "Maier"}, phonetic=True)
+        self.assertEqual([b.person for b in births], [self.meyer])
+
+        rows = birth_row_search({"last_name": "Smith"}, phonetic=True)
+        self.assertEqual([row.pk for row in rows], [self.schmidt.pk])
+
+        rows = death_row_search({"last_name": "Smith"}, phonetic=True)
+        self.assertFalse(rows.exists())
+
+        # Catherine/Katherine share their Double Metaphone code, not Soundex
+        births = birth_search(
+            {"first_name": "Catherine", "last_name": "Mayer"}, phonetic=True
+        )
+        self.assertEqual([b.person for b in births], [self.meyer])
+
+    def test_name_without_letters(self):
+        blank = Person.objects.create(first_name="", last_name="Jones")
+        Birth.objects.create(person=blank, birth_date=date(1900, 1, 1))
+
+        self.assertFalse(Person.objects.filter(phonetic_match("first_name", "42")))
+
+        # matched like a normal search instead
+        births = birth_search({"first_name": "42", "last_name": "Jones"}, phonetic=True)
+        self.assertFalse(births.exists())
+
+        births = birth_search({"first_name": "%", "last_name": "Jonez"}, phonetic=True)
+        self.assertCountEqual([b.person for b in births], [self.jones, blank])
+
+    def test_marriage_either_spouse_order(self):
+        res = marriage_search(
+            {"spouse1_last_name": "Smith", "spouse2_last_name": "Maier"},
+            phonetic=True,
+        )
+        self.assertEqual(res.count(), 1)
+
+    def test_key_lookup_is_an_index_seek(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off;")
+
+        plan = Person.objects.filter(phonetic_match("last_name", "Smith")).explain()
+
+        self.assertIn("last_name_soundex", plan)
+        self.assertIn("Index", plan)
+        self.assertNotIn("similarity", plan)
+
+    def test_keys_follow_bulk_writes(self):
+        Person.objects.filter(pk=self.jones.pk).update(last_name="Smith")
+
+        self.assertEqual(
+            Person.objects.get(pk=self.jones.pk).last_name_metaphone, "SM0"
+        )
+
+    def test_view_phonetic_mode(self):
+        response = self.client.get(
+            reverse("search_birth_records"),
+            {"last_name": "Maier", "phonetic_search": "on"},
+            HTTP_HX_REQUEST="true",
+        )
+
+        self.assertEqual(
+            [row.pk for row in response.context["page_obj"]], [self.meyer.pk]
+        )
+
+
+class NormalizedNameTest(TestCase):
+    def setUp(self):
+        self.jose = Person.objects.create(first_name="José", last_name="Núñez")
+        self.obrien = Person.objects.create(first_name="Mary", last_name="O'Brien")
+
+        county = County.objects.create(county_code=1, county_name="Madison")
+        city = City.objects.create(county=county, city_name="Canton")
+        for person in (self.jose, self.obrien):
+            Birth.objects.create(
+                person=person,
+                birth_date=date(1900, 1, 1),
+                birth_county=county,
+                birth_city=city,
+            )
+
+        Marriage.objects.create(
+            spouse1=self.jose, spouse2=self.obrien, marriage_date=date(1920, 1, 1)
+        )
+
+    def test_norm(self):
+        self.assertEqual(norm("José"), "jose")
+        self.assertEqual(norm(" O'Brien "), "obrien")
+        self.assertEqual(norm("Smith-Jones"), "smithjones")
+        self.assertEqual(norm(None), "")
+        self.assertEqual(norm_pattern("O'B%n_"), "ob%n_")
+
+    def test_norms_follow_name_changes(self):
+        self.obrien.refresh_from_db()
+        self.assertEqual(self.obrien.last_name_norm, "obrien")
+
+        self.obrien.last_name = "Ó Briain"
+        self.obrien.save(update_fields=["last_name"])
+        self.obrien.refresh_from_db()
+        self.assertEqual(self.obrien.last_name_norm, "obriain")
+        self.assertEqual(
+            PersonSearch.objects.get(pk=self.obrien.pk).last_name_norm, "obriain"
+        )
+
+    def test_accents_and_punctuation_are_ignored(self):
+        births = birth_search({"first_name": "jose", "last_name": "NUNEZ"})
+        self.assertEqual([b.person for b in births], [self.jose])
+
+        births = birth_search({"last_name": "OBrien"})
+        self.assertEqual([b.person for b in births], [self.obrien])
+
+        rows = birth_row_search({"last_name": "o brien"})
+        self.assertEqual([row.pk for row in rows], [self.obrien.pk])
+
+        res = marriage_search(
+            {"spouse1_last_name": "O'Brien", "spouse2_first_name": "Jose"}
+        )
+        self.assertEqual(res.count(), 1)
+
+    def test_wildcards(self):
+        births = birth_search({"last_name": "O'Bri%"})
+        self.assertEqual([b.person for b in births], [self.obrien])
+
+        births = birth_search({"last_name": "%ÚÑ%"})
+        self.assertEqual([b.person for b in births], [self.jose])
+
+        births = birth_search({"first_name": "Jos_"})
+        self.assertEqual([b.person for b in births], [self.jose])
+
+    def test_exact_lookup_is_an_index_seek(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off;")
+
+        for value in ("Nunez", "Nun%"):
+            plan = birth_row_search({"last_name": value}).explain()
+            self.assertIn("psearch_last_name_norm", plan)
+
+    def test_admin_search(self):
+        admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(admin)
+
+        response = self.client.get(
+            reverse("admin:records_person_changelist"), {"q": "obri"}
+        )
+        self.assertEqual(list(response.context["cl"].result_list), [self.obrien])
+
+        response = self.client.get(
+            reverse("admin:records_birth_changelist"), {"q": "Núñ"}
+        )
+        self.assertEqual(
+            [b.person for b in response.context["cl"].result_list], [self.jose]
+        )
+
+    def test_term_without_normalized_form_matches_nothing(self):
+        self.assertFalse(Person.objects.filter(last_name_norm__normcontains="-"))
+        self.assertFalse(Person.objects.filter(last_name_norm__normcontains="'&"))
+        self.assertEqual(
+            list(Person.objects.filter(last_name_norm__normcontains="O'Bri")),
+            [self.obrien],
+        )
+
+    def test_backfill_command(self):
+        Person.objects.update(first_name_norm="", last_name_norm="")
+        PersonSearch.objects.update(last_name_norm="")
+
+        call_command("backfill_name_norms", batch_size=1, verbosity=0)
+
+        self.assertEqual(Person.objects.get(pk=self.jose.pk).last_name_norm, "nunez")
+        self.assertEqual(
+            PersonSearch.objects.get(pk=self.obrien.pk).last_name_norm, "obrien"
+        )
+
 
 class NarrowDownTest(TestCase):
     def setUp(self):
@@ -534,6 +1063,302 @@ class NarrowDownTest(TestCase):
         ids = list(narrowed.values_list("id", flat=True))
         self.assertEqual(len(ids), len(set(ids)))
 
+    # -----------------------------------------
+    # PARTIAL DATE MATCH
+    # -----------------------------------------
+    def test_matches_partial_date(self):
+        narrowed = narrow_down("1990-05", Birth.objects.all())
+
+        self.assertEqual(list(narrowed), [self.birth1])
+
+    # -----------------------------------------
+    # DOCUMENT FOLLOWS RELATED ROWS
+    # -----------------------------------------
+    def test_document_follows_person_and_place_changes(self):
+        self.person1.last_name = "Smyth"
+        self.person1.save()
+        self.county2.delete()
+
+        qs = Birth.objects.all()
+        self.assertEqual(list(narrow_down("smyth", qs)), [self.birth1])
+        self.assertFalse(narrow_down("Smith", qs).exists())
+        self.assertFalse(narrow_down("Lake", qs).exists())
+
+    # -----------------------------------------
+    # MARRIAGES AND PERSON SEARCH ROWS
+    # -----------------------------------------
+    def test_narrows_marriages_and_search_rows(self):
+        marriage = Marriage.objects.create(
+            spouse1=self.person1,
+            spouse2=self.person2,
+            marriage_date="2015-06-01",
+            marriage_county=self.county2,
+        )
+
+        self.assertEqual(
+            list(narrow_down("Miller", Marriage.objects.all())), [marriage]
+        )
+        self.assertEqual(
+            [row.pk for row in narrow_down("Waukegan", PersonSearch.objects.all())],
+            [self.person2.pk],
+        )
+
+    # -----------------------------------------
+    # RANKED BY MATCH QUALITY
+    # -----------------------------------------
+    def test_best_match_first(self):
+        # sorts ahead of birth1 by date, but only contains "lee" mid-word
+        person = Person.objects.create(first_name="Ada", last_name="Fleet")
+        birth = Birth.objects.create(person=person, birth_date="1980-01-01")
+
+        narrowed = narrow_down("Lee", Birth.objects.all())
+
+        self.assertEqual(list(narrowed), [self.birth1, birth])
+
+    # -----------------------------------------
+    # SINGLE INDEXED MATCH
+    # -----------------------------------------
+    def test_single_indexed_match(self):
+        narrowed = narrow_down("Chicago", Birth.objects.all())
+        sql = str(narrowed.query)
+
+        self.assertNotIn(" OR ", sql)
+        self.assertNotIn("DISTINCT", sql)
+        self.assertNotIn("JOIN", sql)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off;")
+        self.assertIn("birth_document_trgm", narrowed.explain())
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.county = County.objects.create(county_code=1, county_name="Cook")
+        dates = [
+            date(1900, 1, 1),
+            date(1900, 1, 1),
+            None,
+            date(1890, 6, 1),
+            date(1900, 1, 1),
+            None,
+            date(1910, 2, 2),
+        ]
+        for i, d in enumerate(dates):
+            person = Person.objects.create(first_name=f"P{i}", last_name="Smith")
+            Birth.objects.create(person=person, birth_date=d, birth_county=self.county)
+
+    def walk(self, paginator):
+        """Every page forwards, then every page backwards from the last."""
+        forward = [paginator.get_page()]
+        while forward[-1].has_next():
+            forward.append(paginator.get_page(forward[-1].next_token))
+
+        backward = [forward[-1]]
+        while backward[-1].has_previous():
+            backward.append(paginator.get_page(backward[-1].previous_token))
+
+        return forward, backward[::-1]
+
+    def assertPagesCover(self, qs, per_page=3):
+        expected = [obj.pk for obj in qs]
+        forward, backward = self.walk(KeysetPaginator(qs, per_page))
+
+        self.assertEqual([obj.pk for page in forward for obj in page], expected)
+        self.assertEqual(
+            [[obj.pk for obj in page] for page in backward],
+            [[obj.pk for obj in page] for page in forward],
+        )
+        self.assertEqual([page.number for page in forward], [1, 2, 3])
+        self.assertEqual([page.number for page in backward], [1, 2, 3])
+
+    def test_walks_rows_with_ties_and_nulls(self):
+        self.assertPagesCover(birth_row_search({"last_name": "Smith"}))
+        self.assertPagesCover(birth_search({"last_name": "Smith"}))
+
+    def test_walks_descending_score_ordering(self):
+        self.assertPagesCover(birth_row_search({"last_name": "Smith"}, fuzzy=True))
+
+    def test_no_count_or_offset(self):
+        paginator = KeysetPaginator(birth_row_search({"last_name": "Smith"}), 3)
+        page = paginator.get_page()
+
+        with CaptureQueriesContext(connection) as ctx:
+            page = paginator.get_page(paginator.get_page(page.next_token).next_token)
+
+        self.assertEqual(len(ctx.captured_queries), 2)
+        for query in ctx.captured_queries:
+            self.assertNotIn("COUNT(", query["sql"])
+            self.assertNotIn("OFFSET", query["sql"])
+        self.assertIsNone(paginator.num_pages)
+        self.assertEqual(KeysetPaginator(Birth.objects.all(), 3, True).num_pages, 3)
+
+    def test_bad_token_falls_back_to_first_page(self):
+        paginator = KeysetPaginator(birth_row_search({"last_name": "Smith"}), 3)
+
+        for token in ("garbage", "e30", ""):
+            page = paginator.get_page(token)
+            self.assertEqual(page.number, 1)
+            self.assertFalse(page.has_previous())
+            self.assertEqual(len(page), 3)
+
+
+class ResultCountTest(TestCase):
+    def setUp(self):
+        for i in range(5):
+            Person.objects.create(first_name=f"P{i}", last_name="Smith")
+
+        # the planner's estimate decides between counting and estimating;
+        # without fresh statistics it reflects whatever ran before
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Person._meta.db_table}")
+
+    def statement_timeout(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW statement_timeout")
+            return cursor.fetchone()[0]
+
+    def test_exact_when_cheap(self):
+        count = result_count(Person.objects.filter(last_name="Smith"))
+
+        self.assertEqual(count, 5)
+        self.assertTrue(count.exact)
+        self.assertEqual(result_count(Person.objects.none()), 0)
+
+    def test_estimate_over_limit(self):
+        with CaptureQueriesContext(connection) as ctx:
+            count = result_count(Person.objects.all(), limit=0)
+
+        self.assertFalse(count.exact)
+        self.assertGreater(count, 0)
+        self.assertFalse(any("COUNT(" in q["sql"] for q in ctx.captured_queries))
+
+    def test_estimate_when_count_runs_out_of_time(self):
+        before = self.statement_timeout()
+        slow = Person.objects.extra(where=["(SELECT pg_sleep(0.5)) IS NOT NULL"])
+
+        count = result_count(slow, timeout_ms=50)
+
+        self.assertFalse(count.exact)
+        self.assertEqual(self.statement_timeout(), before)
+        self.assertEqual(result_count(Person.objects.all()), 5)
+
+    def test_results_view_shows_estimate(self):
+        Birth.objects.create(person=Person.objects.first())
+
+        # too broad to cache, so the page is counted by result_count
+        with self.settings(SEARCH_EXACT_COUNT_LIMIT=0, SEARCH_CACHE_MAX_IDS=0):
+            response = self.client.get(
+                reverse("search_birth_records"),
+                {"last_name": "Smith"},
+                HTTP_HX_REQUEST="true",
+            )
+
+        self.assertContains(response, "about ")
+        self.assertNotContains(response, "Page 1 of")
+
+    def test_admin_changelist_uses_estimated_paginator(self):
+        admin_user = User.objects.create_superuser("admin", "a@example.com", "pw")
+        self.client.force_login(admin_user)
+
+        response = self.client.get(reverse("admin:records_person_changelist"))
+
+        self.assertEqual(response.status_code, 200)
+        paginator = response.context["cl"].paginator
+        self.assertIsInstance(paginator, EstimatedCountPaginator)
+        self.assertEqual(paginator.count, 5)
+
+        with self.settings(SEARCH_EXACT_COUNT_LIMIT=0):
+            response = self.client.get(reverse("admin:records_person_changelist"))
+        self.assertContains(response, "about ")
+
+    def test_estimated_paginator_pages_by_rows(self):
+        people = Person.objects.order_by("pk")
+
+        with self.settings(SEARCH_EXACT_COUNT_LIMIT=0):
+            paginator = EstimatedCountPaginator(people, 2)
+            self.assertFalse(paginator.count.exact)
+
+            # reachable whatever the estimate says
+            page = paginator.page(3)
+            self.assertEqual(list(page), list(people[4:]))
+            self.assertFalse(page.has_next())
+            self.assertEqual(paginator.num_pages, 3)
+
+            self.assertTrue(paginator.page(2).has_next())
+            with self.assertRaises(EmptyPage):
+                paginator.page(4)
+
+
+class ResultCacheTest(TestCase):
+    def setUp(self):
+        caches["search"].clear()
+        for i in range(3):
+            person = Person.objects.create(first_name=f"P{i}", last_name="Smith")
+            Birth.objects.create(person=person, birth_date=date(1900 + i, 1, 1))
+
+    def search(self, **params):
+        return self.client.get(
+            reverse("search_birth_records"), params, HTTP_HX_REQUEST="true"
+        )
+
+    def names(self, response):
+        return [row.first_name for row in response.context["page_obj"]]
+
+    def test_normalized_filters_share_a_key(self):
+        self.assertEqual(
+            result_cache.cache_key("birth", {"last_name": " SMITH "}, False),
+            result_cache.cache_key("birth", {"last_name": "smith", "x": ""}, False),
+        )
+        self.assertNotEqual(
+            result_cache.cache_key("birth", {"last_name": "smith"}, fuzzy=False),
+            result_cache.cache_key("birth", {"last_name": "smith"}, fuzzy=True),
+        )
+
+    def test_repeat_search_only_fetches_the_page(self):
+        self.search(last_name="Smith")
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.search(last_name="smith")
+
+        self.assertEqual(self.names(response), ["P0", "P1", "P2"])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('"person_id" IN', ctx.captured_queries[0]["sql"])
+
+    def test_writes_invalidate_dependent_searches(self):
+        self.search(last_name="Smith")
+
+        person = Person.objects.create(first_name="New", last_name="Smith")
+        marriages = result_cache.cache_key("marriage", {}, False)
+        Birth.objects.create(person=person, birth_date=date(1899, 1, 1))
+        self.assertEqual(self.names(self.search(last_name="Smith"))[0], "New")
+
+        # a birth does not feed marriage results
+        self.assertEqual(result_cache.cache_key("marriage", {}, False), marriages)
+
+        Birth.objects.filter(person=person).get().delete()
+        self.assertNotIn("New", self.names(self.search(last_name="Smith")))
+
+    def test_broad_search_pages_by_keyset(self):
+        with self.settings(SEARCH_CACHE_MAX_IDS=2):
+            response = self.search(last_name="Smith")
+
+        self.assertIsInstance(response.context["page_obj"].paginator, KeysetPaginator)
+
+    def test_id_list_pages(self):
+        ids = list(
+            birth_row_search({"last_name": "Smith"}).values_list("pk", flat=True)
+        )
+        paginator = IdListPaginator(PersonSearch.objects.all(), ids, 2)
+
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_token)
+
+        self.assertEqual([row.pk for row in first] + [row.pk for row in second], ids)
+        self.assertFalse(second.has_next())
+        self.assertEqual(paginator.get_page(second.previous_token).number, 1)
+        self.assertEqual(paginator.num_pages, 2)
+        self.assertTrue(paginator.count.exact)
+
 
 class SingleParentTest(TestCase):
     def setUp(self):
@@ -701,13 +1526,1382 @@ class AddCommentTest(TestCase):
         self.assertEqual(comment.commenter_email, None)
 
 
-class ViewTests(TestCase):
+class FamilyNeighborhoodTest(TestCase):
     def setUp(self):
-        self.client = Client()
-
-        self.person = Person.objects.create(first_name="John", last_name="Smith")
+        county = County.objects.create(county_code=1, county_name="Madison")
+        city = City.objects.create(county=county, city_name="Alton")
 
-    # -------------------------
+        self.mother = Person.objects.create(first_name="Mary", last_name="Smith")
+        self.father = Person.objects.create(first_name="Tom", last_name="Smith")
+        self.other_father = Person.objects.create(first_name="Sam", last_name="Lee")
+        self.person = Person.objects.create(
+            first_name="John", last_name="Smith", mother=self.mother, father=self.father
+        )
+        self.sister = Person.objects.create(
+            first_name="Ann", last_name="Smith", mother=self.mother, father=self.father
+        )
+        self.half_brother = Person.objects.create(
+            first_name="Bob",
+            last_name="Lee",
+            mother=self.mother,
+            father=self.other_father,
+        )
+        self.first_wife = Person.objects.create(first_name="Eve", last_name="Brown")
+        self.second_wife = Person.objects.create(first_name="Ida", last_name="Adams")
+        self.child = Person.objects.create(
+            first_name="Tim",
+            last_name="Smith",
+            father=self.person,
+            mother=self.first_wife,
+        )
+
+        Marriage.objects.create(
+            spouse1=self.person,
+            spouse2=self.second_wife,
+            marriage_date=date(1960, 1, 1),
+        )
+        Marriage.objects.create(
+            spouse1=self.person, spouse2=self.first_wife, marriage_date=date(1950, 1, 1)
+        )
+        Birth.objects.create(
+            person=self.person,
+            birth_date=date(1930, 1, 1),
+            birth_county=county,
+            birth_city=city,
+        )
+        Death.objects.create(
+            person=self.person,
+            death_date=date(1990, 1, 1),
+            death_county=county,
+            death_city=city,
+        )
+
+    def test_load(self):
+        with self.assertNumQueries(3):
+            family = FamilyNeighborhood.load(self.person.id)
+
+            self.assertEqual(family.person, self.person)
+            self.assertEqual(family.mother, self.mother)
+            self.assertEqual(family.father, self.father)
+            self.assertEqual(family.birth.birth_city.city_name, "Alton")
+            self.assertEqual(family.death.death_county.county_name, "Madison")
+
+        self.assertCountEqual(family.siblings, [self.sister, self.half_brother])
+        self.assertEqual(family.spouses, [self.first_wife, self.second_wife])
+        self.assertEqual(family.children, [self.child])
+
+    def test_matches_person_methods(self):
+        for person in Person.objects.all():
+            family = FamilyNeighborhood.load(person.id)
+
+            self.assertCountEqual(family.siblings, person.siblings())
+            self.assertCountEqual(family.spouses, person.spouses())
+            self.assertCountEqual(family.children, person.children())
+
+    def test_unknown_person(self):
+        with self.assertRaises(Person.DoesNotExist):
+            FamilyNeighborhood.load(0)
+
+        response = self.client.get(reverse("record_details", args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_view_query_budget(self):
+        caches["exports"].clear()
+
+        # exports read the record version first, then render (and cache)
+        for name, queries in (
+            ("record_details", 3),
+            ("export_csv", 4),
+            ("export_pdf", 4),
+        ):
+            with self.subTest(name), self.assertNumQueries(queries):
+                response = self.client.get(reverse(name, args=[self.person.id]))
+                self.assertEqual(response.status_code, 200)
+
+        content = self.client.get(reverse("export_csv", args=[self.person.id]))
+        self.assertEqual(content.content.decode().count("Children"), 1)
+        self.assertIn("Eve Brown, Ida Adams", content.content.decode())
+
+
+class FamilyTreeTest(TestCase):
+    def setUp(self):
+        self.grandma = Person.objects.create(first_name="Ruth", last_name="Smith")
+        self.mother = Person.objects.create(
+            first_name="Mary", last_name="Smith", mother=self.grandma
+        )
+        self.father = Person.objects.create(first_name="Tom", last_name="Lee")
+        self.person = Person.objects.create(
+            first_name="John", last_name="Lee", mother=self.mother, father=self.father
+        )
+        self.child = Person.objects.create(
+            first_name="Tim", last_name="Lee", father=self.person
+        )
+        Birth.objects.create(person=self.person, birth_date=date(1950, 1, 1))
+
+    def ids(self, nodes):
+        return [(n["id"], n["via"], n["relation"], n["generation"]) for n in nodes]
+
+    def test_ancestors(self):
+        with self.assertNumQueries(1):
+            nodes = ancestors(self.person.id, 8)
+
+        self.assertEqual(
+            self.ids(nodes),
+            [
+                (self.person.id, None, "self", 0),
+                (self.mother.id, self.person.id, "mother", 1),
+                (self.father.id, self.person.id, "father", 1),
+                (self.grandma.id, self.mother.id, "mother", 2),
+            ],
+        )
+        self.assertEqual(nodes[0]["birth_date"], date(1950, 1, 1))
+
+        self.assertEqual(len(ancestors(self.person.id, 1)), 3)
+
+    def test_descendants(self):
+        self.assertEqual(
+            self.ids(descendants(self.grandma.id, 8)),
+            [
+                (self.grandma.id, None, "self", 0),
+                (self.mother.id, self.grandma.id, "child", 1),
+                (self.person.id, self.mother.id, "child", 2),
+                (self.child.id, self.person.id, "child", 3),
+            ],
+        )
+
+    def test_cycle_stops(self):
+        # bad data: the grandmother's mother is her own grandson
+        Person.objects.filter(pk=self.grandma.pk).update(mother=self.person)
+
+        nodes = ancestors(self.person.id, 10)
+        self.assertEqual(len(nodes), 4)
+        self.assertEqual(len(descendants(self.person.id, 10)), 4)
+
+    def test_views(self):
+        response = self.client.get(
+            reverse("person_ancestors", args=[self.person.id]), {"generations": 1}
+        )
+        data = response.json()
+        self.assertEqual(data["root"], self.person.id)
+        self.assertEqual(data["generations"], 1)
+        self.assertEqual(
+            [n["first_name"] for n in data["people"]], ["John", "Mary", "Tom"]
+        )
+
+        response = self.client.get(reverse("person_descendants", args=[self.person.id]))
+        self.assertEqual(len(response.json()["people"]), 2)
+
+        for bad in ("0", "abc"):
+            response = self.client.get(reverse("person_ancestors", args=[bad]))
+            self.assertEqual(response.status_code, 404)
+
+
+class AncestryTest(TestCase):
+    def setUp(self):
+        self.grandma = Person.objects.create(first_name="Ruth", last_name="Smith")
+        self.mother = Person.objects.create(
+            first_name="Mary", last_name="Smith", mother=self.grandma
+        )
+        self.father = Person.objects.create(first_name="Tom", last_name="Lee")
+        self.person = Person.objects.create(
+            first_name="John", last_name="Lee", mother=self.mother, father=self.father
+        )
+        self.cousin = Person.objects.create(
+            first_name="Ann", last_name="Smith", mother=self.grandma
+        )
+        self.child = Person.objects.create(
+            first_name="Tim", last_name="Lee", father=self.person
+        )
+
+    def rows(self):
+        return set(
+            Ancestry.objects.values_list("ancestor_id", "descendant_id", "depth")
+        )
+
+    def test_rows_and_lookups(self):
+        self.assertTrue(ancestry.is_ancestor(self.grandma.id, self.child.id))
+        self.assertFalse(ancestry.is_ancestor(self.child.id, self.grandma.id))
+
+        self.assertEqual(
+            [(p, p.depth) for p in ancestry.ancestors_of(self.child.id)],
+            [(self.person, 1), (self.mother, 2), (self.father, 2), (self.grandma, 3)],
+        )
+        self.assertEqual(
+            [p.depth for p in ancestry.descendants_of(self.grandma.id)], [1, 1, 2, 3]
+        )
+
+        common = list(ancestry.common_ancestors(self.child.id, self.cousin.id))
+        self.assertEqual(common, [self.grandma])
+        self.assertEqual((common[0].depth_first, common[0].depth_second), (3, 1))
+
+    def test_reparenting_moves_the_subtree(self):
+        self.mother.mother = None
+        self.mother.save()
+
+        self.assertFalse(ancestry.is_ancestor(self.grandma.id, self.person.id))
+        self.assertFalse(ancestry.is_ancestor(self.grandma.id, self.child.id))
+        self.assertTrue(ancestry.is_ancestor(self.mother.id, self.child.id))
+
+        self.mother.mother = self.cousin
+        self.mother.save()
+
+        self.assertEqual(
+            [p.depth for p in ancestry.ancestors_of(self.child.id)], [1, 2, 2, 3, 4]
+        )
+
+    def test_deleting_a_link(self):
+        self.mother.delete()
+
+        self.assertFalse(ancestry.is_ancestor(self.grandma.id, self.child.id))
+        self.assertEqual(
+            list(ancestry.ancestors_of(self.child.id)), [self.person, self.father]
+        )
+
+    def test_cycle_and_rebuild(self):
+        before = self.rows()
+
+        Ancestry.objects.all().delete()
+        call_command("rebuild_ancestry", batch_size=2, verbosity=0)
+        self.assertEqual(self.rows(), before)
+
+        # bad data: the grandmother's mother is her own grandson
+        self.grandma.mother = self.person
+        self.grandma.save()
+        self.assertTrue(ancestry.is_ancestor(self.person.id, self.grandma.id))
+        self.assertFalse(
+            Ancestry.objects.filter(ancestor_id=F("descendant_id")).exists()
+        )
+
+    def test_lookups_use_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off;")
+
+        for qs in (
+            ancestry.descendants_of(self.grandma.id),
+            ancestry.ancestors_of(self.child.id),
+            ancestry.common_ancestors(self.child.id, self.cousin.id),
+        ):
+            plan = qs.explain()
+            self.assertRegex(plan, r"unique_ancestry|ancestry_descendant")
+            self.assertNotIn("Seq Scan on records_ancestry", plan)
+
+
+class KinshipTest(TestCase):
+    def setUp(self):
+        def person(first, sex, mother=None, father=None):
+            return Person.objects.create(
+                first_name=first, last_name="Kin", sex=sex, mother=mother, father=father
+            )
+
+        # two lines down from one couple
+        self.gg_father = person("Abe", "M")
+        self.gg_mother = person("Bea", "F")
+        root = {"mother": self.gg_mother, "father": self.gg_father}
+        self.g1 = person("Carl", "M", **root)
+        self.g2 = person("Dora", "F", **root)
+        self.p1 = person("Ed", "M", father=self.g1)
+        self.p2 = person("Fay", "F", mother=self.g2)
+        self.c1 = person("Gus", "M", father=self.p1)
+        self.c2 = person("Hal", "M", mother=self.p2)
+        self.d2 = person("Ivy", "F", father=self.c2)
+        self.half = person("Jon", "M", father=self.g1)
+
+        self.wife = person("Kay", "F")
+        self.step_son = person("Lou", "M", mother=self.wife)
+        self.wife_father = person("Max", "M")
+        Person.objects.filter(pk=self.wife.pk).update(father=self.wife_father)
+        Marriage.objects.create(
+            spouse1=self.c1, spouse2=self.wife, marriage_date=date(1990, 1, 1)
+        )
+
+    def label(self, first, second):
+        return kinship.relationship(first.id, second.id)["label"]
+
+    def test_blood_labels(self):
+        cases = [
+            (self.c1, self.c1, "self"),
+            (self.c1, self.p1, "father"),
+            (self.c1, self.gg_mother, "great-grandmother"),
+            (self.gg_father, self.d2, "great-great-granddaughter"),
+            (self.g1, self.g2, "sister"),
+            (self.p1, self.half, "half-brother"),
+            (self.c1, self.g2, "great-aunt"),
+            (self.g2, self.p1, "nephew"),
+            (self.p1, self.p2, "first cousin"),
+            (self.p1, self.c2, "first cousin once removed"),
+            (self.c1, self.c2, "second cousin"),
+            (self.c1, self.d2, "second cousin once removed"),
+            (self.d2, self.c1, "second cousin once removed"),
+        ]
+        for first, second, label in cases:
+            with self.subTest(first=first.first_name, second=second.first_name):
+                self.assertEqual(self.label(first, second), label)
+
+    def test_marriage_labels(self):
+        self.assertEqual(self.label(self.c1, self.wife), "wife")
+        self.assertEqual(self.label(self.c1, self.step_son), "stepson")
+        self.assertEqual(self.label(self.c1, self.wife_father), "father-in-law")
+        self.assertEqual(self.label(self.p1, self.wife), "daughter-in-law")
+        self.assertEqual(self.label(self.step_son, self.c1), "stepfather")
+        self.assertEqual(self.label(self.c2, self.wife), "second cousin's wife")
+
+    def test_path(self):
+        found = kinship.relationship(self.p1.id, self.p2.id)
+
+        path = found["path"]
+
+        # up to either great-grandparent and down the other line
+        self.assertEqual(
+            [step["id"] for step in path[:2] + path[3:]],
+            [self.p1.id, self.g1.id, self.g2.id, self.p2.id],
+        )
+        self.assertIn(path[2]["id"], [self.gg_father.id, self.gg_mother.id])
+        self.assertEqual(
+            [step["relation"] for step in path[3:]], ["daughter", "daughter"]
+        )
+
+    def test_snapshot_is_reused_until_data_changes(self):
+        kinship.graph()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.label(self.c1, self.c2), "second cousin")
+
+        loner = Person.objects.create(first_name="Ned", last_name="Kin")
+        self.assertIsNone(self.label(self.c1, loner))
+
+        loner.father = self.c2
+        loner.save()
+        self.assertEqual(self.label(self.c1, loner), "second cousin once removed")
+
+        with self.assertRaises(Person.DoesNotExist):
+            kinship.relationship(self.c1.id, 0)
+
+    def test_snapshot_expires(self):
+        kinship.graph()
+
+        # written without signals, like an import in another process
+        (loner,) = Person.objects.bulk_create([Person(first_name="Ned")])
+
+        with self.assertRaises(Person.DoesNotExist):
+            kinship.relationship(self.c1.id, loner.id)
+
+        with override_settings(KINSHIP_SNAPSHOT_TTL=0):
+            self.assertIsNone(self.label(self.c1, loner))
+
+    def test_view(self):
+        url = reverse("person_relationship", args=[self.c1.id])
+
+        data = self.client.get(url, {"to": self.c2.id}).json()
+        self.assertEqual(data["label"], "second cousin")
+        self.assertEqual(len(data["path"]), 7)
+
+        response = self.client.get(url, {"to": self.c2.id}, HTTP_HX_REQUEST="true")
+        self.assertTemplateUsed(response, "relationship.html")
+        self.assertContains(response, "second cousin")
+
+        for params in ({}, {"to": "x"}, {"to": 0}):
+            self.assertEqual(self.client.get(url, params).status_code, 404)
+
+    def test_view_person_deleted_elsewhere(self):
+        url = reverse("person_relationship", args=[self.c1.id])
+        kinship.graph()
+
+        # deleted without this process's snapshot hearing about it
+        c2_id = self.c2.id
+        with mock.patch.object(result_cache, "invalidate_for"):
+            self.c2.delete()
+
+        response = self.client.get(url, {"to": c2_id}, HTTP_HX_REQUEST="true")
+        self.assertEqual(response.status_code, 404)
+
+
+class GedcomExportTest(TestCase):
+    def setUp(self):
+        county = County.objects.create(county_code=1, county_name="Madison")
+        city = City.objects.create(county=county, city_name="Alton")
+
+        self.grandpa = Person.objects.create(
+            first_name="Otto", last_name="Gray", sex=Sex.MALE
+        )
+        self.grandma = Person.objects.create(
+            first_name="Ida", last_name="Gray", sex=Sex.FEMALE
+        )
+        self.father = Person.objects.create(
+            first_name="Carl",
+            middle_name="Otto",
+            last_name="Gray",
+            sex=Sex.MALE,
+            mother=self.grandma,
+            father=self.grandpa,
+        )
+        self.child = Person.objects.create(
+            first_name="Nina", last_name="Gray", sex=Sex.FEMALE, father=self.father
+        )
+        self.stranger = Person.objects.create(first_name="Zed", last_name="Roe")
+
+        Marriage.objects.create(
+            spouse1=self.grandpa,
+            spouse2=self.grandma,
+            marriage_date=date(1920, 6, 5),
+            marriage_county=county,
+            marriage_city=city,
+        )
+        Birth.objects.create(
+            person=self.father,
+            birth_date=date(1925, 3, 1),
+            birth_county=county,
+            birth_city=city,
+        )
+
+    def export(self, people):
+        return "".join(gedcom.export(people))
+
+    def records(self, text):
+        """{xref: [lines]} of the level 0 records with an xref."""
+        found, current = {}, []
+        for line in text.splitlines():
+            if line.startswith("0 @"):
+                current = found.setdefault(line.split()[1], [])
+            elif line.startswith("0 "):
+                current = []
+            else:
+                current.append(line)
+        return found
+
+    def test_tree(self):
+        text = self.export(gedcom.tree_people(self.father.id, 4))
+        records = self.records(text)
+
+        self.assertTrue(text.startswith("0 HEAD\n"))
+        self.assertIn("2 VERS 5.5.1", text)
+        self.assertTrue(text.endswith("0 TRLR\n"))
+
+        people = [self.grandpa, self.grandma, self.father, self.child]
+        self.assertEqual(
+            {xref for xref in records if xref.startswith("@I")},
+            {f"@I{p.id}@" for p in people},
+        )
+
+        father = records[f"@I{self.father.id}@"]
+        self.assertIn("1 NAME Carl Otto /Gray/", father)
+        self.assertIn("1 SEX M", father)
+        self.assertIn("2 DATE 1 MAR 1925", father)
+        self.assertIn("2 PLAC Alton, Madison County, Illinois, USA", father)
+
+        couple = f"@F{self.grandpa.id}_{self.grandma.id}@"
+        self.assertEqual(
+            records[couple],
+            [
+                f"1 HUSB @I{self.grandpa.id}@",
+                f"1 WIFE @I{self.grandma.id}@",
+                f"1 CHIL @I{self.father.id}@",
+                "1 MARR",
+                "2 DATE 5 JUN 1920",
+                "2 PLAC Alton, Madison County, Illinois, USA",
+            ],
+        )
+        self.assertIn(f"1 FAMC {couple}", father)
+        self.assertIn(f"1 FAMS {couple}", records[f"@I{self.grandma.id}@"])
+        self.assertEqual(
+            records[f"@F{self.father.id}_{self.father.id}@"],
+            [f"1 HUSB @I{self.father.id}@", f"1 CHIL @I{self.child.id}@"],
+        )
+
+        # every pointer leads to a record in the file
+        pointers = {
+            line.split()[-1]
+            for lines in records.values()
+            for line in lines
+            if line.split()[-1].startswith("@")
+        }
+        self.assertLessEqual(pointers, set(records))
+
+    def test_generations(self):
+        records = self.records(self.export(gedcom.tree_people(self.child.id, 1)))
+
+        self.assertIn(f"@I{self.father.id}@", records)
+        self.assertNotIn(f"@I{self.grandpa.id}@", records)
+        # the grandparents' family is left out with them
+        self.assertNotIn(
+            f"1 FAMC @F{self.grandpa.id}_{self.grandma.id}@",
+            records[f"@I{self.father.id}@"],
+        )
+
+    def test_queries_do_not_grow_with_the_export(self):
+        def queries(people):
+            with CaptureQueriesContext(connection) as ctx:
+                self.export(people)
+            return len(ctx)
+
+        few = queries(Person.objects.filter(pk=self.child.pk))
+
+        for i in range(20):
+            Person.objects.create(first_name=f"Kid{i}", father=self.father)
+
+        self.assertEqual(queries(Person.objects.all()), few)
+
+    def test_views(self):
+        response = self.client.get(
+            reverse("export_gedcom", args=[self.father.id]), {"generations": 1}
+        )
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment", response["Content-Disposition"])
+        text = b"".join(response.streaming_content).decode()
+        self.assertIn(f"0 @I{self.grandma.id}@ INDI", text)
+        self.assertNotIn(f"0 @I{self.stranger.id}@ INDI", text)
+
+        response = self.client.get(
+            reverse("export_search_gedcom", args=["marriage"]), {"marriage_year": 1920}
+        )
+        records = self.records(b"".join(response.streaming_content).decode())
+        self.assertEqual(
+            {xref for xref in records if xref.startswith("@I")},
+            {f"@I{self.grandpa.id}@", f"@I{self.grandma.id}@"},
+        )
+
+        response = self.client.get(
+            reverse("export_search_gedcom", args=["birth"]), {"last_name": "gray"}
+        )
+        text = b"".join(response.streaming_content).decode()
+        self.assertIn(f"0 @I{self.father.id}@ INDI", text)
+        self.assertNotIn(f"0 @I{self.child.id}@ INDI", text)
+
+        for url in (
+            reverse("export_gedcom", args=["x"]),
+            reverse("export_gedcom", args=[0]),
+            reverse("export_search_gedcom", args=["comment"]),
+        ):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ImportRecordsTest(TestCase):
+    def setUp(self):
+        self.county = County.objects.create(county_code=28, county_name="Franklin")
+        self.city = City.objects.create(county=self.county, city_name="Benton")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def people_csv(self, count=0):
+        rows = [
+            "id,first,middle,last,sex,birth_date,birth_county_code,birth_city,"
+            "death_date,age,death_county_code,death_city,mother,father",
+            "P3,Ann,Jessica,Hale,F,1938-01-18,028,Benton,2012-03-03,74,028,Zeigler,P5,P6",
+            "P5,José,,Hale,F,1910-02-01,Franklin,Benton,,,,,,",
+            "P6,Tom,,Hale,M,,,,,,,,,",
+        ]
+        rows += [f"K{i},Kid{i},,Hale,M,,,,,,,,P3," for i in range(count)]
+        return self.write("people.csv", "\n".join(rows) + "\n")
+
+    def marriages_csv(self):
+        return self.write(
+            "marriages.csv",
+            "spouse1,spouse2,marriage_date,marriage_county_code,marriage_city\n"
+            "P6,P5,1935-07-25,028,Benton\n",
+        )
+
+    def test_csv(self):
+        out = io.StringIO()
+        call_command(
+            "import_records", self.people_csv(), self.marriages_csv(), stdout=out
+        )
+        self.assertIn("Imported 3 people and 1 marriages", out.getvalue())
+
+        ann = Person.objects.get(first_name="Ann")
+        jose = Person.objects.get(first_name="José")
+        tom = Person.objects.get(first_name="Tom")
+        self.assertEqual((ann.mother, ann.father), (jose, tom))
+        self.assertEqual(ann.sex, Sex.FEMALE)
+
+        birth = ann.birth.get()
+        self.assertEqual(birth.birth_date, date(1938, 1, 18))
+        self.assertEqual(
+            (birth.birth_county, birth.birth_city), (self.county, self.city)
+        )
+        death = ann.death.get()
+        self.assertEqual(death.death_age, 74)
+        # unknown city in a known county
+        self.assertEqual(death.death_city.city_name, "Zeigler")
+        self.assertEqual(jose.birth.get().birth_county, self.county)
+
+        marriage = Marriage.objects.get()
+        self.assertEqual((marriage.spouse1, marriage.spouse2), (jose, tom))
+        self.assertEqual(marriage.participants.count(), 2)
+        self.assertIn("benton", marriage.search_document)
+
+        # what the signals would have written for single saves
+        self.assertEqual(jose.first_name_norm, "jose")
+        self.assertTrue(ann.last_name_soundex)
+        self.assertEqual(PersonSearch.objects.get(pk=ann.pk).birth_city_name, "Benton")
+        self.assertIn("benton", birth.search_document)
+        self.assertEqual(
+            set(ancestry.ancestors_of(ann.id).values_list("id", flat=True)),
+            {jose.id, tom.id},
+        )
+        self.assertIn(
+            ann.pk,
+            birth_row_search({"first_name": "ann"}).values_list("pk", flat=True),
+        )
+
+    def test_gedcom_round_trip(self):
+        original = self.people_csv()
+        call_command(
+            "import_records", original, self.marriages_csv(), stdout=io.StringIO()
+        )
+        originals = list(
+            Person.objects.filter(last_name="Hale").values_list("pk", flat=True)
+        )
+        text = "".join(gedcom.export(Person.objects.filter(pk__in=originals)))
+
+        path = self.write("tree.ged", text)
+        call_command("import_records", path, stdout=io.StringIO())
+
+        copies = Person.objects.filter(last_name="Hale").exclude(pk__in=originals)
+        self.assertEqual(copies.count(), 3)
+
+        ann = copies.get(first_name="Ann")
+        self.assertEqual(ann.middle_name, "Jessica")
+        self.assertEqual(
+            (ann.mother.first_name, ann.father.first_name), ("José", "Tom")
+        )
+        birth = ann.birth.get()
+        self.assertEqual(
+            (birth.birth_date, birth.birth_city), (date(1938, 1, 18), self.city)
+        )
+        self.assertEqual(ann.death.get().death_date, date(2012, 3, 3))
+
+        marriage = Marriage.objects.get(spouse1__in=copies)
+        self.assertEqual(marriage.marriage_date, date(1935, 7, 25))
+        self.assertEqual(marriage.marriage_city, self.city)
+
+    def test_queries_do_not_grow_with_the_input(self):
+        def queries(count):
+            path = self.people_csv(count)
+            with CaptureQueriesContext(connection) as ctx:
+                call_command("import_records", path, stdout=io.StringIO())
+            return len(ctx)
+
+        # the first run creates the Zeigler city
+        queries(0)
+        self.assertEqual(queries(30), queries(0))
+
+    def test_missing_file(self):
+        with self.assertRaises(CommandError):
+            call_command("import_records", os.path.join(self.tmp.name, "none.csv"))
+
+
+class SearchExportTest(TestCase):
+    def setUp(self):
+        county = County.objects.create(county_code=1, county_name="Madison")
+        city = City.objects.create(county=county, city_name="Alton")
+        self.people = []
+        for i, year in enumerate((1902, 1900, 1901)):
+            person = Person.objects.create(
+                first_name=f"P{i}", last_name="Stream", sex=Sex.FEMALE
+            )
+            Birth.objects.create(
+                person=person,
+                birth_date=date(year, 1, 1),
+                birth_county=county,
+                birth_city=city,
+            )
+            self.people.append(person)
+        Marriage.objects.create(
+            spouse1=self.people[0],
+            spouse2=self.people[1],
+            marriage_date=date(1925, 5, 1),
+            marriage_county=county,
+            marriage_city=city,
+        )
+
+    def get(self, kind, fmt, params):
+        response = self.client.get(reverse(f"export_search_{fmt}", args=[kind]), params)
+        self.assertTrue(response.streaming)
+        return response, list(response.streaming_content)
+
+    def test_csv(self):
+        response, chunks = self.get("birth", "csv", {"last_name": "stream"})
+
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        # the header is sent before the query runs
+        self.assertTrue(chunks[0].decode().startswith("person_id,first_name,"))
+
+        rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+        # in the order of the result pages: by birth date
+        self.assertEqual([row["first_name"] for row in rows], ["P1", "P2", "P0"])
+        self.assertEqual(rows[0]["birth_date"], "1900-01-01")
+        self.assertEqual(rows[0]["birth_county"], "Madison")
+
+        _, chunks = self.get(
+            "birth", "csv", {"last_name": "stream", "birth_year": 1901}
+        )
+        self.assertEqual(len(b"".join(chunks).decode().splitlines()), 2)
+
+    def test_ndjson(self):
+        response, chunks = self.get("marriage", "ndjson", {"marriage_year": 1925})
+
+        self.assertEqual(
+            response["Content-Type"], "application/x-ndjson; charset=utf-8"
+        )
+        lines = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]["marriage_date"], "1925-05-01")
+        self.assertEqual(lines[0]["marriage_city"], "Alton")
+        self.assertEqual(
+            {lines[0]["spouse1_first_name"], lines[0]["spouse2_first_name"]},
+            {"P0", "P1"},
+        )
+
+    def test_one_query_however_many_rows(self):
+        def queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self.get("birth", "ndjson", {"last_name": "stream"})
+            return len(ctx)
+
+        few = queries()
+        for i in range(20):
+            person = Person.objects.create(first_name=f"Q{i}", last_name="Stream")
+            Birth.objects.create(person=person, birth_date=date(1900, 1, 1))
+
+        self.assertEqual(queries(), few)
+
+    def test_chunks(self):
+        results = birth_row_search({"last_name": "stream"})
+        chunks = list(search_export.export_csv("birth", results, write_size=10))
+
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(len(list(search_export.export_csv("birth", results))), 2)
+
+    def test_links_and_unknown_kind(self):
+        response = self.client.get(
+            reverse("search_birth_records"),
+            {"last_name": "stream"},
+            HTTP_HX_REQUEST="true",
+        )
+        self.assertContains(
+            response, reverse("export_search_csv", args=["birth"]) + "?last_name=stream"
+        )
+
+        url = reverse("export_search_csv", args=["comment"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class RecordVersionTest(TestCase):
+    def setUp(self):
+        caches["exports"].clear()
+        self.county = County.objects.create(county_code=1, county_name="Madison")
+        self.mother = Person.objects.create(first_name="Mary", last_name="Vee")
+        self.person = Person.objects.create(
+            first_name="John", last_name="Vee", mother=self.mother
+        )
+        self.child = Person.objects.create(
+            first_name="Tim", last_name="Vee", father=self.person
+        )
+        self.wife = Person.objects.create(first_name="Ann", last_name="Roe")
+        self.stranger = Person.objects.create(first_name="Zed", last_name="Roe")
+
+    def versions(self):
+        return dict(Person.objects.values_list("pk", "record_version"))
+
+    def assertBumps(self, change, people):
+        before = self.versions()
+        change()
+        after = self.versions()
+        self.assertEqual(
+            {pk for pk in after if pk in before and after[pk] != before[pk]},
+            {p.pk for p in people},
+        )
+
+    def test_writes_bump_the_people_they_show_up_for(self):
+        def rename():
+            self.person.first_name = "Jon"
+            self.person.save()
+
+        self.assertBumps(rename, [self.person, self.mother, self.child])
+
+        self.assertBumps(
+            lambda: Marriage.objects.create(spouse1=self.person, spouse2=self.wife),
+            [self.person, self.wife],
+        )
+        self.assertBumps(
+            lambda: Birth.objects.create(person=self.child, birth_county=self.county),
+            [self.child],
+        )
+
+        def rename_county():
+            self.county.county_name = "Madison Co"
+            self.county.save()
+
+        self.assertBumps(rename_county, [self.child])
+
+        def reparent():
+            self.child.father = self.stranger
+            self.child.save()
+
+        self.assertBumps(reparent, [self.child, self.person, self.stranger])
+
+        # the mother loses a child and the wife her marriage
+        self.assertBumps(self.person.delete, [self.mother, self.wife])
+
+    def test_exports_are_cached_per_version(self):
+        url = reverse("export_pdf", args=[self.person.id])
+
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first["ETag"].startswith('W/"'))
+        self.assertIn("Last-Modified", first)
+
+        # same version: no rendering, no family queries
+        with self.assertNumQueries(1):
+            again = self.client.get(url)
+        self.assertEqual(again.content, first.content)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+        # a new child changes what the export shows
+        Person.objects.create(
+            first_name="Sue", last_name="Vee", mother=self.wife, father=self.person
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+
+        csv_url = reverse("export_csv", args=[self.person.id])
+        self.assertIn("Sue Vee", self.client.get(csv_url).content.decode())
+
+        for person_id in (0, "x"):
+            url = reverse("export_csv", args=[person_id])
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class CertificateRenderTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        county = County.objects.create(county_code=28, county_name="Franklin")
+        city = City.objects.create(county=county, city_name="Benton")
+        self.mother = Person.objects.create(first_name="Mary", last_name="Hale")
+        self.person = Person.objects.create(
+            first_name="Ann", last_name="Hale", sex=Sex.FEMALE, mother=self.mother
+        )
+        for person in (self.mother, self.person):
+            Birth.objects.create(
+                person=person,
+                birth_date=date(1920, 5, 6),
+                birth_county=county,
+                birth_city=city,
+            )
+            Death.objects.create(person=person, death_date=date(1990, 1, 2))
+
+    def test_base_is_drawn_once_and_never_drawn_on(self):
+        birth = self.person.birth.get()
+        base, _ = image_utils._certificate_base("birth")
+        blank = base.tobytes()
+
+        image = image_utils.generate_birth_certificate_image(self.person, birth)
+
+        self.assertIs(image_utils._certificate_base("birth")[0], base)
+        self.assertEqual(base.tobytes(), blank)
+        self.assertNotEqual(image.tobytes(), blank)
+        self.assertEqual(image.size, (850, 1100))
+        self.assertIs(
+            image_utils._get_font(bold=True, size=30),
+            image_utils._get_font(bold=True, size=30),
+        )
+
+    def test_command_renders_missing_certificates(self):
+        Birth.objects.filter(person=self.mother).update(
+            birth_record_image="birth_records/kept.png"
+        )
+        out = io.StringIO()
+        call_command("render_certificates", "--workers", "1", stdout=out)
+
+        self.assertIn("Rendered 3 certificates", out.getvalue())
+        self.assertIn("certificates/s", out.getvalue())
+        self.assertEqual(
+            self.mother.birth.get().birth_record_image.name, "birth_records/kept.png"
+        )
+
+        birth = self.person.birth.get()
+        self.assertTrue(storage.is_blob(birth.birth_record_image.name))
+        self.assertTrue(birth.birth_record_image.name.endswith(".png"))
+        self.assertTrue(os.path.exists(birth.birth_record_image.path))
+        with birth.birth_record_image.open("rb") as f:
+            self.assertEqual(f.read(8), b"\x89PNG\r\n\x1a\n")
+        self.assertTrue(derivatives.exist(birth.birth_record_image))
+        # the search table's copy of the name follows
+        row = PersonSearch.objects.get(pk=self.person.pk)
+        self.assertEqual(row.birth_record_image.name, birth.birth_record_image.name)
+        self.assertTrue(storage.is_blob(row.death_record_image.name))
+
+        call_command("render_certificates", "--workers", "1", stdout=out)
+        self.assertIn("Rendered 0 certificates", out.getvalue())
+
+    def test_pool_limit_and_overwrite(self):
+        out = io.StringIO()
+        call_command(
+            "render_certificates",
+            "--kind=death",
+            "--workers=2",
+            "--limit=1",
+            stdout=out,
+        )
+        self.assertIn("death: 1 certificates", out.getvalue())
+        self.assertEqual(certificates.missing("death").count(), 1)
+        self.assertEqual(certificates.missing("birth").count(), 2)
+
+        call_command(
+            "render_certificates",
+            "--kind=death",
+            "--overwrite",
+            "--workers=2",
+            stdout=out,
+        )
+        names = set(Death.objects.values_list("death_record_image", flat=True))
+        self.assertEqual(len(names), 2)
+        self.assertTrue(all(storage.is_blob(name) for name in names))
+        # the replaced certificate stays until gc_media, with its derivatives;
+        # each new one has its own next to it
+        self.assertEqual(
+            storage.collect(min_age=0)["deleted"], 1 + len(image_utils.DERIVATIVES)
+        )
+        for death in Death.objects.all():
+            self.assertTrue(derivatives.exist(death.death_record_image))
+
+        with self.assertRaises(CommandError):
+            call_command("render_certificates", "--workers=0")
+
+
+class CertificateCacheTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.county = County.objects.create(county_code=28, county_name="Franklin")
+        self.person = Person.objects.create(first_name="Ann", last_name="Hale")
+        Birth.objects.create(
+            person=self.person, birth_date=date(1920, 5, 6), birth_county=self.county
+        )
+        self.url = reverse("birth_certificate", args=[self.person.pk])
+
+    def cached(self):
+        return sorted(
+            name
+            for _, _, names in os.walk(certificate_cache.root())
+            for name in names
+            if name.endswith(".png")
+        )
+
+    def test_rendered_once_per_record_version(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        first = b"".join(response.streaming_content)
+        self.assertTrue(first.startswith(b"\x89PNG"))
+        self.assertEqual(len(self.cached()), 1)
+
+        # a hit is the stamp query and the same file (the registration
+        # number is random, so a re-render would differ)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+            self.assertEqual(b"".join(response.streaming_content), first)
+        self.assertEqual(len(queries), 1)
+
+        etag = response["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.person.first_name = "Anna"
+        self.person.save()
+        response = self.client.get(self.url)
+        self.assertNotEqual(b"".join(response.streaming_content), first)
+        self.assertNotEqual(response["ETag"], etag)
+        # the old version is dropped when it is replaced
+        self.assertEqual(len(self.cached()), 1)
+
+    def test_missing_records(self):
+        self.assertEqual(
+            self.client.get(
+                reverse("death_certificate", args=[self.person.pk])
+            ).status_code,
+            404,
+        )
+        for person_id in (0, "x"):
+            url = reverse("birth_certificate", args=[person_id])
+            self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.cached(), [])
+
+    def test_prune_drops_least_recently_used(self):
+        people = [self.person]
+        for name in ("Bob", "Cy"):
+            person = Person.objects.create(first_name=name, last_name="Hale")
+            Birth.objects.create(person=person, birth_county=self.county)
+            people.append(person)
+
+        # every certificate is kept as the full PNG and its derivatives
+        files = []
+        for person in people:
+            path = certificate_cache.certificate("birth", person.pk)
+            stem = path.removesuffix("png")
+            files.append([stem + suffix for suffix in certificate_cache.SUFFIXES])
+        for age, paths in enumerate(files):
+            for path in paths:
+                os.utime(path, (1000 + age, 1000 + age))
+
+        # hits make the oldest files the most recently used
+        for suffix in certificate_cache.SUFFIXES:
+            certificate_cache.certificate("birth", self.person.pk, suffix=suffix)
+
+        sizes = [sum(os.path.getsize(path) for path in paths) for paths in files]
+        self.assertEqual(certificate_cache.prune(max_bytes=sum(sizes)), 0)
+        kept = sizes[0] + sizes[2]
+        self.assertEqual(
+            certificate_cache.prune(
+                max_bytes=int(kept / certificate_cache.LOW_WATER) + 1
+            ),
+            len(certificate_cache.SUFFIXES),
+        )
+        self.assertEqual(
+            [all(os.path.exists(path) for path in paths) for paths in files],
+            [True, False, True],
+        )
+
+    def test_derivatives(self):
+        response = self.client.get(
+            reverse("birth_certificate_size", args=[self.person.pk, "medium.webp"])
+        )
+        self.assertEqual(response["Content-Type"], "image/webp")
+        image = Image.open(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual((image.format, image.width), ("WEBP", 600))
+
+        bad = reverse("birth_certificate_size", args=[self.person.pk, "huge.gif"])
+        self.assertEqual(self.client.get(bad).status_code, 404)
+
+        # the details modal offers the derivatives; the full image is a link
+        response = self.client.get(reverse("record_details", args=[self.person.pk]))
+        thumb = reverse("birth_certificate_size", args=[self.person.pk, "thumb.webp"])
+        self.assertContains(response, f"{thumb} 240w")
+        self.assertContains(response, f'href="{self.url}"')
+
+    def test_details_and_results_link_rendered_certificates(self):
+        response = self.client.get(reverse("record_details", args=[self.person.pk]))
+        self.assertContains(response, self.url)
+        self.assertNotContains(
+            response, reverse("death_certificate", args=[self.person.pk])
+        )
+
+        response = self.client.get(
+            reverse("birth_results"), {"last_name": "Hale"}, HTTP_HX_REQUEST="true"
+        )
+        self.assertContains(response, self.url)
+        self.assertNotContains(response, "No certificates on file")
+
+
+class CertificateSingleFlightTest(TransactionTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.person = Person.objects.create(first_name="Ann", last_name="Hale")
+        Birth.objects.create(person=self.person, birth_date=date(1920, 5, 6))
+
+    def test_concurrent_first_requests_render_once(self):
+        barrier = threading.Barrier(4)
+        paths = []
+
+        def request():
+            try:
+                barrier.wait()
+                paths.append(certificate_cache.certificate("birth", self.person.pk))
+            finally:
+                connection.close()
+
+        render = certificate_cache._render
+        with mock.patch.object(
+            certificate_cache, "_render", side_effect=render
+        ) as rendered:
+            threads = [threading.Thread(target=request) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(rendered.call_count, 1)
+        self.assertEqual(len(paths), 4)
+        self.assertEqual(len(set(paths)), 1)
+
+
+class ImageDerivativesTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.person = Person.objects.create(first_name="Ann", last_name="Hale")
+        self.birth = Birth.objects.create(person=self.person)
+
+    def upload(self, image):
+        self.birth.birth_record_image.save(
+            "scan.png",
+            image_utils.image_to_content_file(image, "scan.png"),
+            save=True,
+        )
+        return self.birth.birth_record_image
+
+    def test_saved_images_get_derivatives(self):
+        file = self.upload(Image.new("RGB", (1200, 1600), "white"))
+
+        for suffix, (width, image_format, _) in image_utils.DERIVATIVES.items():
+            with file.storage.open(derivatives.name(file.name, suffix)) as f:
+                image = Image.open(f)
+                self.assertEqual(
+                    (image.format, image.size),
+                    (image_format, (width, round(1600 * width / 1200))),
+                )
+
+        response = self.client.get(reverse("record_details", args=[self.person.pk]))
+        medium = file.storage.url(derivatives.name(file.name, "medium.jpg"))
+        self.assertContains(response, f'src="{medium}"')
+        self.assertContains(response, f'href="{file.url}"')
+        # stored images are not rendered on demand
+        self.assertNotContains(
+            response, reverse("birth_certificate", args=[self.person.pk])
+        )
+
+    def test_small_images_are_not_scaled_up(self):
+        file = self.upload(Image.new("RGB", (300, 400), "white"))
+        with file.storage.open(derivatives.name(file.name, "medium.webp")) as f:
+            self.assertEqual(Image.open(f).size, (300, 400))
+
+    def test_backfill(self):
+        file = self.upload(Image.new("RGB", (850, 1100), "white"))
+        for suffix in image_utils.DERIVATIVES:
+            os.remove(file.storage.path(derivatives.name(file.name, suffix)))
+        Birth.objects.create(
+            person=self.person, birth_record_image="birth_records/missing.png"
+        )
+        self.assertFalse(derivatives.exist(file))
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command("build_image_derivatives", stdout=out, stderr=err)
+        self.assertTrue(derivatives.exist(file))
+        self.assertIn("Built derivatives of 1 images", out.getvalue())
+        self.assertIn("1 could not be read", out.getvalue())
+        self.assertIn("missing.png", err.getvalue())
+
+        call_command("build_image_derivatives", "--kind=birth", stdout=out, stderr=err)
+        self.assertIn("Built derivatives of 0 images", out.getvalue())
+        self.assertIn("1 already had them", out.getvalue())
+
+
+def staff_only(request, name):
+    return request.user.is_staff
+
+
+class MediaServingTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        for name in ("birth_records/scan.png", "private/scan.png", "secret.png"):
+            os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+            with open(self.path(name), "wb") as f:
+                f.write(b"\x89PNG scan")
+        self.url = reverse("media", args=["birth_records/scan.png"])
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_served_by_django(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(b"".join(response.streaming_content), b"\x89PNG scan")
+
+        since = response["Last-Modified"]
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 304)
+
+    def test_only_record_images_are_served(self):
+        os.makedirs(self.path("certificate_cache/locks"))
+        with open(self.path("certificate_cache/locks/001.lock"), "w"):
+            pass
+
+        for name in (
+            "private/scan.png",
+            "secret.png",
+            "birth_records/../secret.png",
+            "birth_records/missing.png",
+            "certificate_cache/locks/001.lock",
+        ):
+            url = reverse("media", args=[name])
+            self.assertEqual(self.client.get(url).status_code, 404, name)
+
+    @override_settings(MEDIA_SENDFILE="x-accel-redirect")
+    def test_x_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response["X-Accel-Redirect"], "/protected-media/birth_records/scan.png"
+        )
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(response.content, b"")
+
+        # on-demand certificates go the same way
+        person = Person.objects.create(first_name="Ann", last_name="Hale")
+        Birth.objects.create(person=person)
+        response = self.client.get(reverse("birth_certificate", args=[person.pk]))
+        self.assertTrue(
+            response["X-Accel-Redirect"].startswith(
+                "/protected-media/certificate_cache/birth/"
+            )
+        )
+        self.assertIn("ETag", response)
+
+    @override_settings(MEDIA_SENDFILE="x-sendfile")
+    def test_x_sendfile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Sendfile"], self.path("birth_records/scan.png"))
+        self.assertEqual(response.content, b"")
+
+    @override_settings(
+        MEDIA_SENDFILE="x-accel-redirect", MEDIA_PERMISSION="records.tests.staff_only"
+    )
+    def test_permission_check_runs_first(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn("X-Accel-Redirect", response)
+
+        staff = User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("X-Accel-Redirect", response)
+
+
+class ContentAddressedStorageTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.people = [
+            Person.objects.create(first_name=name, last_name="Hale")
+            for name in ("Ann", "Mary")
+        ]
+
+    def png(self, color="white"):
+        out = io.BytesIO()
+        Image.new("RGB", (800, 600), color).save(out, "PNG")
+        return ContentFile(out.getvalue())
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_identical_images_are_stored_once(self):
+        births = [Birth.objects.create(person=person) for person in self.people]
+        for i, birth in enumerate(births):
+            birth.birth_record_image.save(f"scan_{i}.png", self.png())
+
+        first, second = (birth.birth_record_image for birth in births)
+        self.assertEqual(first.name, second.name)
+        self.assertTrue(storage.is_blob(first.name))
+        self.assertTrue(derivatives.exist(first))
+        self.assertEqual(storage.references()[first.name], 2)
+
+        # a derivative saved again replaces the old one in place
+        thumb = derivatives.name(first.name, "thumb.jpg")
+        self.assertEqual(first.storage.save(thumb, ContentFile(b"new")), thumb)
+        with first.storage.open(thumb) as f:
+            self.assertEqual(f.read(), b"new")
+
+        # the other record still needs it
+        first.delete(save=False)
+        self.assertTrue(os.path.exists(second.path))
+
+    def test_gc_media_deletes_unreferenced_files(self):
+        birth = Birth.objects.create(person=self.people[0])
+        birth.birth_record_image.save("scan.png", self.png())
+        kept = birth.birth_record_image
+
+        dropped = Birth.objects.create(person=self.people[1])
+        dropped.birth_record_image.save("scan.png", self.png("black"))
+        blob = dropped.birth_record_image.path
+        dropped.delete()
+
+        # left behind by plain upload_to names
+        os.makedirs(self.path("birth_records"))
+        for name in ("birth_records/old.png", "birth_records/old.thumb.webp"):
+            with open(self.path(name), "wb") as f:
+                f.write(b"old")
+
+        out = io.StringIO()
+        call_command("gc_media", stdout=out)
+        self.assertIn("Deleted 0 unreferenced files", out.getvalue())
+
+        call_command("gc_media", "--min-age=0", "--dry-run", stdout=out)
+        self.assertIn("Would delete 7 unreferenced files", out.getvalue())
+        self.assertTrue(os.path.exists(blob))
+
+        call_command("gc_media", "--min-age=0", stdout=out)
+        self.assertIn("Deleted 7 unreferenced files", out.getvalue())
+        self.assertFalse(os.path.exists(blob))
+        # with the directories that held only them
+        self.assertFalse(os.path.exists(os.path.dirname(blob)))
+        self.assertEqual(os.listdir(self.path("birth_records")), [])
+        self.assertTrue(os.path.exists(kept.path))
+        self.assertTrue(derivatives.exist(kept))
+
+    def test_saving_an_old_blob_again_restarts_its_age(self):
+        birth = Birth.objects.create(person=self.people[0])
+        birth.birth_record_image.save("scan.png", self.png())
+        image = birth.birth_record_image
+        name, path = image.name, image.path
+        birth.delete()
+        os.utime(path, (0, 0))
+
+        # an upload of the same bytes whose row is not committed yet
+        self.assertEqual(image.storage.save("rescan.png", self.png()), name)
+
+        storage.collect(min_age=3600)
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(derivatives.exist(image))
+
+
+class ViewTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        self.person = Person.objects.create(first_name="John", last_name="Smith")
+
+    # -------------------------
     # Record Details View
     # -------------------------
     def test_record_details_view(self):
@@ -811,6 +3005,23 @@ class HTMXSearchViewTests(TestCase):
         self.assertTemplateUsed(response, "birth_results.html")
         self.assertIn("page_obj", response.context)
 
+    def test_birth_search_htmx_follows_cursor(self):
+        url = reverse("search_birth_records")
+        for i in range(30):
+            person = Person.objects.create(first_name=f"P{i}", last_name="Smith")
+            Birth.objects.create(person=person, birth_date=date(1900, 1, 1))
+
+        first = self.client.get(url, {"last_name": "Smith"}, HTTP_HX_REQUEST="true")
+        token = first.context["page_obj"].next_token
+        self.assertContains(first, f"cursor={token}")
+
+        second = self.client.get(
+            url, {"last_name": "Smith", "cursor": token}, HTTP_HX_REQUEST="true"
+        )
+        self.assertEqual(second.context["page_obj"].number, 2)
+        self.assertEqual(len(second.context["page_obj"]), 5)
+        self.assertNotIn("cursor", second.context["curr_query_str"])
+
     # -------------------------
     # Birth Search (normal page load)
     # -------------------------
@@ -0,0 +1,68 @@
+from django.db.models import F, Q
+from django.db.models.functions import Now
+
+from records.models import County, MarriageParticipant, Person
+
+# Person.record_version / record_modified stamp what a person's exports
+# show: their names, first birth and death, parents, spouses and children.
+# records.signals bumps the stamp of everyone a write can show up for, in
+# SQL (record_version + 1), so two writes never share a version even when
+# they start from stale copies of the row.
+
+
+def relatives(person_ids) -> set:
+    """The given people with their parents, children and spouses (2 queries)."""
+    ids = {pid for pid in person_ids if pid is not None}
+    if not ids:
+        return set()
+
+    family = set()
+    for pk, mother, father in Person.objects.filter(
+        Q(pk__in=ids) | Q(mother_id__in=ids) | Q(father_id__in=ids)
+    ).values_list("pk", "mother_id", "father_id"):
+        family.update((pk, mother, father) if pk in ids else (pk,))
+
+    family.update(
+        MarriageParticipant.objects.filter(person_id__in=ids).values_list(
+            "spouse_id", flat=True
+        )
+    )
+    return (family | ids) - {None}
+
+
+def at_place(place) -> set:
+    """People with a birth or death record in `place` (or in a county's cities)."""
+    if isinstance(place, County):
+        q = (
+            Q(birth__birth_county=place)
+            | Q(birth__birth_city__county=place)
+            | Q(death__death_county=place)
+            | Q(death__death_city__county=place)
+        )
+    else:
+        q = Q(birth__birth_city=place) | Q(death__death_city=place)
+
+    return set(Person.objects.filter(q).values_list("pk", flat=True))
+
+
+def bump(person_ids) -> None:
+    """New stamps for the given people (one UPDATE, no signals)."""
+    ids = {pid for pid in person_ids if pid is not None}
+    if ids:
+        Person.objects.filter(pk__in=ids).update(
+            record_version=F("record_version") + 1, record_modified=Now()
+        )
+
+
+def stamp(person_id):
+    """(record_version, record_modified) of a person, or None if there is none."""
+    try:
+        person_id = int(person_id)
+    except (TypeError, ValueError):
+        return None
+
+    return (
+        Person.objects.filter(pk=person_id)
+        .values_list("record_version", "record_modified")
+        .first()
+    )